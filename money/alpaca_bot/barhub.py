@@ -0,0 +1,176 @@
+"""Fan-out of Alpaca minute bars to sharded alpaca_bot processes.
+
+Keeps one connection to Alpaca's market data websocket and serves the same v2
+msgpack protocol on a local socket, so every shard runs in stream mode with
+ALPACA_DATA_STREAM_URL pointing here instead of opening its own upstream
+connection. The upstream subscription is the union of the symbols the shards
+subscribe to, kept in sync as shards connect and disconnect; each shard only
+receives bars for its own symbols. A shard that falls behind loses its oldest
+batches rather than slowing down the others.
+
+    ALPACA_API_KEY=... ALPACA_SECRET_KEY=... python alpaca_bot/barhub.py
+"""
+import asyncio
+import logging
+import os
+import sys
+from pathlib import Path
+
+import msgpack
+import websockets
+from dotenv import load_dotenv
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common import metrics
+
+DEFAULT_STREAM_URL = "https://stream.data.alpaca.markets"
+
+
+def pack(messages):
+    return msgpack.packb(messages, use_bin_type=True)
+
+
+class Client:
+    def __init__(self, websocket, queue_size):
+        self.websocket = websocket
+        self.symbols = set()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def push(self, batch):
+        if self.queue.full():
+            self.queue.get_nowait()
+            metrics.counter("barhub_dropped_batches_total", "Batches dropped for slow shards").inc()
+        self.queue.put_nowait(batch)
+
+    async def send_forever(self):
+        while True:
+            await self.websocket.send(pack(await self.queue.get()))
+
+
+class BarHub:
+    def __init__(self, key, secret, stream_url=DEFAULT_STREAM_URL, feed="iex", queue_size=1000):
+        self.key = key
+        self.secret = secret
+        self.upstream_url = stream_url.replace("http", "ws", 1).rstrip("/") + f"/v2/{feed}"
+        self.queue_size = queue_size
+        self.clients = set()
+        self.upstream = None
+        self.subscribed = set()
+        self.wanted = asyncio.Event()
+
+    async def serve(self, host="127.0.0.1", port=8770):
+        async with websockets.serve(self.handler, host, port):
+            print(f"Bar hub on ws://{host}:{port}, upstream {self.upstream_url}", flush=True)
+            await self.upstream_forever()
+
+    async def upstream_forever(self):
+        """Keep the upstream connection open while any shard wants bars, reconnecting with backoff."""
+        backoff = 1.0
+        while True:
+            await self.wanted.wait()
+            try:
+                await self.run_upstream()
+                backoff = 1.0
+            except Exception as e:
+                logging.error(f"Bar hub upstream failed: {e}; reconnecting in {backoff:.0f}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60.0)
+            finally:
+                self.upstream = None
+                self.subscribed = set()
+
+    async def run_upstream(self):
+        async with websockets.connect(self.upstream_url, extra_headers={"Content-Type": "application/msgpack"}) as ws:
+            await ws.recv()  # connected
+            await ws.send(pack({"action": "auth", "key": self.key, "secret": self.secret}))
+            reply = msgpack.unpackb(await ws.recv())
+            if not any(m.get("msg") == "authenticated" for m in reply):
+                raise RuntimeError(f"upstream auth failed: {reply}")
+            self.upstream = ws
+            await self.sync_subscriptions()
+            logging.info(f"Bar hub connected upstream for {len(self.subscribed)} symbols")
+            async for raw in ws:
+                self.route(msgpack.unpackb(raw))
+
+    def route(self, messages):
+        """Forward each client the bars of its symbols from one upstream batch."""
+        bars = [m for m in messages if m.get("T") == "b"]
+        for m in messages:
+            if m.get("T") == "error":
+                logging.error(f"Bar hub upstream error: {m}")
+        if not bars:
+            return
+        metrics.counter("barhub_bars_received_total", "Bars received from upstream").inc(len(bars))
+        forwarded = 0
+        for client in self.clients:
+            batch = [bar for bar in bars if bar.get("S") in client.symbols]
+            if batch:
+                client.push(batch)
+                forwarded += len(batch)
+        metrics.counter("barhub_bars_forwarded_total", "Bars forwarded to shards").inc(forwarded)
+
+    async def sync_subscriptions(self):
+        """Subscribe upstream to symbols some client wants and drop the ones none does."""
+        wanted = set().union(*(client.symbols for client in self.clients))
+        metrics.gauge("barhub_symbols", "Symbols subscribed upstream").set(len(wanted))
+        if wanted:
+            self.wanted.set()
+        else:
+            self.wanted.clear()
+        if self.upstream is None:
+            return
+        added, removed = wanted - self.subscribed, self.subscribed - wanted
+        if added:
+            await self.upstream.send(pack({"action": "subscribe", "bars": sorted(added)}))
+        if removed:
+            await self.upstream.send(pack({"action": "unsubscribe", "bars": sorted(removed)}))
+        self.subscribed = wanted
+        if not wanted:
+            await self.upstream.close()
+
+    async def handler(self, websocket, path=None):
+        """One shard connection: connect/auth handshake, then subscription requests."""
+        await websocket.send(pack([{"T": "success", "msg": "connected"}]))
+        auth = msgpack.unpackb(await websocket.recv())
+        if auth.get("action") != "auth":
+            await websocket.send(pack([{"T": "error", "code": 401, "msg": "not authenticated"}]))
+            return
+        await websocket.send(pack([{"T": "success", "msg": "authenticated"}]))
+        client = Client(websocket, self.queue_size)
+        self.clients.add(client)
+        metrics.gauge("barhub_clients", "Connected shards").set(len(self.clients))
+        sender = asyncio.create_task(client.send_forever())
+        try:
+            async for raw in websocket:
+                request = msgpack.unpackb(raw)
+                bars = set(request.get("bars", []))
+                if request.get("action") == "subscribe":
+                    client.symbols |= bars
+                elif request.get("action") == "unsubscribe":
+                    client.symbols -= bars
+                else:
+                    continue
+                await websocket.send(pack([{"T": "subscription", "trades": [], "quotes": [],
+                                            "bars": sorted(client.symbols)}]))
+                await self.sync_subscriptions()
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            sender.cancel()
+            self.clients.discard(client)
+            metrics.gauge("barhub_clients", "Connected shards").set(len(self.clients))
+            await self.sync_subscriptions()
+
+
+def main():
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    metrics.serve(int(os.getenv("BAR_HUB_METRICS_PORT", "9199")))
+    hub = BarHub(os.getenv("ALPACA_API_KEY"), os.getenv("ALPACA_SECRET_KEY"),
+                 os.getenv("ALPACA_DATA_STREAM_URL") or DEFAULT_STREAM_URL,
+                 os.getenv("ALPACA_DATA_FEED", "iex"), int(os.getenv("BAR_HUB_QUEUE_SIZE", "1000")))
+    asyncio.run(hub.serve(port=int(os.getenv("BAR_HUB_PORT", "8770"))))
+
+
+if __name__ == "__main__":
+    main()
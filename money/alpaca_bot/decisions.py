@@ -0,0 +1,187 @@
+"""Batched LLM trade decisions for USE_GPT mode.
+
+All symbols evaluated in a round go out as a few chat completion requests
+(`batch_size` symbols each, sent concurrently) that must answer with a JSON
+object matching DECISION_SCHEMA. Answers are cached in SQLite by (model,
+symbol, bar timestamp, feature hash), so re-evaluating the same bar after a
+restart or in a replay costs nothing. Any OpenAI-compatible endpoint works,
+including the local stub in fake_llm.py.
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+
+from common import metrics
+
+ACTIONS = ("BUY", "SELL", "HOLD")
+
+DECISION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "decisions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "symbol": {"type": "string"},
+                    "action": {"type": "string", "enum": list(ACTIONS)},
+                },
+                "required": ["symbol", "action"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["decisions"],
+    "additionalProperties": False,
+}
+
+SYSTEM_PROMPT = (
+    "You are a short-term stock trading assistant. The user message is a JSON object with one entry "
+    "per symbol: the latest 1-minute close and its indicators (SMA5, RSI14, EMA12, EMA26, MACD and "
+    "MACD histogram). Answer with one decision per symbol: BUY, SELL or HOLD."
+)
+
+
+def feature_hash(features):
+    """Stable hash of a feature dict, rounded so float noise does not defeat the cache."""
+    rounded = {k: round(v, 6) if isinstance(v, float) else v for k, v in sorted(features.items())}
+    return hashlib.sha1(json.dumps(rounded).encode()).hexdigest()[:16]
+
+
+class DecisionCache:
+    """Decisions keyed by (model, symbol, bar timestamp, feature hash), backed by SQLite."""
+
+    def __init__(self, path="llm_decisions.sqlite"):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS decisions ("
+                "model TEXT, symbol TEXT, bar_ts TEXT, features TEXT, action TEXT, created REAL, "
+                "PRIMARY KEY (model, symbol, bar_ts, features)) WITHOUT ROWID"
+            )
+
+    def get_many(self, model, keys):
+        """Cached action per (symbol, bar_ts, features) key; missing keys are left out."""
+        found = {}
+        with self.lock:
+            for key in keys:
+                row = self.conn.execute(
+                    "SELECT action FROM decisions WHERE model = ? AND symbol = ? AND bar_ts = ? AND features = ?",
+                    (model, *key)).fetchone()
+                if row:
+                    found[key] = row[0]
+        return found
+
+    def put_many(self, model, decisions):
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO decisions VALUES (?, ?, ?, ?, ?, ?)",
+                                  [(model, *key, action, now) for key, action in decisions.items()])
+
+
+class DecisionService:
+    """Asks an OpenAI-compatible chat completions endpoint for BUY/SELL/HOLD per symbol.
+
+    Symbols whose request fails, times out or gets no valid answer fall back to
+    HOLD and are not cached, so they are asked again next round.
+    """
+
+    def __init__(self, api_key, base_url="https://api.openai.com/v1", model="gpt-4o-mini",
+                 batch_size=25, concurrency=4, timeout=20.0, cache_path="llm_decisions.sqlite",
+                 input_cost_per_mtok=0.0, output_cost_per_mtok=0.0):
+        self.api_key = api_key
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.timeout = timeout
+        self.input_cost = input_cost_per_mtok / 1e6
+        self.output_cost = output_cost_per_mtok / 1e6
+        self.cache = DecisionCache(cache_path)
+        self.session = requests.Session()
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="llm")
+        self.last_round = None
+
+    def decide(self, items):
+        """Action per symbol for [(symbol, bar_ts, features)] evaluated in one round."""
+        start = time.perf_counter()
+        keys = {symbol: (symbol, str(bar_ts), feature_hash(features)) for symbol, bar_ts, features in items}
+        cached = self.cache.get_many(self.model, keys.values())
+        actions = {symbol: cached[key] for symbol, key in keys.items() if key in cached}
+        pending = [(symbol, features) for symbol, _, features in items if symbol not in actions]
+        batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+
+        futures = [self.executor.submit(self._ask, batch) for batch in batches]
+        done, _ = wait(futures, timeout=self.timeout * 2)
+        answered, usage, failed = {}, [0, 0], 0
+        for future in futures:
+            if future not in done or future.exception() is not None:
+                failed += 1
+                if future in done:
+                    logging.error(f"LLM decision request failed: {future.exception()}")
+                continue
+            decisions, prompt_tokens, completion_tokens = future.result()
+            answered.update(decisions)
+            usage[0] += prompt_tokens
+            usage[1] += completion_tokens
+        self.cache.put_many(self.model, {keys[s]: a for s, a in answered.items() if s in keys})
+
+        for symbol, _ in pending:
+            actions[symbol] = answered.get(symbol, "HOLD")
+        cost = usage[0] * self.input_cost + usage[1] * self.output_cost
+        self.last_round = {
+            "symbols": len(keys), "cached": len(keys) - len(pending), "requests": len(batches),
+            "failed_requests": failed, "fallbacks": len(pending) - len(answered),
+            "prompt_tokens": usage[0], "completion_tokens": usage[1], "cost_usd": cost,
+            "seconds": time.perf_counter() - start,
+        }
+        self._record(self.last_round)
+        return actions
+
+    def _ask(self, batch):
+        """One chat completion for a batch; returns ({symbol: action}, prompt_tokens, completion_tokens)."""
+        payload = {
+            "model": self.model,
+            "temperature": 0,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": json.dumps({symbol: features for symbol, features in batch})},
+            ],
+            "response_format": {"type": "json_schema", "json_schema": {
+                "name": "trade_decisions", "strict": True, "schema": DECISION_SCHEMA}},
+        }
+        with metrics.histogram("llm_request_seconds", "One batched LLM decision request").time():
+            response = self.session.post(self.url, json=payload, timeout=self.timeout,
+                                         headers={"Authorization": f"Bearer {self.api_key}"})
+        response.raise_for_status()
+        body = response.json()
+        content = json.loads(body["choices"][0]["message"]["content"])
+        wanted = {symbol for symbol, _ in batch}
+        decisions = {d["symbol"]: d["action"].upper() for d in content.get("decisions", [])
+                     if d.get("symbol") in wanted and str(d.get("action", "")).upper() in ACTIONS}
+        usage = body.get("usage") or {}
+        return decisions, usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+
+    def _record(self, report):
+        metrics.histogram("llm_round_seconds", "LLM decisions for a whole round, cache lookups included").observe(
+            report["seconds"])
+        tokens = metrics.counter("llm_tokens_total", "LLM tokens used by kind")
+        tokens.inc(report["prompt_tokens"], kind="prompt")
+        tokens.inc(report["completion_tokens"], kind="completion")
+        metrics.counter("llm_cost_dollars_total", "Estimated LLM spend").inc(report["cost_usd"])
+        decisions = metrics.counter("llm_decisions_total", "LLM decisions by source")
+        decisions.inc(report["cached"], source="cache")
+        decisions.inc(report["symbols"] - report["cached"] - report["fallbacks"], source="llm")
+        decisions.inc(report["fallbacks"], source="fallback")
+        logging.info(
+            f"🤖 LLM round: {report['symbols']} symbols, {report['cached']} cached, "
+            f"{report['requests']} requests ({report['failed_requests']} failed), "
+            f"{report['prompt_tokens']}+{report['completion_tokens']} tokens, "
+            f"${report['cost_usd']:.4f}, {report['seconds']:.2f}s")
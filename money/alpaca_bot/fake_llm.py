@@ -0,0 +1,74 @@
+"""Local stand-in for an OpenAI-compatible chat completions endpoint, for exercising USE_GPT mode.
+
+Answers the batched decision requests from decisions.py with an RSI rule
+(BUY below 30, SELL above 70, otherwise HOLD) in the structured output format,
+after an optional artificial latency, and reports rough token usage. Point the
+bot at it with USE_GPT=true LLM_BASE_URL=http://localhost:8766/v1.
+"""
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def decide(features):
+    rsi = features.get("rsi")
+    if rsi is None:
+        return "HOLD"
+    return "BUY" if rsi < 30 else "SELL" if rsi > 70 else "HOLD"
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    requests_served = 0
+
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        symbols = json.loads(request["messages"][-1]["content"])
+        time.sleep(self.latency)
+        content = json.dumps({"decisions": [{"symbol": s, "action": decide(f)} for s, f in symbols.items()]})
+        prompt_chars = sum(len(m["content"]) for m in request["messages"])
+        body = json.dumps({
+            "id": f"fake-{type(self).requests_served}",
+            "object": "chat.completion",
+            "model": request.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_chars // 4, "completion_tokens": len(content) // 4,
+                      "total_tokens": (prompt_chars + len(content)) // 4},
+        }).encode()
+        type(self).requests_served += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port=8766, latency=0.0, host="127.0.0.1"):
+    FakeLLMHandler.latency = latency
+    server = ThreadingHTTPServer((host, port), FakeLLMHandler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake chat completions server for USE_GPT mode")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds to wait before each answer")
+    args = parser.parse_args()
+    server = serve(args.port, args.latency)
+    print(f"Fake LLM on http://127.0.0.1:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Local stand-in for Alpaca's market data websocket, for exercising stream mode.
+
+Speaks the v2 msgpack protocol that alpaca_trade_api's Stream client expects
+(connect, auth, subscribe) and then pushes one random-walk minute bar per
+subscribed symbol every `--interval` seconds. Point the bot at it with
+ALPACA_MODE=stream ALPACA_DATA_STREAM_URL=http://localhost:8765.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import msgpack
+import websockets
+
+
+def bar_message(symbol, price, ts_ns):
+    return {"T": "b", "S": symbol, "o": price, "h": price, "l": price, "c": price,
+            "v": random.randint(100, 1000), "t": msgpack.Timestamp.from_unix_nano(ts_ns)}
+
+
+class FakeBarServer:
+    def __init__(self, interval=1.0, seed=0, bars=None):
+        self.interval = interval
+        self.bars = bars  # stop after this many bars per symbol, None for forever
+        self.random = random.Random(seed)
+        self.prices = {}
+
+    async def handler(self, websocket, path=None):
+        await websocket.send(msgpack.packb([{"T": "success", "msg": "connected"}]))
+        auth = msgpack.unpackb(await websocket.recv())
+        if auth.get("action") != "auth":
+            await websocket.send(msgpack.packb([{"T": "error", "code": 401, "msg": "not authenticated"}]))
+            return
+        await websocket.send(msgpack.packb([{"T": "success", "msg": "authenticated"}]))
+
+        request = msgpack.unpackb(await websocket.recv())
+        symbols = list(request.get("bars", []))
+        await websocket.send(msgpack.packb([{"T": "subscription", "trades": [], "quotes": [], "bars": symbols}]))
+        updates = asyncio.create_task(self.follow_subscriptions(websocket, symbols))
+
+        ts_ns = (int(time.time()) // 60) * 60 * 10**9
+        sent = 0
+        try:
+            while self.bars is None or sent < self.bars:
+                ts_ns += 60 * 10**9
+                batch = []
+                for symbol in symbols:
+                    price = self.prices.get(symbol, 100.0) * (1 + self.random.gauss(0, 0.002))
+                    self.prices[symbol] = price
+                    batch.append(bar_message(symbol, round(price, 4), ts_ns))
+                await websocket.send(msgpack.packb(batch))
+                sent += 1
+                await asyncio.sleep(self.interval)
+        except websockets.ConnectionClosed:
+            return
+        finally:
+            updates.cancel()
+        await websocket.close()
+
+    async def follow_subscriptions(self, websocket, symbols):
+        """Apply later subscribe/unsubscribe requests to `symbols` in place, like the real stream."""
+        try:
+            async for raw in websocket:
+                request = msgpack.unpackb(raw)
+                bars = request.get("bars", [])
+                if request.get("action") == "subscribe":
+                    symbols.extend(s for s in bars if s not in symbols)
+                elif request.get("action") == "unsubscribe":
+                    symbols[:] = [s for s in symbols if s not in bars]
+                await websocket.send(msgpack.packb([{"T": "subscription", "trades": [], "quotes": [],
+                                                     "bars": symbols}]))
+        except websockets.ConnectionClosed:
+            pass
+
+    async def serve(self, host="localhost", port=8765):
+        async with websockets.serve(self.handler, host, port):
+            await asyncio.Future()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between bars")
+    parser.add_argument("--bars", type=int, default=None, help="bars per symbol before closing")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(FakeBarServer(args.interval, args.seed, args.bars).serve(args.host, args.port))
@@ -1,170 +1,457 @@
 import os
-import openai
+import sys
 import alpaca_trade_api as tradeapi
-from dotenv import load_dotenv
-from datetime import datetime, timezone
+from dotenv import find_dotenv, load_dotenv
+from datetime import datetime, timedelta, timezone
 import time
 import requests
 import logging
+import asyncio
 import pandas as pd
 import json
+import math
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common import metrics
+from common.barstore import BarStore, to_iso
+from common.config import ConfigWatcher, setting
+from common.execution import ALPACA_STATUSES, AlpacaBroker, OrderManager, client_order_id
+from common.ratelimit import endpoint, per_minute, stats as limiter_stats
+from common.signals import BUY, UniverseIndicators, crossover_signals, exit_hit, order_quantities, order_sides
+from streamwatch import StreamFailures, run_stream
+
+def symbol_list(raw):
+    return tuple(s.strip().upper() for s in raw.split(",") if s.strip())
+
+@dataclass(frozen=True)
+class Settings:
+    """Bot settings from the environment and .env; fields with reload=False need a restart."""
+    alpaca_api_key: str = setting(reload=False)
+    alpaca_secret_key: str = setting(reload=False)
+    openai_api_key: str = setting()
+    use_gpt: bool = setting(False)
+    use_rsi: bool = setting(False)
+    use_stop_loss: bool = setting(True)
+    stop_loss_percent: float = setting(3.0)
+    take_profit_percent: float = setting(5.0)
+    stock_symbols: tuple = setting((), parse=symbol_list)
+    loop_interval_minutes: float = setting(5.0)
+    discord_bot_token: str = setting(reload=False)
+    discord_channel_id: str = setting()
+    discord_role_id: str = setting()
+    discord_holdings_channel_id: str = setting()
+    force_buy_mode: bool = setting(False)
+    api_rate_limit_per_minute: int = setting(200)
+    alpaca_mode: str = setting("poll", parse=str.lower, reload=False)
+    alpaca_data_stream_url: str = setting(reload=False)
+    alpaca_data_feed: str = setting("iex", reload=False)
+    stream_max_reconnects: int = setting(5, reload=False)
+    alpaca_metrics_port: int = setting(9102, reload=False)
+    order_poll_seconds: float = setting(2.0, reload=False)
+    position_reconcile_seconds: float = setting(300.0, reload=False)
+    llm_base_url: str = setting("https://api.openai.com/v1")
+    llm_model: str = setting("gpt-4o-mini")
+    llm_batch_size: int = setting(25)
+    llm_concurrency: int = setting(4)
+    llm_timeout_seconds: float = setting(20.0)
+    llm_cache_path: str = setting("llm_decisions.sqlite")
+    llm_input_cost_per_mtok: float = setting(0.15)
+    llm_output_cost_per_mtok: float = setting(0.60)
+
+    def validate(self):
+        if not self.alpaca_api_key or not self.alpaca_secret_key:
+            raise ValueError("ALPACA_API_KEY and ALPACA_SECRET_KEY must be set")
+        if self.alpaca_mode not in ("poll", "stream"):
+            raise ValueError(f"ALPACA_MODE must be poll or stream, not {self.alpaca_mode}")
+        if self.api_rate_limit_per_minute < 1 or self.loop_interval_minutes <= 0 or self.llm_concurrency < 1:
+            raise ValueError("API_RATE_LIMIT_PER_MINUTE, LOOP_INTERVAL_MINUTES and LLM_CONCURRENCY must be positive")
+
+# Settings the decision service is built with; a change rebuilds it
+LLM_SETTINGS = ("openai_api_key", "llm_base_url", "llm_model", "llm_batch_size", "llm_concurrency",
+                "llm_timeout_seconds", "llm_cache_path", "llm_input_cost_per_mtok", "llm_output_cost_per_mtok")
+
+# Parsed once; the watcher applies edits to .env through apply_settings()
+env_path = find_dotenv()
+load_dotenv(env_path)
+config_watcher = ConfigWatcher(Settings, env_path, interval=float(os.getenv("CONFIG_RELOAD_SECONDS", "5")))
+config = config_watcher.settings
+BASE_URL = "https://paper-api.alpaca.markets"
+api = tradeapi.REST(config.alpaca_api_key, config.alpaca_secret_key, base_url=BASE_URL)
+
+# Alpaca's request limit is per account, so all endpoints share one bucket.
+# Orders are not retried: a retried submit could place a duplicate order.
+api_bucket = per_minute(config.api_rate_limit_per_minute)
+endpoint("alpaca.orders", bucket=api_bucket, retries=0)
+
+def alpaca(name, fn, *args, **kwargs):
+    """Call an Alpaca REST method through the shared limiter and retry layer."""
+    with metrics.histogram("alpaca_request_seconds", "Alpaca REST calls, limiter wait included").time(request=name):
+        return endpoint(f"alpaca.{name}", bucket=api_bucket).call(fn, *args, **kwargs)
 
-def load_config():
-    load_dotenv()
-    cfg = {
-        "ALPACA_API_KEY": os.getenv("ALPACA_API_KEY"),
-        "ALPACA_SECRET_KEY": os.getenv("ALPACA_SECRET_KEY"),
-        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY"),
-        "USE_GPT": os.getenv("USE_GPT", "false").lower() == "true",
-        "USE_RSI": os.getenv("USE_RSI", "false").lower() == "true",
-        "USE_STOP_LOSS": os.getenv("USE_STOP_LOSS", "true").lower() == "true",
-        "STOP_LOSS_PERCENT": float(os.getenv("STOP_LOSS_PERCENT", "3.0")),
-        "TAKE_PROFIT_PERCENT": float(os.getenv("TAKE_PROFIT_PERCENT", "5.0")),
-        "STOCK_SYMBOLS": [s.strip().upper() for s in os.getenv("STOCK_SYMBOLS", "").split(",") if s.strip()],
-        "LOOP_INTERVAL_MINUTES": float(os.getenv("LOOP_INTERVAL_MINUTES", "5")),
-        "DISCORD_BOT_TOKEN": os.getenv("DISCORD_BOT_TOKEN"),
-        "DISCORD_CHANNEL_ID": os.getenv("DISCORD_CHANNEL_ID"),
-        "DISCORD_ROLE_ID": os.getenv("DISCORD_ROLE_ID"),
-        "DISCORD_HOLDINGS_CHANNEL_ID": os.getenv("DISCORD_HOLDINGS_CHANNEL_ID"),
-        "FORCE_BUY_MODE": os.getenv("FORCE_BUY_MODE", "false").lower() == "true",
-        "TRADE_BUFFER_SECONDS": float(os.getenv("TRADE_BUFFER_SECONDS", "5"))
-    }
-    if not cfg["ALPACA_API_KEY"] or not cfg["ALPACA_SECRET_KEY"]:
-        raise RuntimeError("ALPACA_API_KEY and ALPACA_SECRET_KEY must be set")
-    return cfg
-
-config = load_config()
-openai.api_key = config["OPENAI_API_KEY"]
-api = tradeapi.REST(config["ALPACA_API_KEY"], config["ALPACA_SECRET_KEY"], base_url="https://paper-api.alpaca.markets")
-
-logging.basicConfig(filename='trading_bot.log', level=logging.INFO, format='%(asctime)s %(message)s')
 POSITION_SIZE = 1
 last_discord_message_ids = {}
 HEADERS = {
-    "Authorization": f"Bot {config['DISCORD_BOT_TOKEN']}",
+    "Authorization": f"Bot {config.discord_bot_token}",
     "Content-Type": "application/json"
 }
 
 symbol_cost_basis = {}
 previous_prices = {}
+universe = UniverseIndicators()
 
-def get_position_price(symbol):
-    try:
-        position = api.get_position(symbol)
-        return float(position.avg_entry_price)
-    except:
-        return None
-
-def should_stop_loss(symbol, current_price):
-    entry_price = get_position_price(symbol)
-    if not entry_price:
-        return False
-    loss = ((entry_price - current_price) / entry_price) * 100
-    return loss >= config["STOP_LOSS_PERCENT"]
+bar_store = None
 
-def should_take_profit(symbol, current_price):
-    entry_price = get_position_price(symbol)
-    if not entry_price:
-        return False
-    gain = ((current_price - entry_price) / entry_price) * 100
-    return gain >= config["TAKE_PROFIT_PERCENT"]
-
-def calc_rsi(data, period=14):
-    delta = data['close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(period).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(period).mean()
-    rs = gain / loss
-    return 100 - (100 / (1 + rs))
-
-def combined_strategy(data):
-    data['ema12'] = data['close'].ewm(span=12, adjust=False).mean()
-    data['ema26'] = data['close'].ewm(span=26, adjust=False).mean()
-    signal = "HOLD"
-
-    if config["USE_RSI"]:
-        data['rsi'] = calc_rsi(data)
-        if data['rsi'].iloc[-1] < 30:
-            signal = "BUY"
-        elif data['rsi'].iloc[-1] > 70:
-            signal = "SELL"
-
-    if data['ema12'].iloc[-2] < data['ema26'].iloc[-2] and data['ema12'].iloc[-1] > data['ema26'].iloc[-1]:
-        signal = "BUY"
-    elif data['ema12'].iloc[-2] > data['ema26'].iloc[-2] and data['ema12'].iloc[-1] < data['ema26'].iloc[-1]:
-        signal = "SELL"
-
-    return signal
+def get_bar_store():
+    """Open the bar store on first use rather than at import time."""
+    global bar_store
+    if bar_store is None:
+        bar_store = BarStore(os.getenv("BAR_STORE_PATH", "bars.sqlite"))
+    return bar_store
+
+BAR_TIMEFRAME = "1Min"
+BAR_LIMIT = 50
+
+order_manager = None
+
+def log_fill(order, qty, price):
+    logging.info(f"Filled {order.side.upper()} {qty:g} {order.symbol} at ${price:.2f} ({order.status})")
+
+def get_order_manager():
+    """Start order submission and fill tracking on first use, seeding the position book from REST."""
+    global order_manager
+    if order_manager is None:
+        order_manager = OrderManager(AlpacaBroker(api, alpaca), poll_interval=config.order_poll_seconds,
+                                     reconcile_interval=config.position_reconcile_seconds,
+                                     on_fill=log_fill, name="alpaca")
+        order_manager.reconcile()
+        metrics.register_stats("orders", order_manager.stats)
+    return order_manager
+
+def get_positions():
+    """Open positions from the position book, indexed by symbol; no REST round trip."""
+    return get_order_manager().book.snapshot()
+
+def get_position_price(symbol, positions=None):
+    position = (positions if positions is not None else get_positions()).get(symbol)
+    return float(position.avg_entry_price) if position else None
+
+def should_exit(symbol, current_price, positions=None):
+    """True if the held position has hit its stop-loss or take-profit."""
+    positions = positions if positions is not None else get_positions()
+    qty = float(positions[symbol].qty) if symbol in positions else 0.0
+    return bool(exit_hit(qty, get_position_price(symbol, positions) or 0.0, current_price,
+                         config.stop_loss_percent, config.take_profit_percent))
+
+def indicator_signals(symbols):
+    """RSI and EMA12/EMA26 crossover signal per symbol, evaluated for all of them at once."""
+    rows = universe.rows(symbols)
+    signals = crossover_signals(universe.ema_fast[rows], universe.ema_slow[rows],
+                                universe.ema_fast_prev[rows], universe.ema_slow_prev[rows],
+                                universe.rsi[rows] if config.use_rsi else None)
+    return dict(zip(symbols, signals))
+
+def store_bars(symbol, new_bars):
+    if new_bars is not None and len(new_bars):
+        get_bar_store().append(symbol, BAR_TIMEFRAME, zip(
+            new_bars.index, new_bars['open'], new_bars['high'], new_bars['low'],
+            new_bars['close'], new_bars['volume']))
+
+def fetch_bars(symbol):
+    """Fetch only bars since the newest stored one and return the last BAR_LIMIT bars."""
+    return fetch_bars_batch([symbol])[symbol]
+
+def fetch_bars_batch(symbols):
+    """Update the bar store for many symbols and return the last BAR_LIMIT bars of each.
+
+    Symbols already in the store share one multi-symbol request starting at the
+    oldest of their last timestamps, but no earlier than BAR_LIMIT minutes ago,
+    so one stale symbol (halted, or re-added after days) cannot make every round
+    page through all bars since then; it is left with a gap before its newest
+    BAR_LIMIT bars. Symbols with no stored bars get a one-off limit request each,
+    since the limit applies to the whole multi-symbol response.
+    """
+    last_seen = {symbol: get_bar_store().last_timestamp(symbol, BAR_TIMEFRAME) for symbol in symbols}
+    warm = [symbol for symbol, last in last_seen.items() if last is not None]
+    for symbol in symbols:
+        if last_seen[symbol] is None:
+            store_bars(symbol, alpaca("bars", api.get_bars, symbol, BAR_TIMEFRAME, limit=BAR_LIMIT).df)
+    if warm:
+        oldest_needed = to_iso(datetime.now(timezone.utc) - timedelta(minutes=BAR_LIMIT))  # 1Min bars
+        start = max(min(last_seen[s] for s in warm), oldest_needed)
+        new_bars = alpaca("bars", api.get_bars, warm, BAR_TIMEFRAME, start=start).df
+        if new_bars is not None and len(new_bars):
+            if 'symbol' in new_bars:
+                for symbol, group in new_bars.groupby('symbol'):
+                    store_bars(symbol, group)
+            else:
+                store_bars(warm[0], new_bars)
+    return {symbol: bars_frame(get_bar_store().load(symbol, BAR_TIMEFRAME, limit=BAR_LIMIT)) for symbol in symbols}
+
+def bars_frame(rows):
+    return pd.DataFrame(rows, columns=["timestamp", "open", "high", "low", "close", "volume"]).set_index("timestamp")
+
+@metrics.timed("indicator_seconds", "Indicator update for all symbols in a round")
+def update_indicators(bars_by_symbol):
+    """Feed each symbol's bars newer than the last seen one into the shared indicator state."""
+    return universe.update_many({symbol: bars['close'].to_numpy() for symbol, bars in bars_by_symbol.items()},
+                                {symbol: bars.index for symbol, bars in bars_by_symbol.items()})
 
 
-def ask_gpt_action(current_price, symbol):
-    """Use OpenAI to suggest BUY, SELL, or HOLD."""
-    prompt = (
-        f"The current price of {symbol} is {current_price:.2f}. "
-        "Respond with BUY, SELL, or HOLD for a short-term trade."
-    )
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=1,
-            temperature=0,
-        )
-        action = response.choices[0].message["content"].strip().upper()
-        if action in {"BUY", "SELL", "HOLD"}:
-            return action
-    except Exception as e:
-        logging.error(f"OpenAI error: {e}")
-    return "HOLD"
+decision_service = None
 
-def run_bot():
-    global config
-    config = load_config()  # Re-load on each loop
+def get_decision_service():
+    """Create the LLM decision service on first use, only when USE_GPT is on."""
+    global decision_service
+    if decision_service is None:
+        from decisions import DecisionService
+        decision_service = DecisionService(
+            config.openai_api_key, base_url=config.llm_base_url, model=config.llm_model,
+            batch_size=config.llm_batch_size, concurrency=config.llm_concurrency,
+            timeout=config.llm_timeout_seconds, cache_path=config.llm_cache_path,
+            input_cost_per_mtok=config.llm_input_cost_per_mtok,
+            output_cost_per_mtok=config.llm_output_cost_per_mtok)
+    return decision_service
+
+def decision_features(row, current_price):
+    """Price and indicator values sent to the LLM; NaN (not enough bars yet) becomes null."""
+    values = {"close": current_price, "sma5": row["sma"], "rsi": row["rsi"], "ema12": row["ema_fast"],
+              "ema26": row["ema_slow"], "macd": row["macd"], "macd_hist": row["macd_hist"]}
+    return {k: None if math.isnan(v) else round(float(v), 4) for k, v in values.items()}
+
+def gpt_actions(candidates):
+    """BUY/SELL/HOLD per symbol for [(symbol, current_price)] in one batched LLM round."""
+    items = []
+    for symbol, price in candidates:
+        row = universe.row(symbol)
+        items.append((symbol, row["last_timestamp"], decision_features(row, price)))
+    return get_decision_service().decide(items)
+
+@metrics.timed("strategy_seconds", "Strategy overrides per symbol")
+def decide_action(symbol, current_price, signal, positions, suggestion=None):
+    """Strategy signal with stop-loss/take-profit overrides; returns (action, position_qty).
+
+    `signal` is the symbol's indicator_signals() result. With USE_GPT,
+    `suggestion` is its answer from a batched gpt_actions() round; without one
+    the symbol is asked on its own.
+    """
+    position_qty = int(positions[symbol].qty) if symbol in positions else 0
+
+    if config.force_buy_mode:
+        action = "BUY"
+    elif config.use_gpt:
+        action = suggestion or gpt_actions([(symbol, current_price)])[symbol]
+    else:
+        action = signal
+
+    if config.use_stop_loss and not config.force_buy_mode and should_exit(symbol, current_price, positions):
+        action = "SELL"
+
+    return action, position_qty
+
+def execute_action(symbol, action, position_qty, current_price):
+    """Queue the order for an action if the position allows it; returns True if one was queued.
+
+    Orders are submitted and tracked in the background. The client order ID is
+    derived from the symbol's latest bar, so a decision is placed at most once.
+    """
+    manager = get_order_manager()
+    order_side = order_sides(action, position_qty)
+    if not order_side:
+        return False
+    if manager.has_open(symbol):
+        logging.info(f"{action} {symbol} skipped: an order is still open")
+        return False
+    side = "buy" if order_side == BUY else "sell"
+    qty = order_quantities(order_side, position_qty, POSITION_SIZE, POSITION_SIZE).item()
+    bar_ts = universe.last_timestamp[universe.index[symbol]] if symbol in universe.index else None
+    manager.submit(symbol, side, qty, client_order_id("alpaca", symbol, side, bar_ts))
+    logging.info(f"{action} {symbol} at ${current_price:.2f}")
+    metrics.counter("orders_total", "Orders queued by side").inc(side=side)
+    return True
 
+@metrics.timed("cycle_seconds", "Full polling round")
+def run_bot():
     print("Running bot round...")
-    clock = api.get_clock()
+    clock = alpaca("clock", api.get_clock)
     if not clock.is_open:
         print("Market closed. Skipping.")
         logging.info("Market closed. Skipping.")
         return
 
-    for symbol in config["STOCK_SYMBOLS"]:
+    try:
+        positions = get_positions()
+        all_bars = fetch_bars_batch(config.stock_symbols)
+    except Exception as e:
+        logging.error(f"Error fetching positions or bars: {e}")
+        print(f"Error fetching positions or bars: {e}")
+        return
+
+    candidates = []
+    for symbol in config.stock_symbols:
         try:
             print(f"Evaluating {symbol}...")
-            bars = api.get_bars(symbol, "1Min", limit=50).df
+            bars = all_bars.get(symbol)
             if bars is None or len(bars) < 30:
                 print(f"Skipping {symbol}: insufficient data ({len(bars) if bars is not None else 'None'})")
                 logging.warning(f"Skipping {symbol}: insufficient data ({len(bars) if bars is not None else 'None'})")
                 continue
+            candidates.append((symbol, bars['close'].iloc[-1]))
+        except Exception as e:
+            logging.error(f"Error with {symbol}: {e}")
+            print(f"Error with {symbol}: {e}")
+    if not candidates:
+        return
 
-            current_price = bars['close'].iloc[-1]
-            position_qty = int(api.get_position(symbol).qty) if symbol in [p.symbol for p in api.list_positions()] else 0
+    # Indicators and signals for every symbol in one vectorized pass, and one
+    # batched LLM round instead of a blocking call per symbol.
+    update_indicators({symbol: all_bars[symbol] for symbol, _ in candidates})
+    signals = indicator_signals([symbol for symbol, _ in candidates])
+    suggestions = gpt_actions(candidates) if config.use_gpt and not config.force_buy_mode else {}
 
-            if config["FORCE_BUY_MODE"]:
-                action = "BUY"
-            else:
-                action = ask_gpt_action(current_price, symbol) if config["USE_GPT"] else combined_strategy(bars)
+    for symbol, current_price in candidates:
+        try:
+            action, position_qty = decide_action(symbol, current_price, signals[symbol], positions,
+                                                 suggestions.get(symbol))
+            execute_action(symbol, action, position_qty, current_price)
+        except Exception as e:
+            logging.error(f"Error with {symbol}: {e}")
+            print(f"Error with {symbol}: {e}")
 
-            if config["USE_STOP_LOSS"] and position_qty > 0 and not config["FORCE_BUY_MODE"]:
-                if should_stop_loss(symbol, current_price):
-                    action = "SELL"
-                elif should_take_profit(symbol, current_price):
-                    action = "SELL"
+    logging.info(f"API limiter state: {limiter_stats()}")
 
-            if action == "BUY" and position_qty == 0:
-                api.submit_order(symbol=symbol, qty=POSITION_SIZE, side='buy', type='market', time_in_force='gtc')
-                logging.info(f"BUY {symbol} at ${current_price:.2f}")
-            elif action == "SELL" and position_qty > 0:
-                api.submit_order(symbol=symbol, qty=POSITION_SIZE, side='sell', type='market', time_in_force='gtc')
-                logging.info(f"SELL {symbol} at ${current_price:.2f}")
+class BarStreamRunner:
+    """Evaluates the strategy on every streamed minute bar.
 
-            time.sleep(config["TRADE_BUFFER_SECONDS"])
+    Bars for one symbol are handled in arrival order under a per-symbol lock,
+    while different symbols proceed independently. Decisions that may block (GPT)
+    run in worker threads so they never stall the stream; orders are queued to
+    the order manager, and trade updates from the stream feed its fills.
+    """
 
-        except Exception as e:
-            logging.error(f"Error with {symbol}: {e}")
-            print(f"Error with {symbol}: {e}")
+    def __init__(self, symbols, max_reconnects=5):
+        self.symbols = list(symbols)
+        self.failures = StreamFailures(max_reconnects)
+        self.locks = defaultdict(asyncio.Lock)
+        self.tasks = set()
+        self.stream = None
+        self.loop = None
 
-if __name__ == "__main__":
+    async def warm_up(self):
+        """Seed indicator state from the bar store and the position book from REST before streaming."""
+        all_bars = await asyncio.to_thread(fetch_bars_batch, self.symbols)
+        update_indicators(all_bars)
+        await asyncio.to_thread(get_order_manager)
+
+    async def on_trade_update(self, data):
+        order = data.order  # raw order dict
+        get_order_manager().update(order.get("client_order_id"), ALPACA_STATUSES.get(order.get("status"), "submitted"),
+                                   order.get("filled_qty"), order.get("filled_avg_price"), order.get("id"))
+
+    async def on_bar(self, bar):
+        self.failures.reset()
+        task = asyncio.create_task(self.handle_bar(bar))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def handle_bar(self, bar):
+        symbol = bar.symbol
+        async with self.locks[symbol]:
+            with metrics.histogram("bar_handling_seconds", "Streamed bar to decision and order").time():
+                try:
+                    ts = to_iso(pd.Timestamp(bar.timestamp, unit='ns', tz='UTC'))
+                    get_bar_store().append(symbol, BAR_TIMEFRAME, [(ts, bar.open, bar.high, bar.low, bar.close, bar.volume)])
+                    applied = universe.update_many({symbol: [bar.close]}, {symbol: [ts]})
+                    if not applied[symbol] or universe.count[universe.index[symbol]] < 30:
+                        return
+                    signal = indicator_signals([symbol])[symbol]
+                    action, position_qty = await asyncio.to_thread(
+                        decide_action, symbol, bar.close, signal, get_positions())
+                    execute_action(symbol, action, position_qty, bar.close)
+                except Exception as e:
+                    logging.error(f"Error with {symbol}: {e}")
+
+    async def run(self):
+        from alpaca_trade_api.common import URL
+        from alpaca_trade_api.stream import Stream
+
+        await self.warm_up()
+        stream_url = config.alpaca_data_stream_url
+        stream = Stream(config.alpaca_api_key, config.alpaca_secret_key, base_url=URL(BASE_URL),
+                        data_stream_url=URL(stream_url) if stream_url else None,
+                        data_feed=config.alpaca_data_feed)
+        stream.subscribe_bars(self.on_bar, *self.symbols)
+        stream.subscribe_trade_updates(self.on_trade_update)
+        self.stream, self.loop = stream, asyncio.get_running_loop()
+        logging.info(f"Streaming bars for {len(self.symbols)} symbols")
+        try:
+            await run_stream(stream, self.failures)
+        finally:
+            self.stream = None
+
+    def set_symbols(self, symbols):
+        """Stream a new symbol list: seed added symbols' indicators, then change the subscription.
+
+        Called from the config watcher thread; the indicator update runs on the
+        event loop so it never interleaves with a bar being handled.
+        """
+        added = [s for s in symbols if s not in self.symbols]
+        removed = [s for s in self.symbols if s not in symbols]
+        if added:
+            all_bars = fetch_bars_batch(added)
+
+            async def seed():
+                update_indicators(all_bars)
+
+            asyncio.run_coroutine_threadsafe(seed(), self.loop).result()
+            self.stream.subscribe_bars(self.on_bar, *added)
+        if removed:
+            self.stream.unsubscribe_bars(*removed)
+        self.symbols = list(symbols)
+        logging.info(f"Streaming bars for {len(self.symbols)} symbols (+{len(added)} -{len(removed)})")
+
+# Held by each polling round, so a settings change is applied between rounds, never during one
+cycle_lock = threading.Lock()
+stream_runner = None
+
+def apply_settings(old, new):
+    """Apply reloaded settings: the shared rate limit, the LLM service and, in stream mode, the subscription."""
+    global config, decision_service
+    with cycle_lock:
+        config = new
+        if new.api_rate_limit_per_minute != old.api_rate_limit_per_minute:
+            limit = new.api_rate_limit_per_minute
+            api_bucket.set_rate(limit / 60.0, max(1, limit // 10))
+        if decision_service is not None and any(getattr(old, f) != getattr(new, f) for f in LLM_SETTINGS):
+            # Rebuilt on next use with the new model, batch size and pool size
+            decision_service.executor.shutdown(wait=False)
+            decision_service = None
+    if stream_runner is not None and stream_runner.stream is not None and new.stock_symbols != old.stock_symbols:
+        stream_runner.set_symbols(new.stock_symbols)
+
+def run_polling():
     while True:
-        run_bot()
-        time.sleep(config["LOOP_INTERVAL_MINUTES"] * 60)
+        with cycle_lock:
+            run_bot()
+        time.sleep(config.loop_interval_minutes * 60)
 
+if __name__ == "__main__":
+    logging.basicConfig(filename='trading_bot.log', level=logging.INFO, format='%(asctime)s %(message)s')
+    metrics.register_stats("limiter", limiter_stats, label="endpoint")
+    metrics.serve(config.alpaca_metrics_port)
+    config_watcher.subscribe(apply_settings)
+    config_watcher.start()
+    if config.alpaca_mode == "stream":
+        try:
+            stream_runner = BarStreamRunner(config.stock_symbols, config.stream_max_reconnects)
+            asyncio.run(stream_runner.run())
+        except Exception as e:
+            logging.error(f"Bar stream failed, falling back to polling: {e}")
+            print(f"Bar stream failed, falling back to polling: {e}")
+            run_polling()
+    else:
+        run_polling()
+
@@ -0,0 +1,82 @@
+"""Reconnect limit for alpaca_trade_api's Stream, so stream mode can fall back to polling.
+
+Stream.run() starts its own event loop to drive Stream._run_forever(), which
+only returns after stop_ws(): the data websocket reconnects after every error
+and reports it only in the library's log. run_stream() drives the same
+coroutine in the running loop and counts connection attempts from that log.
+
+Both the coroutine and the log text are internals of the pinned version
+(TESTED_VERSION, see requirements.txt). If the expected log record does not
+appear soon after the stream starts, run_stream() raises instead of running
+without a limit.
+"""
+import asyncio
+import logging
+
+TESTED_VERSION = "3.2.0"
+STREAM_LOGGER = "alpaca_trade_api.stream"
+
+
+def is_connection_attempt(message):
+    """True for the "starting (stock) data websocket connection" record the data stream logs per attempt."""
+    return message.startswith("starting") and message.endswith("data websocket connection")
+
+
+class StreamFailures(logging.Handler):
+    """Counts the data websocket connections a Stream opens without receiving a bar.
+
+    Each connection attempt logged by the library counts one; reset() on a bar
+    clears the count. `started` is set by the first attempt, `exceeded` once
+    more than `limit` reconnects in a row brought no bar.
+    """
+
+    def __init__(self, limit):
+        super().__init__(logging.INFO)
+        self.limit = limit
+        self.attempts = 0
+        self.started = asyncio.Event()
+        self.exceeded = asyncio.Event()
+
+    def emit(self, record):
+        if is_connection_attempt(record.getMessage()):
+            self.attempts += 1
+            self.started.set()
+            if self.attempts - 1 > self.limit:
+                self.exceeded.set()
+
+    def reset(self):
+        self.attempts = 0
+
+    async def watch(self, first_attempt_timeout):
+        """Raise RuntimeError when the first attempt is never logged or the limit is exceeded."""
+        try:
+            await asyncio.wait_for(self.started.wait(), first_attempt_timeout)
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"{STREAM_LOGGER} logged no data websocket connection within "
+                               f"{first_attempt_timeout:g}s, so reconnects cannot be counted; "
+                               f"the reconnect limit was written against alpaca-trade-api=={TESTED_VERSION}") from None
+        await self.exceeded.wait()
+        raise RuntimeError(f"no bars after {self.limit} stream reconnects")
+
+
+async def run_stream(stream, failures, first_attempt_timeout=30.0):
+    """Run a Stream in the running loop until it is stopped, or raise RuntimeError when `failures` gives up."""
+    log = logging.getLogger(STREAM_LOGGER)
+    level = log.level
+    if not log.isEnabledFor(logging.INFO):
+        log.setLevel(logging.INFO)
+    log.addHandler(failures)
+    task = asyncio.ensure_future(stream._run_forever())
+    watch = asyncio.ensure_future(failures.watch(first_attempt_timeout))
+    try:
+        await asyncio.wait({task, watch}, return_when=asyncio.FIRST_COMPLETED)
+        if watch.done():
+            watch.result()
+        await task
+    finally:
+        watch.cancel()
+        log.removeHandler(failures)
+        log.setLevel(level)
+        await stream.stop_ws()
+        await asyncio.wait({task}, timeout=10)
+        task.cancel()
@@ -0,0 +1,255 @@
+"""In-process stand-in for Robinhood (robin_stocks) and Alpaca (alpaca_trade_api).
+
+FakeBroker serves bars, quotes, positions and immediate order fills from a
+market data source on a simulated clock, and counts every API call. install()
+puts fake `robin_stocks.robinhood` and `alpaca_trade_api` modules in
+sys.modules, so it must run before the bots are imported.
+
+Market data is either SyntheticMarket, which is deterministic for a seed and
+needs no memory per symbol, or RecordedMarket, loaded from a CSV with
+timestamp, symbol and close columns.
+"""
+import sys
+import threading
+import types
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import requests
+
+ROBINHOOD_INTERVALS = {"5minute": 300, "10minute": 600, "hour": 3600, "day": 86400}
+ROBINHOOD_SPANS = {"day": 86400, "week": 7 * 86400, "month": 30 * 86400}
+ALPACA_TIMEFRAMES = {"1Min": 60, "5Min": 300, "15Min": 900, "1Hour": 3600, "1Day": 86400}
+
+
+def _hash_noise(seed, steps):
+    """Deterministic uniform noise in [-1, 1) per integer step (splitmix64)."""
+    x = steps.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15) + np.uint64(seed)
+    x ^= x >> np.uint64(30)
+    x *= np.uint64(0xBF58476D1CE4E5B9)
+    x ^= x >> np.uint64(27)
+    x *= np.uint64(0x94D049BB133111EB)
+    x ^= x >> np.uint64(31)
+    return (x >> np.uint64(11)).astype(np.float64) / 2.0 ** 53 * 2 - 1
+
+
+class SyntheticMarket:
+    """Prices as a closed-form function of (symbol, minute): two cycles plus hashed noise.
+
+    Any bar can be computed directly, so serving 500 symbols needs no stored series.
+    """
+
+    def __init__(self, seed=0):
+        self.seed = seed
+
+    def prices(self, symbol, epochs):
+        """Close prices at the given epoch seconds (floored to the minute)."""
+        s = zlib.crc32(symbol.encode()) ^ self.seed
+        rng = np.random.default_rng(s)
+        base = rng.uniform(20, 500)
+        slow, fast = rng.uniform(240, 720), rng.uniform(47, 97)
+        phase1, phase2 = rng.uniform(0, 2 * np.pi, 2)
+        minutes = np.asarray(epochs, dtype=np.int64) // 60
+        log_price = (0.02 * np.sin(2 * np.pi * minutes / slow + phase1)
+                     + 0.01 * np.sin(2 * np.pi * minutes / fast + phase2)
+                     + 0.002 * _hash_noise(s, minutes))
+        return base * np.exp(log_price)
+
+
+class RecordedMarket:
+    """Prices replayed from a CSV of timestamp, symbol, close rows.
+
+    The price at a time is the last recorded close at or before it (NaN before
+    the first one).
+    """
+
+    def __init__(self, csv_path):
+        df = pd.read_csv(csv_path)
+        df["epoch"] = pd.to_datetime(df["timestamp"], utc=True).astype("int64") // 10**9
+        self.series = {symbol: (group["epoch"].to_numpy(), group["close"].to_numpy(dtype=float))
+                       for symbol, group in df.sort_values("epoch").groupby("symbol")}
+
+    def symbols(self):
+        return sorted(self.series)
+
+    def prices(self, symbol, epochs):
+        times, closes = self.series[symbol]
+        idx = np.searchsorted(times, np.asarray(epochs, dtype=np.int64), side="right") - 1
+        out = np.full(len(idx), np.nan)
+        out[idx >= 0] = closes[idx[idx >= 0]]
+        return out
+
+
+class APIError(Exception):
+    """alpaca_trade_api.rest.APIError as far as AlpacaBroker reads it."""
+
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.code = code
+
+
+class FakeBroker:
+    """Serves market data at a simulated time and fills orders immediately."""
+
+    def __init__(self, market, start):
+        self.market = market
+        self.now = start.astimezone(timezone.utc).replace(second=0, microsecond=0)
+        self.calls = Counter()
+        self.lock = threading.Lock()
+        self.positions = {}  # symbol -> (qty, avg_entry_price)
+        self.orders = []
+        self.orders_by_client_id = {}
+
+    def advance(self, seconds):
+        self.now += timedelta(seconds=seconds)
+
+    def count(self, name):
+        with self.lock:
+            self.calls[name] += 1
+
+    def bar_times(self, step, start=None, count=None):
+        """Epoch seconds of the bars of `step` seconds up to now, from `start` or the last `count`."""
+        end = int(self.now.timestamp()) // step * step
+        first = end - (count - 1) * step if start is None else -(-int(start.timestamp()) // step) * step
+        return np.arange(first, end + 1, step, dtype=np.int64)
+
+    def price(self, symbol):
+        return float(self.market.prices(symbol, [int(self.now.timestamp())])[0])
+
+    # Robinhood (robin_stocks.robinhood)
+
+    def rh_historicals(self, symbol, interval="5minute", span="week", **kwargs):
+        self.count("robinhood.historicals")
+        step = ROBINHOOD_INTERVALS[interval]
+        times = self.bar_times(step, count=ROBINHOOD_SPANS[span] // step)
+        closes = self.market.prices(symbol, times)
+        return [{"begins_at": datetime.fromtimestamp(t, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                 "open_price": f"{c:.6f}", "high_price": f"{c:.6f}", "low_price": f"{c:.6f}",
+                 "close_price": f"{c:.6f}", "volume": "0"}
+                for t, c in zip(times.tolist(), closes.tolist()) if c == c]
+
+    def rh_crypto_quote(self, symbol, **kwargs):
+        self.count("robinhood.quote")
+        return {"symbol": symbol, "mark_price": f"{self.price(symbol):.6f}"}
+
+    def rh_latest_price(self, symbols, **kwargs):
+        self.count("robinhood.latest_price")
+        symbols = [symbols] if isinstance(symbols, str) else symbols
+        return [f"{self.price(symbol):.6f}" for symbol in symbols]
+
+    def rh_crypto_positions(self, **kwargs):
+        self.count("robinhood.positions")
+        with self.lock:
+            return [{"currency": {"code": symbol}, "quantity": str(qty)}
+                    for symbol, (qty, _) in self.positions.items()]
+
+    def robinhood_module(self):
+        crypto = types.SimpleNamespace(
+            get_crypto_historicals=self.rh_historicals, get_crypto_quote=self.rh_crypto_quote,
+            get_crypto_positions=self.rh_crypto_positions)
+        stocks = types.SimpleNamespace(
+            get_stock_historicals=self.rh_historicals, get_latest_price=self.rh_latest_price)
+        module = types.ModuleType("robin_stocks.robinhood")
+        module.crypto, module.stocks = crypto, stocks
+        module.login = lambda *args, **kwargs: {"access_token": "replay"}
+        module.logout = lambda: None
+        module.globals = types.ModuleType("robin_stocks.robinhood.globals")
+        module.globals.SESSION = requests.Session()
+        return module
+
+    # Alpaca (alpaca_trade_api.REST)
+
+    def fill(self, symbol, qty, side, client_order_id=None):
+        price = self.price(symbol)
+        qty = float(qty)
+        with self.lock:
+            held, avg = self.positions.get(symbol, (0.0, 0.0))
+            if side == "buy":
+                held, avg = held + qty, (held * avg + qty * price) / (held + qty)
+            else:
+                held = held - qty
+            if held > 0:
+                self.positions[symbol] = (held, avg)
+            else:
+                self.positions.pop(symbol, None)
+            order = types.SimpleNamespace(id=str(len(self.orders) + 1), client_order_id=client_order_id,
+                                          symbol=symbol, qty=str(qty), side=side, status="filled",
+                                          filled_qty=str(qty), filled_avg_price=str(price))
+            self.orders.append(order)
+            if client_order_id:
+                self.orders_by_client_id[client_order_id] = order
+        return order
+
+    def alpaca_rest(self):
+        broker = self
+
+        class REST:
+            def __init__(self, *args, **kwargs):
+                pass
+
+            def get_clock(self):
+                broker.count("alpaca.clock")
+                return types.SimpleNamespace(is_open=True, timestamp=broker.now)
+
+            def _position(self, symbol, qty, avg):
+                return types.SimpleNamespace(symbol=symbol, qty=str(int(qty)), avg_entry_price=str(avg),
+                                             current_price=str(broker.price(symbol)))
+
+            def list_positions(self):
+                broker.count("alpaca.positions")
+                with broker.lock:
+                    held = list(broker.positions.items())
+                return [self._position(symbol, qty, avg) for symbol, (qty, avg) in held]
+
+            def get_position(self, symbol):
+                broker.count("alpaca.position")
+                with broker.lock:
+                    qty, avg = broker.positions[symbol]
+                return self._position(symbol, qty, avg)
+
+            def get_bars(self, symbols, timeframe, start=None, limit=None, **kwargs):
+                broker.count("alpaca.bars")
+                step = ALPACA_TIMEFRAMES[str(timeframe)]
+                start = pd.Timestamp(start).to_pydatetime() if start is not None else None
+                times = broker.bar_times(step, start=start, count=limit or 1000)
+                frames = []
+                for symbol in ([symbols] if isinstance(symbols, str) else symbols):
+                    closes = broker.market.prices(symbol, times)
+                    frame = pd.DataFrame({"open": closes, "high": closes, "low": closes, "close": closes,
+                                          "volume": 100.0},
+                                         index=pd.to_datetime(times, unit="s", utc=True).rename("timestamp"))
+                    frame = frame.dropna()
+                    if not isinstance(symbols, str):
+                        frame["symbol"] = symbol
+                    frames.append(frame)
+                return types.SimpleNamespace(df=pd.concat(frames) if frames else pd.DataFrame())
+
+            def submit_order(self, symbol, qty, side, type="market", time_in_force="gtc", client_order_id=None,
+                             **kwargs):
+                broker.count("alpaca.orders")
+                if client_order_id in broker.orders_by_client_id:
+                    raise APIError("client_order_id must be unique", 40010001)
+                return broker.fill(symbol, qty, side, client_order_id)
+
+            def get_order_by_client_order_id(self, client_order_id):
+                broker.count("alpaca.order")
+                return broker.orders_by_client_id[client_order_id]
+
+        return REST
+
+
+def install(broker):
+    """Replace robin_stocks and alpaca_trade_api with fakes backed by `broker`."""
+    robinhood = broker.robinhood_module()
+    package = types.ModuleType("robin_stocks")
+    package.robinhood = robinhood
+    sys.modules["robin_stocks"] = package
+    sys.modules["robin_stocks.robinhood"] = robinhood
+    sys.modules["robin_stocks.robinhood.globals"] = robinhood.globals
+
+    alpaca = types.ModuleType("alpaca_trade_api")
+    alpaca.REST = broker.alpaca_rest()
+    sys.modules["alpaca_trade_api"] = alpaca
@@ -0,0 +1,158 @@
+"""Run robinhood_bot or alpaca_bot cycles against the fake broker on a simulated clock.
+
+Cycles run back to back while the broker's clock advances by the bot's loop
+interval, so a day of trading replays in seconds. Each cycle reports wall
+latency, broker API calls and resident memory; the summary is printed as one
+JSON object.
+
+Caches and client-side rate limits are disabled so every cycle does the full
+work a cold, unthrottled cycle would.
+
+    python benchmarks/replay.py --bot robinhood --symbols 100 --cycles 10
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+BASE = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from fake_broker import FakeBroker, RecordedMarket, SyntheticMarket, install
+
+INTERVALS = {"robinhood": 300, "alpaca": 300}
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def configure(bot, symbols, workdir):
+    """Environment for the bot module, set before it is imported."""
+    env = {
+        "BAR_STORE_PATH": os.path.join(workdir, "bars.sqlite"),
+        "JOURNAL_DIR": os.path.join(workdir, "journal"),
+        "DISCORD_WEBHOOK_URL": "",
+        "ROBINHOOD_METRICS_PORT": "0",
+        "ALPACA_METRICS_PORT": "0",
+    }
+    if bot == "robinhood":
+        env.update({
+            "SYMBOLS": ",".join(f"{s}:crypto" for s in symbols),
+            "ROBINHOOD_RATE_PER_SECOND": "1000000",
+            "PRICE_CACHE_TTL_CRYPTO_SECONDS": "0",
+            "PRICE_CACHE_TTL_STOCK_SECONDS": "0",
+            "PRICE_CACHE_STALE_SECONDS": "0",
+            "SNAPSHOT_TTL_SECONDS": "0",
+        })
+    else:
+        env.update({
+            "ALPACA_API_KEY": "replay",
+            "ALPACA_SECRET_KEY": "replay",
+            "STOCK_SYMBOLS": ",".join(symbols),
+            "API_RATE_LIMIT_PER_MINUTE": "100000000",
+            "USE_GPT": "false",
+            "FORCE_BUY_MODE": "false",
+            "ALPACA_MODE": "poll",
+            "LOOP_INTERVAL_MINUTES": str(INTERVALS["alpaca"] / 60),
+        })
+    os.environ.update(env)
+
+
+def load_bot(bot):
+    sys.path.insert(0, str(BASE / f"{bot}_bot"))
+    import main
+    return main
+
+
+def replay(bot, symbols, cycles, market, speedup=0.0):
+    interval = INTERVALS[bot]
+    # End the replay at the real current time: the bots compare bar times with datetime.now().
+    broker = FakeBroker(market, datetime.now(timezone.utc) - timedelta(seconds=interval * cycles))
+    install(broker)
+    with tempfile.TemporaryDirectory() as workdir:
+        configure(bot, symbols, workdir)
+        main = load_bot(bot)
+        results = []
+        for _ in range(cycles):
+            broker.advance(interval)
+            before = dict(broker.calls)
+            start = time.perf_counter()
+            if bot == "robinhood":
+                main.run_cycle()
+            else:
+                main.run_bot()
+            elapsed = time.perf_counter() - start
+            calls = {k: v - before.get(k, 0) for k, v in broker.calls.items() if v - before.get(k, 0)}
+            results.append({"seconds": elapsed, "api_calls": sum(calls.values()), "calls": calls,
+                             "rss_mb": rss_mb()})
+            if speedup:
+                time.sleep(interval / speedup)
+        # Both bots route orders through their OrderManager; robinhood's paper broker never reaches FakeBroker.
+        orders = {}
+        if getattr(main, "order_manager", None):
+            main.order_manager.wait(timeout=10)
+            orders = main.order_manager.stats()
+    return results, orders
+
+
+def summarize(bot, symbols, cycles):
+    warm = cycles[1:] or cycles
+    latencies = sorted(c["seconds"] for c in warm)
+    return {
+        "bot": bot,
+        "symbols": len(symbols),
+        "cycles": len(cycles),
+        "cold_seconds": cycles[0]["seconds"],
+        "warm_median_seconds": statistics.median(latencies),
+        "warm_p95_seconds": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+        "cold_api_calls": cycles[0]["api_calls"],
+        "warm_api_calls": statistics.median(c["api_calls"] for c in warm),
+        "rss_mb": cycles[-1]["rss_mb"],
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay bot cycles against the fake broker.")
+    parser.add_argument("--bot", choices=sorted(INTERVALS), required=True)
+    parser.add_argument("--symbols", type=int, default=10)
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--recording", help="CSV of timestamp,symbol,close to replay instead of synthetic prices")
+    parser.add_argument("--speedup", type=float, default=0.0,
+                        help="simulated seconds per real second; 0 runs cycles back to back")
+    parser.add_argument("--per-cycle", action="store_true", help="include per-cycle results")
+    args = parser.parse_args()
+
+    if args.recording:
+        market = RecordedMarket(args.recording)
+        symbols = market.symbols()[:args.symbols]
+    else:
+        market = SyntheticMarket(args.seed)
+        symbols = [f"SYM{i:03d}" for i in range(args.symbols)]
+    with contextlib.redirect_stdout(sys.stderr):  # keep stdout for the JSON summary
+        cycles, orders = replay(args.bot, symbols, args.cycles, market, args.speedup)
+    summary = summarize(args.bot, symbols, cycles)
+    summary["orders"] = orders.get("submitted", 0)
+    summary["order_stats"] = orders
+    if args.per_cycle:
+        summary["per_cycle"] = cycles
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Scaling benchmark: replay both bots at increasing symbol counts.
+
+Each (bot, size) pair runs replay.py in a fresh interpreter, so memory
+figures are not shared between runs. Results are printed as a table and can
+be appended to a JSONL history with --record, like startup.py.
+
+    python benchmarks/replay_bench.py --sizes 1,10,100,500 --cycles 5
+"""
+import argparse
+import json
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from startup import git_revision
+
+REPLAY = Path(__file__).resolve().parent / "replay.py"
+
+
+def run(bot, symbols, cycles, seed):
+    result = subprocess.run(
+        [sys.executable, str(REPLAY), "--bot", bot, "--symbols", str(symbols),
+         "--cycles", str(cycles), "--seed", str(seed)],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f"exit code {result.returncode}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay benchmark from 1 to 500 symbols.")
+    parser.add_argument("--bots", default="robinhood,alpaca")
+    parser.add_argument("--sizes", default="1,10,50,100,250,500")
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--record", help="append results as a JSON line to this file")
+    args = parser.parse_args()
+
+    header = f"{'bot':<10} {'symbols':>7} {'cold s':>8} {'warm s':>8} {'p95 s':>8} {'calls/cycle':>11} {'peak MB':>8}"
+    print(header)
+    print("-" * len(header))
+    results = []
+    for bot in args.bots.split(","):
+        for size in (int(s) for s in args.sizes.split(",")):
+            try:
+                r = run(bot, size, args.cycles, args.seed)
+            except RuntimeError as e:
+                print(f"{bot:<10} {size:>7} failed: {e}")
+                continue
+            results.append(r)
+            print(f"{bot:<10} {size:>7} {r['cold_seconds']:>8.3f} {r['warm_median_seconds']:>8.3f} "
+                  f"{r['warm_p95_seconds']:>8.3f} {r['warm_api_calls']:>11.0f} {r['peak_rss_mb']:>8.0f}")
+
+    if args.record:
+        entry = {"time": datetime.now(timezone.utc).isoformat(), "revision": git_revision(),
+                 "python": sys.version.split()[0], "cycles": args.cycles, "results": results}
+        with open(args.record, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Cold-start timings for the CLI commands and bot entry points.
+
+Each target runs in a fresh interpreter several times; the minimum and median
+wall times are reported. With --record the results are appended as one JSON
+line to a history file so regressions show up across commits.
+
+    python benchmarks/startup.py --runs 5 --record benchmarks/startup_history.jsonl
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+BASE = Path(__file__).resolve().parents[1]
+ROBINHOOD = BASE / "robinhood_bot"
+ALPACA = BASE / "alpaca_bot"
+
+# (name, working directory, arguments after the interpreter)
+TARGETS = [
+    ("cli --help", ROBINHOOD, ["cli.py", "--help"]),
+    ("cli test --help", ROBINHOOD, ["cli.py", "test", "--help"]),
+    ("cli sweep --help", ROBINHOOD, ["cli.py", "sweep", "--help"]),
+    ("import robinhood main", ROBINHOOD, ["-c", "import main"]),
+    ("import alpaca main", ALPACA, ["-c", "import main"]),
+]
+
+# Importing the alpaca bot needs credentials to build its REST client; no
+# request is made at import time, so placeholders are enough.
+ENV = {"ALPACA_API_KEY": "benchmark", "ALPACA_SECRET_KEY": "benchmark"}
+
+
+def time_target(cwd, args, runs):
+    env = {**ENV, **os.environ}
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, *args], cwd=cwd, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        elapsed = time.perf_counter() - start
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else
+                               f"exit code {result.returncode}")
+        times.append(elapsed)
+    return {"min": min(times), "median": statistics.median(times), "runs": runs}
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start time of the bot entry points.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--record", help="append results as a JSON line to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for name, cwd, target_args in TARGETS:
+        try:
+            results[name] = time_target(cwd, target_args, args.runs)
+            print(f"{name:<24} min {results[name]['min']:.3f}s  median {results[name]['median']:.3f}s")
+        except RuntimeError as e:
+            results[name] = {"error": str(e)}
+            print(f"{name:<24} failed: {e}")
+
+    if args.record:
+        entry = {"time": datetime.now(timezone.utc).isoformat(), "revision": git_revision(),
+                 "python": sys.version.split()[0], "results": results}
+        with open(args.record, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+
+if __name__ == "__main__":
+    main()
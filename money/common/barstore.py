@@ -0,0 +1,73 @@
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+COLUMNS = ("ts", "open", "high", "low", "close", "volume")
+
+
+def to_iso(ts):
+    """Normalize a datetime, pandas Timestamp or ISO string to a sortable UTC string."""
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class BarStore:
+    """Persistent OHLCV bars per (symbol, interval), backed by SQLite.
+
+    Timestamps are stored as UTC ISO-8601 strings so they sort chronologically.
+    Re-appending an existing timestamp replaces the bar, which lets callers
+    overlap fetches to pick up a revised last bar.
+    """
+
+    def __init__(self, path="bars.sqlite"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS bars ("
+                "symbol TEXT, interval TEXT, ts TEXT, open REAL, high REAL, low REAL, "
+                "close REAL, volume REAL, PRIMARY KEY (symbol, interval, ts)) WITHOUT ROWID"
+            )
+
+    def last_timestamp(self, symbol, interval):
+        """Timestamp of the newest stored bar, or None if there is none."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT MAX(ts) FROM bars WHERE symbol = ? AND interval = ?", (symbol, interval)
+            ).fetchone()
+        return row[0]
+
+    def append(self, symbol, interval, bars):
+        """Insert or replace (ts, open, high, low, close, volume) rows; returns the row count."""
+        rows = [(symbol, interval, to_iso(b[0]), *(None if v is None else float(v) for v in b[1:6]))
+                for b in bars]
+        if not rows:
+            return 0
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def load(self, symbol, interval, since=None, limit=None):
+        """Bars in ascending time order, optionally after `since` and/or only the last `limit`."""
+        query = "SELECT ts, open, high, low, close, volume FROM bars WHERE symbol = ? AND interval = ?"
+        params = [symbol, interval]
+        if since is not None:
+            query += " AND ts > ?"
+            params.append(to_iso(since))
+        query += " ORDER BY ts DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        rows.reverse()
+        return rows
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,106 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TTLCache:
+    """Size-bounded LRU cache with per-entry TTLs and stale-while-revalidate.
+
+    An entry younger than its TTL is served as is. Up to `stale_ttl` seconds
+    past that it is still served, and a background refresh is started, so the
+    reader does not wait on the loader. Older entries and misses call the loader
+    synchronously. Evicting the least recently used entry is O(1).
+    """
+
+    def __init__(self, maxsize=256, ttl=60.0, stale_ttl=60.0, refresh_workers=4, name="cache"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.name = name
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (value, stored_at, ttl)
+        self.refreshing = set()
+        self.executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix=f"{name}-refresh")
+        self.counts = {"hits": 0, "stale_hits": 0, "misses": 0, "evictions": 0,
+                       "refreshes": 0, "refresh_errors": 0}
+        self.refresh_seconds_total = 0.0
+        self.refresh_seconds_max = 0.0
+
+    def get(self, key, loader, ttl=None):
+        """Cached value for `key`, calling `loader()` to fill or refresh it.
+
+        `ttl` applies to the value the loader returns; an existing entry keeps
+        the TTL it was stored with.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                value, stored_at, entry_ttl = entry
+                age = time.monotonic() - stored_at
+                if age < entry_ttl:
+                    self.entries.move_to_end(key)
+                    self.counts["hits"] += 1
+                    return value
+                if age < entry_ttl + self.stale_ttl:
+                    self.entries.move_to_end(key)
+                    self.counts["stale_hits"] += 1
+                    self._schedule(key, loader, ttl)
+                    return value
+            self.counts["misses"] += 1
+        value = loader()
+        self.put(key, value, ttl)
+        return value
+
+    def put(self, key, value, ttl=None):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic(), self.ttl if ttl is None else ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.counts["evictions"] += 1
+
+    def refresh(self, key, loader, ttl=None):
+        """Reload `key` in the background, e.g. ahead of a read that must not wait on the loader."""
+        with self.lock:
+            self._schedule(key, loader, self.ttl if ttl is None else ttl)
+
+    def _schedule(self, key, loader, ttl):
+        if key not in self.refreshing:  # caller holds the lock
+            self.refreshing.add(key)
+            self.executor.submit(self._refresh, key, loader, ttl)
+
+    def _refresh(self, key, loader, ttl):
+        start = time.perf_counter()
+        try:
+            value = loader()
+        except Exception as e:
+            logging.warning(f"{self.name}: background refresh of {key} failed: {e}")
+            with self.lock:
+                self.counts["refresh_errors"] += 1
+            return
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.refreshing.discard(key)
+                self.refresh_seconds_total += elapsed
+                self.refresh_seconds_max = max(self.refresh_seconds_max, elapsed)
+        self.put(key, value, ttl)
+        with self.lock:
+            self.counts["refreshes"] += 1
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def stats(self):
+        """Hit/miss/eviction counters and background refresh latency."""
+        with self.lock:
+            stats = dict(self.counts)
+            attempts = stats["refreshes"] + stats["refresh_errors"]
+            stats["size"] = len(self.entries)
+            stats["refresh_avg_seconds"] = self.refresh_seconds_total / attempts if attempts else 0.0
+            stats["refresh_max_seconds"] = self.refresh_seconds_max
+        return stats
@@ -0,0 +1,147 @@
+"""Typed bot settings, parsed once from .env and reloaded when the file changes.
+
+A bot declares its settings as a frozen dataclass whose fields are created
+with setting(); each field names its environment variable (the field name in
+upper case by default) and is converted by its type, or by a `parse`
+function. ConfigWatcher builds one settings object at startup and then only
+stats the .env file; when its mtime or size changes it parses the whole file
+into a new object, validates it and swaps it in at once, then calls the
+subscribed listeners with the old and new objects. An edit that fails to
+parse or validate is logged and the running settings are kept.
+
+Variables set in the process environment before .env was loaded (e.g. by the
+supervisor for a shard) win over the file, on startup and on reloads.
+Fields declared with reload=False take effect only on restart; a change to
+one is logged and the old value kept.
+"""
+import dataclasses
+import logging
+import os
+import threading
+import time
+
+from dotenv import dotenv_values
+
+from common import metrics
+
+
+def setting(default=None, env=None, parse=None, reload=True):
+    """Dataclass field read from the environment variable `env` (the field name upper-cased by default)."""
+    return dataclasses.field(default=default, metadata={"env": env, "parse": parse, "reload": reload})
+
+
+def env_name(f):
+    return f.metadata.get("env") or f.name.upper()
+
+
+def csv_list(raw):
+    return tuple(s.strip() for s in raw.split(",") if s.strip())
+
+
+def _convert(raw, f):
+    if f.metadata.get("parse"):
+        return f.metadata["parse"](raw)
+    if f.type is bool:
+        return raw.strip().lower() == "true"
+    return f.type(raw)
+
+
+def load_settings(schema, values):
+    """Build and validate a settings object from a mapping of variable names to strings.
+
+    Missing or empty variables keep the field default. Raises ValueError naming
+    the variable when a value does not convert, or when validate() rejects the
+    result.
+    """
+    kwargs = {}
+    for f in dataclasses.fields(schema):
+        raw = values.get(env_name(f))
+        if raw is None or raw == "":
+            continue
+        try:
+            kwargs[f.name] = _convert(raw, f)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{env_name(f)}={raw!r}: {e}") from None
+    settings = schema(**kwargs)
+    if hasattr(settings, "validate"):
+        settings.validate()
+    return settings
+
+
+class ConfigWatcher:
+    """Holds the current settings of one schema and reloads them when the .env file changes."""
+
+    def __init__(self, schema, path=None, interval=5.0):
+        self.schema = schema
+        self.path = path or None
+        self.interval = interval
+        file_values = self._read()
+        self.pinned = {k: v for k, v in os.environ.items() if file_values.get(k) != v}
+        self.settings = load_settings(schema, {**file_values, **self.pinned})
+        self.stamp = self._stamp()
+        self.listeners = []
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def subscribe(self, listener):
+        """Call listener(old, new) after each applied reload."""
+        self.listeners.append(listener)
+
+    def start(self):
+        """Poll the file from a daemon thread every `interval` seconds."""
+        if self.thread is None and self.path:
+            self.thread = threading.Thread(target=self._run, name="config", daemon=True)
+            self.thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+            except Exception as e:
+                logging.error(f"Config reload failed: {e}")
+
+    def _read(self):
+        return dotenv_values(self.path) if self.path and os.path.exists(self.path) else {}
+
+    def _stamp(self):
+        try:
+            st = os.stat(self.path) if self.path else None
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size) if st else None
+
+    def check(self):
+        """Reload if the file changed since the last check; returns True if new settings were applied."""
+        with self.lock:
+            stamp = self._stamp()
+            if stamp == self.stamp:
+                return False
+            self.stamp = stamp
+            old = self.settings
+            try:
+                new = load_settings(self.schema, {**self._read(), **self.pinned})
+            except ValueError as e:
+                metrics.counter("config_reloads_total", "Config file reloads by result").inc(result="invalid")
+                logging.error(f"Ignoring config change in {self.path}: {e}")
+                return False
+            kept = {}
+            for f in dataclasses.fields(self.schema):
+                if not f.metadata.get("reload", True) and getattr(new, f.name) != getattr(old, f.name):
+                    logging.warning(f"{env_name(f)} changed in {self.path}; it takes effect after a restart")
+                    kept[f.name] = getattr(old, f.name)
+            new = dataclasses.replace(new, **kept) if kept else new
+            if new == old:
+                return False
+            self.settings = new
+            metrics.counter("config_reloads_total", "Config file reloads by result").inc(result="applied")
+            changed = [env_name(f) for f in dataclasses.fields(self.schema)
+                       if getattr(new, f.name) != getattr(old, f.name)]
+            logging.info(f"Reloaded {self.path}: {', '.join(changed)} changed")
+            for listener in self.listeners:
+                try:
+                    listener(old, new)
+                except Exception as e:
+                    logging.error(f"Applying config change failed in {getattr(listener, '__name__', listener)}: {e}")
+            return True
@@ -0,0 +1,415 @@
+import hashlib
+import logging
+import queue
+import threading
+import time
+
+from common import metrics
+
+OPEN_STATUSES = {"new", "submitted", "partially_filled"}
+
+
+def client_order_id(prefix, *parts):
+    """Deterministic order ID for a decision, so resubmitting the same decision is a no-op."""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:24]
+    return f"{prefix}-{digest}"
+
+
+class Position:
+    __slots__ = ("symbol", "qty", "avg_entry_price", "realized_pnl")
+
+    def __init__(self, symbol, qty=0.0, avg_entry_price=0.0, realized_pnl=0.0):
+        self.symbol = symbol
+        self.qty = qty
+        self.avg_entry_price = avg_entry_price
+        self.realized_pnl = realized_pnl
+
+    def copy(self):
+        return Position(self.symbol, self.qty, self.avg_entry_price, self.realized_pnl)
+
+    def __repr__(self):
+        return f"Position({self.symbol}, qty={self.qty}, avg={self.avg_entry_price:.4f})"
+
+
+class PositionBook:
+    """In-memory positions updated from fills, readable without a broker round trip.
+
+    Positions expose `qty` and `avg_entry_price` like Alpaca's position objects.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.positions = {}
+
+    def apply_fill(self, symbol, side, qty, price):
+        with self.lock:
+            position = self.positions.setdefault(symbol, Position(symbol))
+            if side == "buy":
+                total = position.qty + qty
+                position.avg_entry_price = (position.qty * position.avg_entry_price + qty * price) / total
+                position.qty = total
+            else:
+                closed = min(qty, position.qty)
+                if position.avg_entry_price > 0:  # quantity with an unknown entry price has no known profit
+                    position.realized_pnl += closed * (price - position.avg_entry_price)
+                position.qty -= qty
+                if position.qty <= 1e-12:
+                    position.qty, position.avg_entry_price = 0.0, 0.0
+
+    def get(self, symbol):
+        """Copy of an open position, or None."""
+        with self.lock:
+            position = self.positions.get(symbol)
+            return position.copy() if position and position.qty > 0 else None
+
+    def qty(self, symbol):
+        with self.lock:
+            position = self.positions.get(symbol)
+            return position.qty if position else 0.0
+
+    def snapshot(self):
+        """Copies of all open positions, indexed by symbol."""
+        with self.lock:
+            return {s: p.copy() for s, p in self.positions.items() if p.qty > 0}
+
+    def load(self, positions):
+        """Replace quantities and entry prices with broker state {symbol: (qty, avg_entry_price)}.
+
+        Realized P&L accumulated from fills is kept.
+        """
+        with self.lock:
+            for symbol, position in self.positions.items():
+                if symbol not in positions:
+                    position.qty, position.avg_entry_price = 0.0, 0.0
+            for symbol, (qty, avg) in positions.items():
+                position = self.positions.setdefault(symbol, Position(symbol))
+                position.qty, position.avg_entry_price = float(qty), float(avg)
+
+    def state(self):
+        """Every position as {symbol: [qty, avg_entry_price, realized_pnl]}, e.g. to persist it."""
+        with self.lock:
+            return {s: [p.qty, p.avg_entry_price, p.realized_pnl] for s, p in self.positions.items()}
+
+    def restore(self, state):
+        """Replace the book with positions saved by state()."""
+        with self.lock:
+            self.positions = {s: Position(s, float(qty), float(avg), float(pnl))
+                              for s, (qty, avg, pnl) in state.items()}
+
+    def realized_pnl(self):
+        with self.lock:
+            return sum(p.realized_pnl for p in self.positions.values())
+
+
+class Order:
+    def __init__(self, client_order_id, symbol, side, qty):
+        self.client_order_id = client_order_id
+        self.symbol = symbol
+        self.side = side
+        self.qty = qty
+        self.status = "new"
+        self.broker_id = None
+        self.filled_qty = 0.0
+        self.filled_avg_price = None
+        self.error = None
+        self.created = time.monotonic()
+        self.done = threading.Event()
+
+    @property
+    def open(self):
+        return self.status in OPEN_STATUSES
+
+    def __repr__(self):
+        return (f"Order({self.client_order_id}, {self.side} {self.qty} {self.symbol}, {self.status}, "
+                f"filled={self.filled_qty})")
+
+
+class OrderManager:
+    """Non-blocking order submission with fill tracking into a PositionBook.
+
+    submit() queues the order and returns at once; a worker thread sends it to
+    the broker. Open orders are polled every `poll_interval` seconds, and
+    streamed trade updates can be fed to update(). Each increase in filled
+    quantity is applied to the book, so partial fills show up as they happen.
+    Submitting a client order ID that is already known returns the existing
+    order instead of placing another.
+
+    The broker adapter provides submit(order) and status(order), each returning
+    a dict with status, broker_id, filled_qty and filled_avg_price, and
+    positions() returning {symbol: (qty, avg_entry_price)} or None.
+    """
+
+    def __init__(self, broker, book=None, poll_interval=2.0, reconcile_interval=300.0, on_fill=None,
+                 name="orders"):
+        self.broker = broker
+        self.book = book if book is not None else PositionBook()
+        self.poll_interval = poll_interval
+        self.reconcile_interval = reconcile_interval
+        self.on_fill = on_fill
+        self.name = name
+        self.lock = threading.Lock()
+        self.orders = {}  # client order ID -> Order, kept to recognise resubmitted IDs
+        self.open = {}    # client order ID -> Order not yet filled or closed
+        self.queue = queue.Queue()
+        self.counts = {"submitted": 0, "filled": 0, "partial_fills": 0, "rejected": 0, "failed": 0,
+                       "duplicates": 0}
+        self.last_reconcile = 0.0
+        self.stopped = threading.Event()
+        threading.Thread(target=self._submit_loop, name=f"{name}-submit", daemon=True).start()
+        threading.Thread(target=self._poll_loop, name=f"{name}-poll", daemon=True).start()
+
+    def submit(self, symbol, side, qty, client_order_id):
+        """Queue an order and return it; a known client order ID returns the existing order."""
+        with self.lock:
+            order = self.orders.get(client_order_id)
+            if order is not None:
+                self.counts["duplicates"] += 1
+                return order
+            order = self.orders[client_order_id] = self.open[client_order_id] = Order(
+                client_order_id, symbol, side, qty)
+        self.queue.put(order)
+        return order
+
+    def has_open(self, symbol):
+        with self.lock:
+            return any(o.symbol == symbol for o in self.open.values())
+
+    def open_orders(self):
+        with self.lock:
+            return list(self.open.values())
+
+    def _submit_loop(self):
+        while not self.stopped.is_set():
+            order = self.queue.get()
+            if order is None:
+                return
+            start = time.perf_counter()
+            try:
+                result = self.broker.submit(order)
+            except Exception as e:
+                logging.error(f"{self.name}: submitting {order} failed: {e}")
+                order.error = str(e)
+                self._finish(order, "failed")
+                continue
+            finally:
+                metrics.histogram("order_submit_seconds", "Broker order submission").observe(
+                    time.perf_counter() - start, broker=self.name)
+            with self.lock:
+                self.counts["submitted"] += 1
+            self._apply(order, result)
+
+    def _poll_loop(self):
+        while not self.stopped.wait(self.poll_interval):
+            for order in self.open_orders():
+                if order.status == "new":
+                    continue  # still waiting in the submit queue
+                try:
+                    self._apply(order, self.broker.status(order))
+                except Exception as e:
+                    logging.warning(f"{self.name}: polling {order.client_order_id} failed: {e}")
+            if self.reconcile_interval and time.monotonic() - self.last_reconcile >= self.reconcile_interval:
+                self.reconcile()
+
+    def reconcile(self):
+        """Reload the book from broker positions while no orders are in flight."""
+        self.last_reconcile = time.monotonic()
+        if self.open_orders():
+            return False
+        try:
+            positions = self.broker.positions()
+        except Exception as e:
+            logging.warning(f"{self.name}: reconciling positions failed: {e}")
+            return False
+        if positions is None:
+            return False
+        self.book.load(positions)
+        return True
+
+    def update(self, client_order_id, status, filled_qty=None, filled_avg_price=None, broker_id=None):
+        """Apply a streamed trade update; unknown client order IDs are ignored."""
+        with self.lock:
+            order = self.orders.get(client_order_id)
+        if order is not None:
+            self._apply(order, {"status": status, "filled_qty": filled_qty, "filled_avg_price": filled_avg_price,
+                                "broker_id": broker_id})
+
+    def _apply(self, order, result):
+        with self.lock:  # serializes poll and stream updates so a fill is applied once
+            if not order.open:
+                return
+            if result.get("broker_id"):
+                order.broker_id = result["broker_id"]
+            filled = float(result.get("filled_qty") or 0.0)
+            delta = filled - order.filled_qty
+            if delta > 1e-12 and result.get("filled_avg_price") is not None:
+                avg = float(result["filled_avg_price"])
+                previous = order.filled_qty * (order.filled_avg_price or 0.0)
+                price = (filled * avg - previous) / delta
+                order.filled_qty, order.filled_avg_price = filled, avg
+                self.book.apply_fill(order.symbol, order.side, delta, price)
+                if filled < order.qty - 1e-12:
+                    self.counts["partial_fills"] += 1
+            else:
+                delta = 0.0
+            status = result.get("status") or order.status
+        self._finish(order, status)
+        if delta:
+            metrics.counter("fills_total", "Filled quantity applied to the position book").inc(
+                delta, broker=self.name, side=order.side)
+            if self.on_fill:
+                self.on_fill(order, delta, price)
+
+    def _finish(self, order, status):
+        with self.lock:
+            order.status = status
+            if order.open:
+                return
+            self.open.pop(order.client_order_id, None)
+            if status in self.counts:
+                self.counts[status] += 1
+        if status == "filled":
+            metrics.histogram("order_fill_seconds", "Order queued to completely filled").observe(
+                time.monotonic() - order.created, broker=self.name)
+        order.done.set()
+
+    def wait(self, timeout=None):
+        """Block until every order queued so far is filled or closed."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for order in self.open_orders():
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not order.done.wait(remaining):
+                return False
+        return True
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counts)
+            stats["open"] = len(self.open)
+            stats["queued"] = self.queue.qsize()
+        return stats
+
+    def close(self):
+        self.stopped.set()
+        self.queue.put(None)
+
+
+class PaperBroker:
+    """Fills every order immediately at `price(symbol)`; for paper trading."""
+
+    def __init__(self, price):
+        self.price = price
+        self.results = {}
+
+    def submit(self, order):
+        result = {"status": "filled", "broker_id": order.client_order_id, "filled_qty": order.qty,
+                  "filled_avg_price": self.price(order.symbol)}
+        self.results[order.client_order_id] = result
+        return result
+
+    def status(self, order):
+        return self.results[order.client_order_id]
+
+    def positions(self):
+        return None  # the book is the only record
+
+
+ALPACA_STATUSES = {
+    "new": "submitted", "accepted": "submitted", "pending_new": "submitted", "accepted_for_bidding": "submitted",
+    "calculated": "submitted", "held": "submitted", "pending_cancel": "submitted", "pending_replace": "submitted",
+    "replaced": "submitted", "done_for_day": "submitted", "partially_filled": "partially_filled",
+    "filled": "filled", "canceled": "canceled", "expired": "canceled", "stopped": "canceled",
+    "rejected": "rejected", "suspended": "rejected",
+}
+
+
+# Code of Alpaca's 422 "unprocessable" order errors, a reused client order ID among them; APIError.code
+# falls back to the HTTP status when the body has no code
+ALPACA_UNPROCESSABLE = {40010001, 422}
+
+
+class AlpacaBroker:
+    """Alpaca market orders placed with our client order ID, which Alpaca rejects when reused.
+
+    `call(name, fn, *args, **kwargs)` wraps each REST call, e.g. with a rate limiter.
+    """
+
+    def __init__(self, api, call=None, time_in_force="gtc"):
+        self.api = api
+        self.call = call or (lambda name, fn, *args, **kwargs: fn(*args, **kwargs))
+        self.time_in_force = time_in_force
+
+    @staticmethod
+    def _result(order):
+        return {"status": ALPACA_STATUSES.get(order.status, "submitted"), "broker_id": order.id,
+                "filled_qty": order.filled_qty, "filled_avg_price": order.filled_avg_price}
+
+    def submit(self, order):
+        try:
+            placed = self.call("orders", self.api.submit_order, symbol=order.symbol, qty=order.qty, side=order.side,
+                               type="market", time_in_force=self.time_in_force,
+                               client_order_id=order.client_order_id)
+        except Exception as e:
+            if getattr(e, "code", None) not in ALPACA_UNPROCESSABLE:
+                raise
+            # Possibly placed already, e.g. by an earlier run: track that order if it exists.
+            try:
+                placed = self.call("order", self.api.get_order_by_client_order_id, order.client_order_id)
+            except Exception:
+                raise e from None
+        return self._result(placed)
+
+    def status(self, order):
+        return self._result(self.call("order", self.api.get_order_by_client_order_id, order.client_order_id))
+
+    def positions(self):
+        return {p.symbol: (float(p.qty), float(p.avg_entry_price))
+                for p in self.call("positions", self.api.list_positions)}
+
+
+ROBINHOOD_STATUSES = {
+    "queued": "submitted", "unconfirmed": "submitted", "confirmed": "submitted",
+    "partially_filled": "partially_filled", "filled": "filled", "cancelled": "canceled",
+    "rejected": "rejected", "failed": "failed",
+}
+
+
+class RobinhoodBroker:
+    """Robinhood crypto and fractional stock market orders through robin_stocks.
+
+    robin_stocks generates its own ref_id on every call, so duplicate protection
+    comes from the OrderManager's client order IDs, and order placement is never
+    retried.
+    """
+
+    def __init__(self, symbol_types, call=None):
+        self.symbol_types = symbol_types
+        self.call = call or (lambda name, fn, *args, **kwargs: fn(*args, **kwargs))
+
+    @staticmethod
+    def _result(info):
+        if not info or "id" not in info:
+            raise RuntimeError(f"unexpected Robinhood order response: {info}")
+        filled = float(info.get("cumulative_quantity") or 0.0)
+        price = info.get("average_price")
+        return {"status": ROBINHOOD_STATUSES.get(info.get("state"), "submitted"), "broker_id": info["id"],
+                "filled_qty": filled, "filled_avg_price": float(price) if price and filled else None}
+
+    def submit(self, order):
+        import robin_stocks.robinhood as r
+        crypto = self.symbol_types.get(order.symbol, "crypto") == "crypto"
+        if crypto:
+            fn = r.orders.order_buy_crypto_by_quantity if order.side == "buy" else r.orders.order_sell_crypto_by_quantity
+        else:
+            fn = (r.orders.order_buy_fractional_by_quantity if order.side == "buy"
+                  else r.orders.order_sell_fractional_by_quantity)
+        return self._result(self.call("robinhood.orders", fn, order.symbol, order.qty))
+
+    def status(self, order):
+        import robin_stocks.robinhood as r
+        crypto = self.symbol_types.get(order.symbol, "crypto") == "crypto"
+        fn = r.orders.get_crypto_order_info if crypto else r.orders.get_stock_order_info
+        return self._result(self.call("robinhood.order_info", fn, order.broker_id))
+
+    def positions(self):
+        # Account holdings carry no entry price and may not be the bot's; the book only tracks its own fills
+        return None
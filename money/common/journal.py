@@ -0,0 +1,257 @@
+import atexit
+import csv
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+
+TIMESTAMP = pa.timestamp("us", tz="UTC")
+
+TRADES_SCHEMA = pa.schema([
+    ("ts", TIMESTAMP), ("symbol", pa.string()), ("action", pa.string()),
+    ("price", pa.float64()), ("sma", pa.float64()), ("rsi", pa.float64()), ("macd", pa.float64()),
+])
+HOLDINGS_SCHEMA = pa.schema([("ts", TIMESTAMP), ("value", pa.float64())])
+
+SEGMENT_TIME_FORMAT = "%Y%m%dT%H%M%S%fZ"
+
+
+def to_utc(ts):
+    """Datetime, ISO string or epoch seconds as an aware UTC datetime.
+
+    Naive datetimes are taken as local time, which is what the old CSV logs
+    recorded with datetime.now().
+    """
+    if isinstance(ts, (int, float)):
+        return datetime.fromtimestamp(ts, timezone.utc)
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    if ts.tzinfo is None:
+        ts = ts.astimezone()
+    return ts.astimezone(timezone.utc)
+
+
+def epoch_seconds(column):
+    """A timestamp column as a float numpy array of epoch seconds."""
+    return pc.cast(column, pa.int64()).to_numpy(zero_copy_only=False) / 1e6
+
+
+def read_segment(path):
+    """All complete record batches in a segment as a table.
+
+    A segment being written by another process may end in a partial batch;
+    reading stops there.
+    """
+    batches = []
+    try:
+        with pa.OSFile(path, "rb") as source:
+            reader = ipc.open_stream(source)
+            while True:
+                try:
+                    batches.append(reader.read_next_batch())
+                except StopIteration:
+                    break
+    except (pa.ArrowInvalid, OSError):
+        pass
+    return pa.Table.from_batches(batches) if batches else None
+
+
+class Journal:
+    """Append-only journal of timestamped records stored as Arrow IPC segments.
+
+    Appends are buffered and written as one record batch per flush, either
+    every `flush_rows` records or when `flush_seconds` have passed since the
+    last flush. A new segment file starts after `segment_rows` rows, at each
+    UTC day boundary and whenever a process opens the journal for writing.
+    Segment names carry the timestamp of their first row, so time-range queries
+    only open the segments that can overlap the range. Records must be appended
+    in time order.
+    """
+
+    def __init__(self, directory, name, schema, flush_rows=500, flush_seconds=10.0, segment_rows=100_000):
+        self.directory = directory
+        self.name = name
+        self.schema = schema
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.segment_rows = segment_rows
+        self.lock = threading.Lock()
+        self.buffer = {field.name: [] for field in schema}
+        self.buffered = 0
+        self.last_flush = time.monotonic()
+        self.writer = None
+        self.sink = None
+        self.segment_start = None
+        self.segment_written = 0
+        atexit.register(self.close)
+
+    def segments(self):
+        """(start datetime, path) of every segment, oldest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        prefix, suffix = f"{self.name}-", ".arrow"
+        found = []
+        for filename in os.listdir(self.directory):
+            if filename.startswith(prefix) and filename.endswith(suffix):
+                try:
+                    stamp = filename[len(prefix):-len(suffix)].split("-")[0]
+                    start = datetime.strptime(stamp, SEGMENT_TIME_FORMAT)
+                except ValueError:
+                    continue
+                found.append((start.replace(tzinfo=timezone.utc), os.path.join(self.directory, filename)))
+        return sorted(found)
+
+    def append(self, **record):
+        """Buffer one record; fields missing from `record` are stored as null."""
+        with self.lock:
+            for field in self.schema:
+                value = record.get(field.name)
+                self.buffer[field.name].append(to_utc(value) if field.name == "ts" else value)
+            self.buffered += 1
+            if self.buffered >= self.flush_rows or time.monotonic() - self.last_flush >= self.flush_seconds:
+                self._flush()
+
+    def extend(self, records):
+        for record in records:
+            self.append(**record)
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        self.last_flush = time.monotonic()
+        if not self.buffered:
+            return
+        batch = pa.RecordBatch.from_pydict(self.buffer, schema=self.schema)
+        first = self.buffer["ts"][0]
+        if (self.writer is None or self.segment_written >= self.segment_rows
+                or first.date() != self.segment_start.date()):
+            self._roll(first)
+        self.writer.write_batch(batch)
+        self.segment_written += batch.num_rows
+        self.buffer = {field.name: [] for field in self.schema}
+        self.buffered = 0
+
+    def _roll(self, start):
+        self._close_segment()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{self.name}-{start.strftime(SEGMENT_TIME_FORMAT)}.arrow")
+        if os.path.exists(path):  # same first timestamp as an earlier segment
+            path = path[:-len(".arrow")] + f"-{os.getpid()}.arrow"
+        self.sink = pa.OSFile(path, "wb")
+        self.writer = ipc.new_stream(self.sink, self.schema)
+        self.segment_start = start
+        self.segment_written = 0
+
+    def _close_segment(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.sink.close()
+            self.writer = self.sink = None
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            self._close_segment()
+
+    def _buffered_table(self):
+        with self.lock:
+            return pa.Table.from_pydict(self.buffer, schema=self.schema) if self.buffered else None
+
+    def query(self, start=None, end=None, symbols=None, columns=None):
+        """Records with start <= ts < end as a table, including unflushed ones.
+
+        `symbols` filters on the symbol column for journals that have one.
+        """
+        start = to_utc(start) if start is not None else None
+        end = to_utc(end) if end is not None else None
+        segments = self.segments()
+        tables = []
+        for i, (seg_start, path) in enumerate(segments):
+            next_start = segments[i + 1][0] if i + 1 < len(segments) else None
+            if end is not None and seg_start >= end:
+                break
+            if start is not None and next_start is not None and next_start <= start:
+                continue
+            table = read_segment(path)
+            if table is not None:
+                tables.append(table)
+        pending = self._buffered_table()
+        if pending is not None:
+            tables.append(pending)
+        table = pa.concat_tables(tables) if tables else self.schema.empty_table()
+
+        mask = None
+        if start is not None:
+            mask = pc.greater_equal(table["ts"], pa.scalar(start, TIMESTAMP))
+        if end is not None:
+            upper = pc.less(table["ts"], pa.scalar(end, TIMESTAMP))
+            mask = upper if mask is None else pc.and_(mask, upper)
+        if symbols is not None:
+            member = pc.is_in(table["symbol"], value_set=pa.array(list(symbols), pa.string()))
+            mask = member if mask is None else pc.and_(mask, member)
+        if mask is not None:
+            table = table.filter(mask)
+        return table.select(columns) if columns else table
+
+    def tail(self, n):
+        """The last `n` records, reading segments newest first."""
+        tables, rows = [], 0
+        pending = self._buffered_table()
+        if pending is not None:
+            tables.append(pending)
+            rows += pending.num_rows
+        for _, path in reversed(self.segments()):
+            if rows >= n:
+                break
+            table = read_segment(path)
+            if table is not None:
+                tables.append(table)
+                rows += table.num_rows
+        if not tables:
+            return self.schema.empty_table()
+        table = pa.concat_tables(reversed(tables))
+        return table.slice(max(0, table.num_rows - n))
+
+    def first(self):
+        """The oldest record as a dict, or None for an empty journal."""
+        for _, path in self.segments():
+            table = read_segment(path)
+            if table is not None and table.num_rows:
+                return table.slice(0, 1).to_pylist()[0]
+        pending = self._buffered_table()
+        return pending.slice(0, 1).to_pylist()[0] if pending is not None else None
+
+
+def migrate_csv(journal, csv_path, fieldnames=None):
+    """Import a CSV log into an empty journal; returns (imported, skipped) row counts.
+
+    Columns are matched to the schema by name; pass `fieldnames` for files
+    without a header row. Rows that fail to parse are skipped.
+    """
+    imported = skipped = 0
+    casts = {field.name: (to_utc if field.name == "ts" else
+                          float if pa.types.is_floating(field.type) else str)
+             for field in journal.schema}
+    with open(csv_path, mode="r", newline="") as f:
+        for row in csv.DictReader(f, fieldnames=fieldnames):
+            if "timestamp" in row and "ts" not in row:
+                row["ts"] = row.pop("timestamp")
+            try:
+                record = {name: cast(row[name]) if row.get(name) not in (None, "", "None") else None
+                          for name, cast in casts.items()}
+            except (TypeError, ValueError):
+                skipped += 1
+                continue
+            if record["ts"] is None:
+                skipped += 1
+                continue
+            journal.append(**record)
+            imported += 1
+    journal.close()
+    return imported, skipped
@@ -0,0 +1,238 @@
+import bisect
+import functools
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key):
+    if not key:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in key) + "}"
+
+
+def _format_value(value):
+    value = float(value)
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value)
+
+
+class Counter:
+    """Monotonic count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name, help=""):
+        self.name = name
+        self.help = help
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, amount=1.0, **labels):
+        key = _key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, key, value) for key, value in self.values.items()]
+
+
+class Gauge(Counter):
+    """Value per label set that can go up and down."""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[_key(labels)] = float(value)
+
+    def dec(self, amount=1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    """Bucketed distribution per label set; recording is a bisect and three additions under a lock."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help="", buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        self.series = {}  # label key -> [per-bucket counts (+Inf last), sum, count]
+
+    def observe(self, value, **labels):
+        key = _key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels):
+        """Context manager and decorator observing the elapsed wall time in seconds."""
+        return _Timer(self, labels)
+
+    def samples(self):
+        out = []
+        with self.lock:
+            for key, (counts, total, count) in self.series.items():
+                cumulative = 0
+                for bound, n in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += n
+                    out.append((f"{self.name}_bucket", key + (("le", _format_value(bound)),), cumulative))
+                out.append((f"{self.name}_sum", key, total))
+                out.append((f"{self.name}_count", key, count))
+        return out
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+    def __call__(self, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Timer(self.histogram, self.labels):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+_metrics = {}
+_collectors = []
+_registry_lock = threading.Lock()
+
+
+def _get(cls, name, help, **kwargs):
+    with _registry_lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = cls(name, help, **kwargs)
+        elif type(metric) is not cls:
+            raise ValueError(f"metric {name} is already registered as a {metric.kind}")
+        return metric
+
+
+def counter(name, help=""):
+    """Get or create the named counter."""
+    return _get(Counter, name, help)
+
+
+def gauge(name, help=""):
+    """Get or create the named gauge."""
+    return _get(Gauge, name, help)
+
+
+def histogram(name, help="", buckets=DEFAULT_BUCKETS):
+    """Get or create the named histogram."""
+    return _get(Histogram, name, help, buckets=buckets)
+
+
+def timed(name, help="", **labels):
+    """Decorator recording a function's duration in the named histogram."""
+    return histogram(name, help).time(**labels)
+
+
+def register_collector(fn):
+    """Add a callable evaluated at scrape time that yields (name, labels, value) gauge samples."""
+    with _registry_lock:
+        _collectors.append(fn)
+
+
+def _stats_samples(prefix, stats, **labels):
+    for field, value in stats.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f"{prefix}_{field}", labels, value
+
+
+def register_stats(prefix, stats_fn, label=None):
+    """Export the numeric fields of a stats() dict, such as a limiter's or cache's, at scrape time.
+
+    With `label`, `stats_fn` returns one stats dict per label value.
+    """
+    def collect():
+        stats = stats_fn()
+        if label is None:
+            yield from _stats_samples(prefix, stats)
+        else:
+            for value, group in stats.items():
+                yield from _stats_samples(prefix, group, **{label: value})
+    register_collector(collect)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = sorted(_metrics.values(), key=lambda m: m.name)
+        collectors = list(_collectors)
+    lines = []
+    for metric in metrics:
+        if metric.help:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, key, value in metric.samples():
+            lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+    for collect in collectors:
+        try:
+            for name, labels, value in collect():
+                lines.append(f"{name}{_format_labels(_key(labels))} {_format_value(value)}")
+        except Exception as e:
+            logging.warning(f"metrics collector failed: {e}")
+    return "\n".join(lines) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port, host="127.0.0.1"):
+    """Serve /metrics from a daemon thread; returns the server, or None if `port` is 0."""
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _Handler)
+    except OSError as e:
+        logging.error(f"Could not start metrics endpoint on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logging.info(f"📈 Metrics on http://{host}:{port}/metrics")
+    return server
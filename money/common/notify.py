@@ -0,0 +1,221 @@
+"""Discord webhook notifications sent from a background worker.
+
+Callers publish() and return at once; a worker thread drains a bounded queue
+and talks to Discord, so a slow or rate-limited webhook never delays a
+trading cycle. Messages published with a key are persistent: the first one is
+posted, later ones edit it in place, and updates to the same key arriving
+within `coalesce_seconds` collapse into the newest one. Message IDs are kept
+in a small JSON file so a restart keeps editing the same messages. Attached
+files are hashed and only re-uploaded when their content changes.
+
+Requests go through the "discord.webhook" rate-limit endpoint, which retries
+429s after Discord's retry_after, and the worker also waits out a bucket
+whose X-RateLimit-Remaining reaches zero.
+"""
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+import requests
+
+from common import metrics
+from common.ratelimit import check_response, endpoint, guarded
+
+MAX_CONTENT = 2000  # Discord's message length limit
+
+endpoint("discord.webhook", rate=2.5, capacity=5)
+
+
+class Notification:
+    def __init__(self, key, content=None, files=None):
+        self.key = key
+        self.content = content
+        self.files = files or {}
+
+
+class DiscordNotifier:
+    """Posts and edits webhook messages from a worker thread fed by a bounded queue."""
+
+    def __init__(self, url, coalesce_seconds=2.0, maxsize=100, state_path="discord_messages.json", timeout=10.0):
+        self.url = url
+        self.coalesce_seconds = coalesce_seconds
+        self.state_path = state_path
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.message_ids = self._load_state()
+        self.sent = {}  # key -> (content, {filename: sha1}) last delivered
+        self.pause_until = 0.0
+        self.pending = 0
+        self.counts = {"published": 0, "dropped": 0, "coalesced": 0, "posted": 0, "edited": 0,
+                       "unchanged": 0, "failed": 0}
+        self.lock = threading.Lock()
+        self.done = threading.Condition(self.lock)
+        self.thread = threading.Thread(target=self._run, name="discord", daemon=True)
+        self.thread.start()
+
+    def publish(self, key, content=None, files=None):
+        """Queue a message without blocking; returns False if the queue is full and it was dropped.
+
+        `key` names a persistent message to edit in place; None posts a new
+        message every time. `files` maps filenames to bytes.
+        """
+        if content is not None and len(content) > MAX_CONTENT:
+            content = content[:MAX_CONTENT - 1] + "…"
+        try:
+            with self.lock:
+                self.queue.put_nowait(Notification(key, content, files))
+                self.pending += 1
+        except queue.Full:
+            self._count("dropped")
+            logging.warning(f"Discord queue full, dropped {'update of ' + key if key else 'message'}")
+            return False
+        self._count("published")
+        return True
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far has been handled; returns False on timeout."""
+        with self.done:
+            return self.done.wait_for(lambda: self.pending == 0, timeout)
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counts)
+        stats["queued"] = self.queue.qsize()
+        return stats
+
+    def _count(self, key, amount=1):
+        with self.lock:
+            self.counts[key] += amount
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.coalesce_seconds
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            for notification in self._coalesce(batch):
+                try:
+                    self._deliver(notification)
+                except Exception as e:
+                    self._count("failed")
+                    logging.error(f"Failed to send Discord message: {e}")
+            with self.done:
+                self.pending -= len(batch)
+                self.done.notify_all()
+
+    def _coalesce(self, batch):
+        """Keep only the newest update per key, in order of each key's first appearance."""
+        latest = {}
+        for i, notification in enumerate(batch):
+            key = notification.key if notification.key is not None else ("once", i)
+            if key in latest:
+                self._count("coalesced")
+            latest[key] = notification
+        return latest.values()
+
+    def _deliver(self, notification):
+        key = notification.key
+        hashes = {name: hashlib.sha1(data).hexdigest() for name, data in notification.files.items()}
+        previous_content, previous_hashes = self.sent.get(key, (None, None))
+        message_id = self.message_ids.get(key) if key else None
+        if message_id and previous_hashes is not None:
+            content_changed = notification.content is not None and notification.content != previous_content
+            files_changed = bool(hashes) and hashes != previous_hashes
+            if not content_changed and not files_changed:
+                self._count("unchanged")
+                return
+            # Only re-upload the files when they changed; otherwise the message keeps its attachments.
+            files = notification.files if files_changed else {}
+        else:
+            files = notification.files
+
+        if message_id:
+            response = self._send("PATCH", f"{self.url}/messages/{message_id}", notification.content, files)
+            if response.status_code == 404:  # the message was deleted; start a new one
+                self.message_ids.pop(key, None)
+                message_id = None
+                files = notification.files
+            else:
+                self._count("edited")
+        if not message_id:
+            response = self._send("POST", self.url, notification.content, files, params={"wait": "true"})
+            self._count("posted")
+            if key:
+                self.message_ids[key] = response.json()["id"]
+                self._save_state()
+        if key:
+            self.sent[key] = (notification.content if notification.content is not None else previous_content,
+                              hashes or previous_hashes or {})
+
+    def _send(self, method, url, content, files, params=None):
+        """One webhook request through the rate-limited endpoint; raises on errors other than a 404 edit."""
+        wait = self.pause_until - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        payload = {}
+        if content is not None:
+            payload["content"] = content
+        if files:
+            payload["attachments"] = [{"id": i, "filename": name} for i, name in enumerate(files)]
+        kind = "edit" if method == "PATCH" else "post"
+
+        def request():
+            if files:
+                multipart = {f"files[{i}]": (name, data) for i, (name, data) in enumerate(files.items())}
+                multipart["payload_json"] = (None, json.dumps(payload), "application/json")
+                return check_response(self.session.request(method, url, params=params, files=multipart,
+                                                           timeout=self.timeout))
+            return check_response(self.session.request(method, url, params=params, json=payload,
+                                                       timeout=self.timeout))
+
+        with metrics.histogram("discord_post_seconds", "Discord webhook posts").time(kind=kind):
+            response = guarded("discord.webhook", request)
+        if response.headers.get("X-RateLimit-Remaining") == "0":
+            self.pause_until = time.monotonic() + float(response.headers.get("X-RateLimit-Reset-After", 1))
+        if not (method == "PATCH" and response.status_code == 404):
+            response.raise_for_status()
+        return response
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f).get(self.url, {})
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        """Store message IDs per webhook URL, keeping other webhooks' entries."""
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        state[self.url] = self.message_ids
+        tmp = f"{self.state_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_path)
+
+
+_notifiers = {}
+_registry_lock = threading.Lock()
+
+
+def notifier(url):
+    """The shared notifier for a webhook URL, started on first use; settings come from the environment."""
+    with _registry_lock:
+        if url not in _notifiers:
+            _notifiers[url] = DiscordNotifier(
+                url, coalesce_seconds=float(os.getenv("DISCORD_COALESCE_SECONDS", 2)),
+                maxsize=int(os.getenv("DISCORD_QUEUE_SIZE", 100)),
+                state_path=os.getenv("DISCORD_STATE_FILE", "discord_messages.json"))
+            metrics.register_stats("discord", _notifiers[url].stats)
+        return _notifiers[url]
@@ -0,0 +1,241 @@
+import logging
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def set_rate(self, rate, capacity=None):
+        """Change the rate and burst size in place, e.g. on a config reload."""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = float(rate)
+            self.capacity = float(capacity if capacity is not None else max(rate, 1))
+            self.tokens = min(self.tokens, self.capacity)
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens=1):
+        """Take tokens if available; returns 0 on success or the seconds to wait otherwise."""
+        with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0.0
+            return (tokens - self.tokens) / self.rate
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` are available; returns the time spent waiting."""
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    def available(self):
+        with self.lock:
+            self._refill(time.monotonic())
+            return self.tokens
+
+
+def per_minute(limit):
+    """Bucket for an API limit expressed in requests per minute."""
+    return TokenBucket(limit / 60.0, capacity=max(1, limit // 10))
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an endpoint whose circuit breaker is open."""
+
+
+class RetryableHTTPError(RuntimeError):
+    """HTTP response that should be retried (429 or 5xx)."""
+
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class EmptyResponseError(RuntimeError):
+    """An API wrapper returned nothing, which robin_stocks does on HTTP errors."""
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and lets one trial call
+    through once `reset_timeout` seconds have passed."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return self.state == self.CLOSED
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+def status_code(exc):
+    code = getattr(exc, "status_code", None)
+    if code is None:
+        code = getattr(getattr(exc, "response", None), "status_code", None)
+    return code
+
+
+def is_retryable(exc):
+    """429s, 5xx responses, timeouts and connection errors are worth retrying."""
+    if isinstance(exc, (EmptyResponseError, TimeoutError, ConnectionError)):
+        return True
+    code = status_code(exc)
+    if code is not None:
+        return code == 429 or code >= 500
+    # requests' ConnectionError/Timeout don't subclass the builtins
+    return type(exc).__name__ in ("ConnectionError", "Timeout", "ReadTimeout", "ConnectTimeout")
+
+
+def retry_after(exc):
+    value = getattr(exc, "retry_after", None)
+    if value is None:
+        headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+        value = headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def check_response(response):
+    """Raise RetryableHTTPError for a 429/5xx `requests` response, else return it."""
+    code = getattr(response, "status_code", None)
+    if code is not None and (code == 429 or code >= 500):
+        delay = response.headers.get("Retry-After")
+        if delay is None:
+            try:
+                delay = response.json().get("retry_after")  # Discord puts it in the body
+            except Exception:
+                delay = None
+        raise RetryableHTTPError(code, float(delay) if delay is not None else None)
+    return response
+
+
+class Endpoint:
+    """Rate limiting, retries with jittered exponential backoff and a circuit breaker
+    for one logical API endpoint."""
+
+    def __init__(self, name, bucket, retries=3, base_delay=0.5, max_delay=30.0,
+                 failure_threshold=5, reset_timeout=30.0, retry_empty=False):
+        self.name = name
+        self.bucket = bucket
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_empty = retry_empty
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.counts = {"calls": 0, "retries": 0, "failures": 0, "throttled": 0, "rejected": 0}
+        self.wait_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def _count(self, key, amount=1):
+        with self.lock:
+            self.counts[key] += amount
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, fn, *args, **kwargs):
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                self._count("rejected")
+                raise CircuitOpenError(f"{self.name}: circuit open")
+            waited = self.bucket.acquire()
+            with self.lock:
+                self.counts["calls"] += 1
+                self.wait_seconds += waited
+            try:
+                result = fn(*args, **kwargs)
+                if self.retry_empty and not result:
+                    raise EmptyResponseError(f"{self.name}: empty response")
+            except Exception as e:
+                if not is_retryable(e):
+                    # The provider answered (e.g. a 404), so the endpoint itself is healthy.
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                self._count("failures")
+                if status_code(e) == 429:
+                    self._count("throttled")
+                if attempt == self.retries:
+                    raise
+                delay = retry_after(e)
+                delay = min(delay, self.max_delay) if delay is not None else self.backoff(attempt)
+                self._count("retries")
+                logging.warning(f"{self.name}: {type(e).__name__} {e}; retry {attempt + 1}/{self.retries} in {delay:.2f}s")
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counts)
+            stats["wait_seconds"] = self.wait_seconds
+        stats["tokens"] = self.bucket.available()
+        stats["circuit"] = self.breaker.state
+        return stats
+
+
+_endpoints = {}
+_registry_lock = threading.Lock()
+
+
+def endpoint(name, rate=5.0, capacity=None, bucket=None, **kwargs):
+    """Get or create the named endpoint. Endpoints may share a bucket for
+    providers whose limit is account-wide rather than per route."""
+    with _registry_lock:
+        if name not in _endpoints:
+            _endpoints[name] = Endpoint(name, bucket or TokenBucket(rate, capacity), **kwargs)
+        return _endpoints[name]
+
+
+def guarded(name, fn, *args, **kwargs):
+    """Call `fn` through the named endpoint (created with defaults if needed)."""
+    return endpoint(name).call(fn, *args, **kwargs)
+
+
+def stats():
+    """Limiter, retry and breaker state for every endpoint, by name."""
+    with _registry_lock:
+        endpoints = list(_endpoints.values())
+    return {ep.name: ep.stats() for ep in endpoints}
@@ -0,0 +1,157 @@
+"""Split accounts and their symbol universes into bot worker processes ("shards").
+
+A plan file lists accounts, each with the bot that trades it, its symbols, how
+many shards to split them into and environment overrides such as API keys
+(values may reference other variables as $NAME). For example:
+
+    {
+      "metrics_base_port": 9200,
+      "bar_hub": {"port": 8770},
+      "accounts": [
+        {"name": "paper1", "bot": "alpaca", "shards": 4, "symbols": ["AAPL", "MSFT", ...],
+         "env": {"ALPACA_API_KEY": "$PAPER1_KEY", "ALPACA_SECRET_KEY": "$PAPER1_SECRET"}},
+        {"name": "rh", "bot": "robinhood", "shards": 2, "symbols": ["BTC:crypto", "ETH:crypto", ...]}
+      ]
+    }
+
+Symbols are assigned by a stable hash, so a symbol keeps its shard across
+restarts and when others are added. Each shard gets its symbol list, its own
+metrics port and working directory, and an equal share of the account's API
+rate limit. With a bar hub, alpaca shards stream bars from it instead of each
+opening their own market data connection.
+"""
+import json
+import os
+import time
+import urllib.request
+import zlib
+from dataclasses import dataclass, field
+
+SYMBOL_VARS = {"alpaca": "STOCK_SYMBOLS", "robinhood": "SYMBOLS"}
+METRICS_VARS = {"alpaca": "ALPACA_METRICS_PORT", "robinhood": "ROBINHOOD_METRICS_PORT"}
+RATE_VARS = {"alpaca": ("API_RATE_LIMIT_PER_MINUTE", 200), "robinhood": ("ROBINHOOD_RATE_PER_SECOND", 5)}
+
+# Counters reported as per-minute rates, with their display names
+THROUGHPUT = {
+    "cycle_seconds_count": "cycles",
+    "bar_handling_seconds_count": "bars",
+    "decisions_total": "decisions",
+    "orders_total": "orders",
+    "barhub_bars_received_total": "bars in",
+    "barhub_bars_forwarded_total": "bars out",
+}
+STALE_CYCLE_SECONDS = float(os.getenv("SHARD_STALE_SECONDS", "900"))
+
+
+@dataclass
+class Shard:
+    name: str
+    bot: str
+    symbols: list
+    env: dict = field(default_factory=dict)
+    metrics_port: int = 0
+
+
+def partition(symbols, shards):
+    """Split symbols into `shards` lists by a stable hash of the ticker."""
+    groups = [[] for _ in range(max(1, shards))]
+    for symbol in dict.fromkeys(symbols):
+        ticker = symbol.split(":")[0].strip().upper()
+        groups[zlib.crc32(ticker.encode()) % len(groups)].append(symbol)
+    return groups
+
+
+def load_plan(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def plan_shards(plan):
+    """Shards for every account in a plan, plus the bar hub when one is configured (bot "barhub")."""
+    port = int(plan.get("metrics_base_port", 9200))
+    hub = plan.get("bar_hub")
+    shards = []
+    for account in plan["accounts"]:
+        bot = account["bot"]
+        env = {k: os.path.expandvars(str(v)) for k, v in account.get("env", {}).items()}
+        groups = [g for g in partition(account["symbols"], int(account.get("shards", 1))) if g]
+        rate_var, default_rate = RATE_VARS[bot]
+        rate = float(env.get(rate_var, os.getenv(rate_var, default_rate))) / max(1, len(groups))
+        for i, symbols in enumerate(groups):
+            name = f"{account['name']}-{i}"
+            shard_env = {
+                **env,
+                SYMBOL_VARS[bot]: ",".join(symbols),
+                METRICS_VARS[bot]: str(port),
+                rate_var: str(max(1, int(rate)) if bot == "alpaca" else rate),
+                "SHARD_NAME": name,
+            }
+            if bot == "alpaca" and hub:
+                shard_env["ALPACA_MODE"] = "stream"
+                shard_env["ALPACA_DATA_STREAM_URL"] = f"http://127.0.0.1:{hub.get('port', 8770)}"
+            shards.append(Shard(name, bot, symbols, shard_env, port))
+            port += 1
+    if hub:
+        alpaca = next((a for a in plan["accounts"] if a["bot"] == "alpaca"), {})
+        env = {k: os.path.expandvars(str(v)) for k, v in {**alpaca.get("env", {}), **hub.get("env", {})}.items()}
+        env.update({"BAR_HUB_PORT": str(hub.get("port", 8770)), "BAR_HUB_METRICS_PORT": str(port)})
+        shards.append(Shard("barhub", "barhub", [], env, port))
+    return shards
+
+
+def scrape(port, timeout=2.0):
+    """Sample values of a /metrics endpoint summed over labels, by name; None if it does not answer."""
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=timeout) as response:
+            text = response.read().decode()
+    except OSError:
+        return None
+    values = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        name, _, value = line.rpartition(" ")
+        name = name.split("{")[0]
+        try:
+            values[name] = values.get(name, 0.0) + float(value)
+        except ValueError:
+            continue
+    return values
+
+
+class ShardMonitor:
+    """Health and throughput of one shard from successive scrapes of its metrics endpoint."""
+
+    def __init__(self, shard):
+        self.shard = shard
+        self.previous = None  # (monotonic time, values)
+
+    def check(self):
+        """Current health and per-minute rates as a dict."""
+        values = scrape(self.shard.metrics_port)
+        now = time.monotonic()
+        report = {"symbols": len(self.shard.symbols), "metrics": values is not None, "rates": {}}
+        if values is None:
+            report["healthy"] = False
+            return report
+        if self.previous is not None:
+            then, before = self.previous
+            minutes = max(now - then, 1e-9) / 60
+            report["rates"] = {label: (values[name] - before.get(name, 0.0)) / minutes
+                               for name, label in THROUGHPUT.items() if name in values}
+        self.previous = (now, values)
+        last_cycle = values.get("last_cycle_timestamp_seconds")
+        report["last_cycle_age"] = time.time() - last_cycle if last_cycle else None
+        report["healthy"] = report["last_cycle_age"] is None or report["last_cycle_age"] < STALE_CYCLE_SECONDS
+        return report
+
+    def summary(self):
+        report = self.check()
+        if not report["metrics"]:
+            return "metrics unreachable"
+        parts = [f"{report['symbols']} symbols"] if report["symbols"] else []
+        parts += [f"{label} {rate:.1f}/min" for label, rate in report["rates"].items()]
+        if report.get("last_cycle_age") is not None:
+            parts.append(f"last cycle {report['last_cycle_age']:.0f}s ago")
+        parts.append("healthy" if report["healthy"] else "STALE")
+        return " | ".join(parts)
@@ -0,0 +1,233 @@
+import bisect
+
+import numpy as np
+
+BUY, SELL = 1, -1  # order sides from order_sides()
+
+
+class UniverseIndicators:
+    """SMA, RSI, EMA and MACD for many symbols at once, as NumPy arrays over the symbol axis.
+
+    The vectorized counterpart of streaming.IncrementalIndicators, with the
+    same values (see tests/test_signals.py): each bar step updates every symbol that has a bar in it with a
+    handful of array operations, so the per-step cost barely grows with the
+    universe. New bars arrive as a symbol x time matrix (right-aligned, NaN
+    where a symbol has fewer bars) or as per-symbol series via update_many().
+    """
+
+    RESUM_EVERY = 1000  # periodically re-sum the rolling windows to stop floating-point drift
+
+    def __init__(self, symbols=(), sma_period=5, rsi_period=14, fast=12, slow=26, signal=9):
+        self.sma_period = sma_period
+        self.rsi_period = rsi_period
+        self.alpha_fast = 2.0 / (fast + 1)
+        self.alpha_slow = 2.0 / (slow + 1)
+        self.alpha_signal = 2.0 / (signal + 1)
+        self.symbols = []
+        self.index = {}
+        self.last_timestamp = []
+        self._sma_buf = np.zeros((0, sma_period))
+        self._gain_buf = np.zeros((0, rsi_period))
+        self._loss_buf = np.zeros((0, rsi_period))
+        for name in ("_sma_total", "_gain_total", "_loss_total"):
+            setattr(self, name, np.zeros(0))
+        for name in ("close", "ema_fast", "ema_fast_prev", "ema_slow", "ema_slow_prev", "macd_signal"):
+            setattr(self, name, np.full(0, np.nan))
+        self.count = np.zeros(0, dtype=np.int64)
+        self._steps = 0
+        self.add(symbols)
+
+    def add(self, symbols):
+        """Start tracking symbols not seen before."""
+        new = [s for s in dict.fromkeys(symbols) if s not in self.index]
+        if not new:
+            return
+        n = len(new)
+        for symbol in new:
+            self.index[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+            self.last_timestamp.append(None)
+        for name in ("_sma_buf", "_gain_buf", "_loss_buf"):
+            buf = getattr(self, name)
+            setattr(self, name, np.vstack([buf, np.zeros((n, buf.shape[1]))]))
+        for name in ("_sma_total", "_gain_total", "_loss_total"):
+            setattr(self, name, np.concatenate([getattr(self, name), np.zeros(n)]))
+        for name in ("close", "ema_fast", "ema_fast_prev", "ema_slow", "ema_slow_prev", "macd_signal"):
+            setattr(self, name, np.concatenate([getattr(self, name), np.full(n, np.nan)]))
+        self.count = np.concatenate([self.count, np.zeros(n, dtype=np.int64)])
+
+    def rows(self, symbols):
+        """Row index of each symbol, for selecting from the indicator arrays."""
+        return np.array([self.index[s] for s in symbols], dtype=np.int64)
+
+    def update_matrix(self, closes, rows=None):
+        """Apply a (symbols x steps) matrix of closes, NaN meaning no bar for that symbol at that step.
+
+        `rows` gives the row index of each matrix row, defaulting to all symbols in order.
+        """
+        closes = np.asarray(closes, dtype=np.float64)
+        rows = np.arange(len(self.symbols)) if rows is None else np.asarray(rows, dtype=np.int64)
+        for column in closes.T:
+            valid = ~np.isnan(column)
+            if not valid.any():
+                continue
+            i, c = rows[valid], column[valid]
+            n = self.count[i]
+            # Like the pandas formula, a symbol's first bar counts as a zero change.
+            delta = np.where(n > 0, c - self.close[i], 0.0)
+            self._push(self._gain_buf, self._gain_total, i, n % self.rsi_period, np.maximum(delta, 0.0))
+            self._push(self._loss_buf, self._loss_total, i, n % self.rsi_period, np.maximum(-delta, 0.0))
+            self._push(self._sma_buf, self._sma_total, i, n % self.sma_period, c)
+            self._ewm(self.ema_fast, self.ema_fast_prev, i, c, self.alpha_fast)
+            self._ewm(self.ema_slow, self.ema_slow_prev, i, c, self.alpha_slow)
+            macd = self.ema_fast[i] - self.ema_slow[i]
+            signal = self.macd_signal[i]
+            self.macd_signal[i] = np.where(np.isnan(signal), macd,
+                                           self.alpha_signal * macd + (1 - self.alpha_signal) * signal)
+            self.close[i] = c
+            self.count[i] = n + 1
+            self._steps += 1
+            if self._steps % self.RESUM_EVERY == 0:
+                self._sma_total[:] = self._sma_buf.sum(axis=1)
+                self._gain_total[:] = self._gain_buf.sum(axis=1)
+                self._loss_total[:] = self._loss_buf.sum(axis=1)
+
+    @staticmethod
+    def _push(buf, total, rows, pos, values):
+        # Slots start at zero, so replacing one keeps the total right before the window fills too.
+        total[rows] += values - buf[rows, pos]
+        buf[rows, pos] = values
+
+    @staticmethod
+    def _ewm(value, previous, rows, c, alpha):
+        prev = value[rows]
+        previous[rows] = prev
+        value[rows] = np.where(np.isnan(prev), c, alpha * c + (1 - alpha) * prev)
+
+    def update_many(self, closes_by_symbol, timestamps_by_symbol=None):
+        """Feed each symbol's bars newer than its last seen timestamp; returns {symbol: bars applied}.
+
+        Timestamps must be ascending per symbol. Without them every close is applied.
+        """
+        self.add(closes_by_symbol)
+        series, applied = [], {}
+        for symbol, closes in closes_by_symbol.items():
+            row = self.index[symbol]
+            closes = np.asarray(closes, dtype=np.float64)
+            if timestamps_by_symbol is not None:
+                times = timestamps_by_symbol[symbol]
+                last = self.last_timestamp[row]
+                start = 0 if last is None else _after(times, last)
+                closes = closes[start:]
+                if len(closes):
+                    self.last_timestamp[row] = times[-1]
+            applied[symbol] = len(closes)
+            if len(closes):
+                series.append((row, closes))
+        if series:
+            width = max(len(closes) for _, closes in series)
+            matrix = np.full((len(series), width), np.nan)
+            for k, (_, closes) in enumerate(series):
+                matrix[k, width - len(closes):] = closes
+            self.update_matrix(matrix, [row for row, _ in series])
+        return applied
+
+    @property
+    def sma(self):
+        return np.where(self.count >= self.sma_period, self._sma_total / self.sma_period, np.nan)
+
+    @property
+    def rsi(self):
+        gain = self._gain_total / self.rsi_period
+        loss = self._loss_total / self.rsi_period
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rsi = np.where(loss == 0, np.where(gain > 0, 100.0, np.nan), 100 - 100 / (1 + gain / loss))
+        return np.where(self.count >= self.rsi_period, rsi, np.nan)
+
+    @property
+    def macd(self):
+        return self.ema_fast - self.ema_slow
+
+    @property
+    def macd_hist(self):
+        return self.macd - self.macd_signal
+
+    def row(self, symbol):
+        """Indicator values of one symbol as plain floats."""
+        i = self.index[symbol]
+        return {"close": float(self.close[i]), "sma": float(self.sma[i]), "rsi": float(self.rsi[i]),
+                "ema_fast": float(self.ema_fast[i]), "ema_slow": float(self.ema_slow[i]),
+                "macd": float(self.macd[i]), "macd_signal": float(self.macd_signal[i]),
+                "macd_hist": float(self.macd_hist[i]), "count": int(self.count[i]),
+                "last_timestamp": self.last_timestamp[i]}
+
+
+def _after(times, last):
+    """Position of the first timestamp after `last` in an ascending sequence."""
+    if hasattr(times, "searchsorted"):
+        return int(times.searchsorted(last, side="right"))
+    return bisect.bisect_right(times, last)
+
+
+def strategy_actions(strategy, price, sma, rsi, macd):
+    """Robinhood strategy 1 or 2 as 'buy'/'sell'/'hold' per symbol; NaN inputs compare false like floats do."""
+    price, sma, rsi, macd = (np.asarray(a, dtype=np.float64) for a in (price, sma, rsi, macd))
+    if strategy == 1:
+        return np.select([(price > sma) & (rsi < 70) & (macd > 0), (price < sma) & (rsi > 30) & (macd < 0)],
+                         ["buy", "sell"], "hold")
+    if strategy == 2:
+        return np.where(price > sma, "buy", "sell")
+    return np.full(len(price), "hold")
+
+
+def crossover_signals(fast, slow, fast_prev, slow_prev, rsi=None, rsi_buy=30, rsi_sell=70):
+    """EMA crossover BUY/SELL/HOLD per symbol, optionally seeded by RSI 30/70; a crossover wins over RSI."""
+    signal = np.full(len(fast), "HOLD", dtype=object)
+    if rsi is not None:
+        signal[rsi < rsi_buy] = "BUY"
+        signal[rsi > rsi_sell] = "SELL"
+    signal[(fast_prev < slow_prev) & (fast > slow)] = "BUY"
+    signal[(fast_prev > slow_prev) & (fast < slow)] = "SELL"
+    return signal
+
+
+def stop_loss_hit(entry_price, price, percent):
+    """True where price has fallen at least `percent` percent below a nonzero entry price."""
+    entry_price, price = np.asarray(entry_price, dtype=np.float64), np.asarray(price, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (entry_price > 0) & ((entry_price - price) / entry_price * 100 >= percent)
+
+
+def take_profit_hit(entry_price, price, percent):
+    """True where price has risen at least `percent` percent above a nonzero entry price."""
+    entry_price, price = np.asarray(entry_price, dtype=np.float64), np.asarray(price, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (entry_price > 0) & ((price - entry_price) / entry_price * 100 >= percent)
+
+
+def exit_hit(held, entry_price, price, stop_loss_percent, take_profit_percent):
+    """True where a held position has hit its stop-loss or its take-profit."""
+    return (np.asarray(held, dtype=np.float64) > 0) & (stop_loss_hit(entry_price, price, stop_loss_percent)
+                                                      | take_profit_hit(entry_price, price, take_profit_percent))
+
+
+def order_sides(actions, held):
+    """The position gate both bots put decisions through before queueing an order, per symbol.
+
+    BUY where the action is buy and nothing is held, SELL where it is sell and
+    something is, 0 otherwise. Actions match in any case ("buy" or "BUY").
+    """
+    actions = np.char.lower(np.asarray(actions, dtype=str))
+    held = np.asarray(held, dtype=np.float64)
+    return np.select([(actions == "buy") & (held == 0), (actions == "sell") & (held > 0)], [BUY, SELL], 0)
+
+
+def order_quantities(sides, held, buy_qty, sell_qty=None):
+    """Order size per side: `buy_qty` for buys, `sell_qty` (the whole position by default) for sells, else 0."""
+    sides = np.asarray(sides)
+    return np.where(sides == BUY, buy_qty, np.where(sides == SELL, held if sell_qty is None else sell_qty, 0))
+
+
+def dollar_quantity(amount, price):
+    """Units `amount` dollars buys at `price`, to the 8 decimals of a Robinhood crypto order."""
+    return np.round(amount / np.asarray(price, dtype=np.float64), 8)
@@ -0,0 +1,231 @@
+"""Event-driven backtests that run the live bots' decision rules bar by bar.
+
+Unlike robinhood_bot/backtest.py, which has its own RSI rules, the Simulator
+drives the same code the bots trade with: a UniverseIndicators fed one bar at
+a time, strategy_actions() / crossover_signals() for signals, exit_hit() for
+the stop-loss and take-profit, order_sides() / order_quantities() for the
+position gate and order size, and a PositionBook updated from fills. Each bar step goes
+through the same stages as a live cycle:
+
+1. orders queued `latency_bars` earlier fill at this bar's open (or close when
+   there is no open column), moved against us by `slippage_bps` and charged
+   `fee_bps` of the notional;
+2. the bar's close goes into the indicator state;
+3. the rules decide for every symbol with a bar at this step, no open order
+   and enough history, and orders are queued.
+
+With latency_bars=0 orders fill at the deciding bar's close. Symbols are
+independent, so simulate() splits them over a process pool; within a worker
+all its symbols advance together on one clock, one vectorized step per
+timestamp, like the live universe.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from common.execution import PositionBook
+from common.signals import (BUY, SELL, UniverseIndicators, crossover_signals, dollar_quantity, exit_hit,
+                            order_quantities, order_sides, strategy_actions)
+
+SYMBOLS_PER_WORKER = 50
+
+
+class RobinhoodRules:
+    """robinhood_bot's evaluate_signals() and execute_trade(): `strategy` 1 or 2 on SMA5, RSI14 and the MACD
+    histogram; buys spend `trade_amount` dollars when flat, sells close the whole position."""
+
+    min_bars = 1
+
+    def __init__(self, strategy=1, trade_amount=10.0):
+        self.strategy = strategy
+        self.trade_amount = trade_amount
+
+    def indicators(self, symbols):
+        return UniverseIndicators(symbols)
+
+    def decide(self, ind, rows, price, qty, entry_price):
+        actions = strategy_actions(self.strategy, price, ind.sma[rows], ind.rsi[rows], ind.macd_hist[rows])
+        side = order_sides(actions, qty)
+        return side, order_quantities(side, qty, dollar_quantity(self.trade_amount, price))
+
+
+class AlpacaRules:
+    """alpaca_bot's indicator_signals() and decide_action() without USE_GPT or FORCE_BUY_MODE: the EMA12/EMA26
+    crossover (seeded by RSI with `use_rsi`) with stop-loss/take-profit exits, trading `position_size` shares.
+
+    Like run_bot(), a symbol is only evaluated once it has 30 bars. Decisions are
+    made on every bar, as in stream mode.
+    """
+
+    min_bars = 30
+
+    def __init__(self, use_rsi=False, use_stop_loss=True, stop_loss_pct=3.0, take_profit_pct=5.0, position_size=1):
+        self.use_rsi = use_rsi
+        self.use_stop_loss = use_stop_loss
+        self.stop_loss_pct = stop_loss_pct
+        self.take_profit_pct = take_profit_pct
+        self.position_size = position_size
+
+    def indicators(self, symbols):
+        return UniverseIndicators(symbols)
+
+    def decide(self, ind, rows, price, qty, entry_price):
+        signal = crossover_signals(ind.ema_fast[rows], ind.ema_slow[rows], ind.ema_fast_prev[rows],
+                                   ind.ema_slow_prev[rows], ind.rsi[rows] if self.use_rsi else None)
+        if self.use_stop_loss:
+            signal[exit_hit(qty, entry_price, price, self.stop_loss_pct, self.take_profit_pct)] = "SELL"
+        side = order_sides(signal, qty)
+        return side, order_quantities(side, qty, float(self.position_size), float(self.position_size))
+
+
+RULES = {"robinhood": RobinhoodRules, "alpaca": AlpacaRules}
+
+
+def load_bars(csv_path):
+    """Bars from a CSV with a close column and optional timestamp and open columns, indexed by time."""
+    df = pd.read_csv(csv_path, usecols=lambda c: c in ("timestamp", "open", "close"))
+    if "timestamp" in df:
+        df.index = pd.to_datetime(df.pop("timestamp"), utc=True)
+    df = df[df["close"].notna()]
+    return df[~df.index.duplicated(keep="last")].sort_index()
+
+
+@dataclass
+class SimulationResult:
+    """Fills, per-symbol stats and the summed P&L curve of a simulation, plus its wall time."""
+    trades: list
+    stats: pd.DataFrame
+    pnl: pd.Series
+    seconds: float
+
+    @property
+    def bars(self):
+        return int(self.stats["bars"].sum()) if len(self.stats) else 0
+
+
+class Simulator:
+    """Runs one set of rules over the bars of many symbols on a shared simulated clock.
+
+    P&L is in dollars per symbol, starting flat with no cash limit, since
+    neither bot sizes orders by buying power.
+    """
+
+    def __init__(self, rules, slippage_bps=5.0, fee_bps=0.0, latency_bars=1):
+        self.rules = rules
+        self.slippage = slippage_bps / 1e4
+        self.fee = fee_bps / 1e4
+        self.latency = latency_bars
+
+    def run(self, bars_by_symbol):
+        """Simulate {symbol: bars frame as returned by load_bars()}."""
+        started = time.perf_counter()
+        symbols = list(bars_by_symbol)
+        closes = pd.DataFrame({s: bars["close"] for s, bars in bars_by_symbol.items()})
+        opens = pd.DataFrame({s: bars["open"] if "open" in bars else bars["close"]
+                              for s, bars in bars_by_symbol.items()})
+        timestamps = closes.index
+        closes, opens = closes.to_numpy(dtype=np.float64).T, opens.to_numpy(dtype=np.float64).T
+        n, steps = closes.shape
+
+        ind = self.rules.indicators(symbols)
+        book = PositionBook()
+        held, entry_price = np.zeros(n), np.zeros(n)
+        cash, fees, trip_start = np.zeros(n), np.zeros(n), np.zeros(n)
+        pending_side, pending_qty = np.zeros(n, dtype=np.int8), np.zeros(n)
+        pending_due = np.zeros(n, dtype=np.int64)
+        last_close = np.zeros(n)
+        peak, drawdown = np.zeros(n), np.zeros(n)
+        pnl_curve = np.empty(steps)
+        trades, round_trips = [], [[] for _ in range(n)]
+
+        def fill(i, t, price):
+            side, qty = int(pending_side[i]), float(pending_qty[i])
+            pending_side[i] = 0
+            price *= 1 + self.slippage * side
+            fee = qty * price * self.fee
+            if side == BUY and held[i] == 0:
+                trip_start[i] = cash[i]
+            book.apply_fill(symbols[i], "buy" if side == BUY else "sell", qty, price)
+            position = book.get(symbols[i])
+            held[i], entry_price[i] = (position.qty, position.avg_entry_price) if position else (0.0, 0.0)
+            cash[i] -= side * qty * price + fee
+            fees[i] += fee
+            if side == SELL and held[i] == 0:
+                round_trips[i].append(cash[i] - trip_start[i])
+            trades.append({"timestamp": timestamps[t], "symbol": symbols[i], "side": "buy" if side == BUY else "sell",
+                           "qty": qty, "price": float(price), "fee": float(fee)})
+
+        for t in range(steps):
+            close = closes[:, t]
+            has_bar = ~np.isnan(close)
+            for i in np.flatnonzero((pending_side != 0) & (pending_due <= t) & has_bar):
+                fill(i, t, opens[i, t] if not np.isnan(opens[i, t]) else close[i])
+
+            ind.update_matrix(close[:, None])
+            rows = np.flatnonzero(has_bar & (pending_side == 0) & (ind.count >= self.rules.min_bars))
+            if len(rows):
+                side, qty = self.rules.decide(ind, rows, close[rows], held[rows], entry_price[rows])
+                rows, qty, side = rows[side != 0], qty[side != 0], side[side != 0]
+                pending_side[rows], pending_qty[rows], pending_due[rows] = side, qty, t + self.latency
+                if self.latency == 0:
+                    for i in rows:
+                        fill(i, t, close[i])
+
+            last_close[has_bar] = close[has_bar]
+            pnl = cash + held * last_close
+            np.maximum(peak, pnl, out=peak)
+            np.maximum(drawdown, peak - pnl, out=drawdown)
+            pnl_curve[t] = pnl.sum()
+
+        counts = pd.Series([trade["symbol"] for trade in trades], dtype=object).value_counts()
+        stats = pd.DataFrame({
+            "symbol": symbols,
+            "bars": np.count_nonzero(~np.isnan(closes), axis=1),
+            "trades": [int(counts.get(s, 0)) for s in symbols],
+            "round_trips": [len(r) for r in round_trips],
+            "win_rate": [sum(p > 0 for p in r) / len(r) * 100 if r else 0.0 for r in round_trips],
+            "realized_pnl": [book.positions[s].realized_pnl if s in book.positions else 0.0 for s in symbols],
+            "fees": fees,
+            "net_pnl": cash + held * last_close,
+            "open_qty": held,
+            "max_drawdown": drawdown,
+        })
+        return SimulationResult(trades, stats, pd.Series(pnl_curve, index=timestamps),
+                                time.perf_counter() - started)
+
+
+def _simulate_files(csv_paths, rules, params):
+    return Simulator(rules, **params).run({Path(p).stem: load_bars(p) for p in csv_paths})
+
+
+def simulate(csv_paths, rules, workers=None, **params):
+    """Simulate one CSV per symbol (named after the file), split over `workers` processes.
+
+    A worker steps all its symbols at once, so splitting only pays off once
+    there are many symbols; by default each worker gets SYMBOLS_PER_WORKER.
+
+    Each worker loads and steps through its own share of the symbols; the
+    results are merged into one SimulationResult whose P&L curve is the sum over
+    all symbols, carrying each worker's last value forward between its bars.
+    """
+    started = time.perf_counter()
+    csv_paths = sorted(csv_paths)
+    if not workers:
+        workers = min(os.cpu_count() or 1, -(-len(csv_paths) // SYMBOLS_PER_WORKER))
+    workers = max(1, min(workers, len(csv_paths)))
+    groups = [csv_paths[i::workers] for i in range(workers)]
+    if workers == 1:
+        results = [_simulate_files(csv_paths, rules, params)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_simulate_files, groups, [rules] * workers, [params] * workers))
+
+    trades = sorted((t for r in results for t in r.trades), key=lambda t: (t["timestamp"], t["symbol"]))
+    stats = pd.concat([r.stats for r in results], ignore_index=True).sort_values("symbol", ignore_index=True)
+    pnl = pd.concat([r.pnl for r in results], axis=1).sort_index().ffill().fillna(0.0).sum(axis=1)
+    return SimulationResult(trades, stats, pnl, time.perf_counter() - started)
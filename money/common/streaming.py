@@ -0,0 +1,130 @@
+"""Per-symbol incremental indicators, one bar at a time.
+
+The bots use the vectorized signals.UniverseIndicators; this scalar version is
+kept as its reference implementation, and tests/test_signals.py checks that
+the two agree.
+"""
+import math
+from collections import deque
+
+
+class RollingMean:
+    """Mean of the last `window` values, kept as a running sum."""
+
+    RESUM_EVERY = 1000  # periodically re-sum to stop floating-point drift
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.total = 0.0
+        self._updates = 0
+
+    def update(self, value):
+        if len(self.values) == self.window:
+            self.total -= self.values[0]
+        self.values.append(value)
+        self.total += value
+        self._updates += 1
+        if self._updates % self.RESUM_EVERY == 0:
+            self.total = math.fsum(self.values)
+
+    @property
+    def ready(self):
+        return len(self.values) == self.window
+
+    @property
+    def value(self):
+        return self.total / self.window if self.ready else math.nan
+
+
+class Ewm:
+    """Exponentially weighted mean matching pandas `ewm(span=..., adjust=False)`."""
+
+    def __init__(self, span):
+        self.alpha = 2.0 / (span + 1)
+        self.value = math.nan
+        self.previous = math.nan
+
+    def update(self, value):
+        self.previous = self.value
+        if math.isnan(self.value):
+            self.value = value
+        else:
+            self.value = self.alpha * value + (1 - self.alpha) * self.value
+        return self.value
+
+
+class IncrementalIndicators:
+    """SMA, RSI, EMA and MACD for one symbol, updated bar by bar in O(1) memory.
+
+    Values match the pandas formulas used by the bots: rolling-mean SMA and RSI,
+    and `ewm(adjust=False)` EMAs for MACD. Indicators that have not seen enough
+    bars yet are NaN.
+    """
+
+    def __init__(self, sma_period=5, rsi_period=14, fast=12, slow=26, signal=9):
+        self._sma = RollingMean(sma_period)
+        self._gain = RollingMean(rsi_period)
+        self._loss = RollingMean(rsi_period)
+        self.ema_fast = Ewm(fast)
+        self.ema_slow = Ewm(slow)
+        self._signal = Ewm(signal)
+        self.close = math.nan
+        self.count = 0
+        self.last_timestamp = None
+
+    def update(self, close, timestamp=None):
+        close = float(close)
+        # Like the pandas formula, the first bar counts as a zero change.
+        delta = close - self.close if self.count else 0.0
+        self._gain.update(delta if delta > 0 else 0.0)
+        self._loss.update(-delta if delta < 0 else 0.0)
+        self._sma.update(close)
+        self.ema_fast.update(close)
+        self.ema_slow.update(close)
+        self._signal.update(self.ema_fast.value - self.ema_slow.value)
+        self.close = close
+        self.count += 1
+        if timestamp is not None:
+            self.last_timestamp = timestamp
+        return self
+
+    def update_many(self, closes, timestamps=None):
+        """Feed bars newer than the last seen timestamp; returns how many were applied."""
+        applied = 0
+        if timestamps is None:
+            for close in closes:
+                self.update(close)
+                applied += 1
+            return applied
+        for close, ts in zip(closes, timestamps):
+            if self.last_timestamp is not None and ts <= self.last_timestamp:
+                continue
+            self.update(close, ts)
+            applied += 1
+        return applied
+
+    @property
+    def sma(self):
+        return self._sma.value
+
+    @property
+    def rsi(self):
+        if not self._gain.ready:
+            return math.nan
+        gain, loss = self._gain.value, self._loss.value
+        if loss == 0:
+            return 100.0 if gain > 0 else math.nan
+        return 100 - (100 / (1 + gain / loss))
+
+    @property
+    def macd(self):
+        return self.ema_fast.value - self.ema_slow.value
+
+    @property
+    def macd_signal(self):
+        return self._signal.value
+
+    @property
+    def macd_hist(self):
+        return self.macd - self.macd_signal
@@ -1,41 +1,210 @@
+import argparse
+import hashlib
+import os
+import signal
 import subprocess
 import sys
+import threading
+import time
 from pathlib import Path
 
-def install_requirements(bot_dir: Path) -> None:
-    """Install requirements for a bot if a requirements.txt exists."""
-    req_file = bot_dir / "requirements.txt"
-    if req_file.exists():
+from common.sharding import ShardMonitor, load_plan, plan_shards
+
+BASE = Path(__file__).resolve().parent
+REQUIREMENTS_STAMP = BASE / ".requirements.sha256"
+CHECK_INTERVAL_SECONDS = 5
+REPORT_INTERVAL_SECONDS = float(os.getenv("SUPERVISOR_REPORT_SECONDS", "300"))
+SHARD_DIR = BASE / "shards"
+SCRIPTS = {"robinhood": BASE / "robinhood_bot" / "main.py", "alpaca": BASE / "alpaca_bot" / "main.py",
+           "barhub": BASE / "alpaca_bot" / "barhub.py"}
+
+
+def requirements_hash(req_files) -> str:
+    """Hash of the contents of all requirements files, in a stable order."""
+    digest = hashlib.sha256()
+    for req_file in sorted(req_files):
+        digest.update(str(req_file.relative_to(BASE)).encode())
+        digest.update(req_file.read_bytes())
+    return digest.hexdigest()
+
+
+def install_requirements(bot_dirs) -> None:
+    """Install requirements for the bots, skipping pip when nothing changed since the last install."""
+    req_files = [d / "requirements.txt" for d in bot_dirs if (d / "requirements.txt").exists()]
+    current = requirements_hash(req_files)
+    if REQUIREMENTS_STAMP.exists() and REQUIREMENTS_STAMP.read_text().strip() == current:
+        print("\U0001F4E6 Requirements unchanged, skipping install")
+        return
+    for req_file in req_files:
         print(f"\U0001F4E6 Installing dependencies from {req_file}")
         try:
             subprocess.check_call([sys.executable, "-m", "pip", "install", "-r", str(req_file)])
         except subprocess.CalledProcessError as e:
             print(f"Failed to install dependencies: {e}")
             sys.exit(e.returncode)
+    REQUIREMENTS_STAMP.write_text(current)
 
-=======
 
-def launch_bot(main_path: Path) -> None:
-    """Launch a bot's main.py in a new process."""
-    print(f"\u2705 Launching: {main_path}")
+def rss_mb(pid):
+    """Resident memory of a process in MB, or None where /proc is unavailable."""
     try:
-        subprocess.Popen([sys.executable, str(main_path)])
-    except Exception as e:
-        print(f"\u274C Failed to launch: {main_path} | {e}")
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
 
-def main() -> None:
-    base = Path(__file__).resolve().parent
-    bots = [
-        base / "robinhood_bot" / "main.py",
-        base / "alpaca_bot" / "main.py",
-    ]
 
-    for bot_path in bots:
+class BotProcess:
+    """A supervised bot process.
+
+    Output is relayed with a name prefix. Startup time is measured until the
+    bot's first line of output. A crashed bot is restarted with exponential
+    backoff, and the backoff resets once it has stayed up for a while.
+    """
+
+    MIN_BACKOFF = 1.0
+    MAX_BACKOFF = 300.0
+    STABLE_SECONDS = 600.0
+
+    def __init__(self, name, path, env=None, cwd=None, monitor=None):
+        self.name = name
+        self.path = path
+        self.env = env
+        self.cwd = cwd
+        self.monitor = monitor
+        self.process = None
+        self.started_at = None
+        self.startup_seconds = None
+        self.restarts = 0
+        self.backoff = self.MIN_BACKOFF
+        self.restart_at = None
+
+    def start(self) -> None:
+        print(f"✅ Launching: {self.path}")
+        self.started_at = time.monotonic()
+        self.startup_seconds = None
+        self.restart_at = None
+        try:
+            if self.cwd:
+                Path(self.cwd).mkdir(parents=True, exist_ok=True)
+            self.process = subprocess.Popen(
+                [sys.executable, "-u", str(self.path)],
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                text=True, encoding="utf-8", errors="replace",
+                env={**os.environ, **self.env} if self.env else None, cwd=self.cwd,
+            )
+        except Exception as e:
+            print(f"❌ Failed to launch: {self.path} | {e}")
+            self.schedule_restart()
+            return
+        threading.Thread(target=self._relay, args=(self.process,), daemon=True).start()
+
+    def _relay(self, process) -> None:
+        for line in process.stdout:
+            print(f"[{self.name}] {line}", end="", flush=True)
+            if self.startup_seconds is None and process is self.process:
+                self.startup_seconds = time.monotonic() - self.started_at
+                print(f"\u23F1\uFE0F {self.report()}", flush=True)
 
-        install_requirements(bot_path.parent)
-=======
+    def schedule_restart(self) -> None:
+        self.restart_at = time.monotonic() + self.backoff
+        print(f"\U0001F501 Restarting {self.name} in {self.backoff:.0f}s")
+        self.backoff = min(self.backoff * 2, self.MAX_BACKOFF)
 
-        launch_bot(bot_path)
+    def check(self) -> None:
+        """Health check: notice exits, schedule restarts and perform due ones."""
+        now = time.monotonic()
+        if self.restart_at is not None:
+            if now >= self.restart_at:
+                self.restarts += 1
+                self.start()
+            return
+        if self.process is None:
+            return
+        code = self.process.poll()
+        if code is None:
+            if now - self.started_at > self.STABLE_SECONDS:
+                self.backoff = self.MIN_BACKOFF
+            return
+        print(f"❌ {self.name} exited with code {code} after {now - self.started_at:.0f}s")
+        self.schedule_restart()
+
+    def stop(self) -> None:
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+    def report(self) -> str:
+        if self.process is None or self.process.poll() is not None:
+            return f"{self.name}: down (restarts: {self.restarts})"
+        startup = f"{self.startup_seconds:.2f}s" if self.startup_seconds is not None else "pending"
+        rss = rss_mb(self.process.pid)
+        memory = f"{rss:.0f} MB" if rss is not None else "n/a"
+        uptime = time.monotonic() - self.started_at
+        report = (f"{self.name}: pid {self.process.pid} | up {uptime:.0f}s | startup {startup} | "
+                  f"rss {memory} | restarts {self.restarts}")
+        if self.monitor and self.startup_seconds is not None:
+            report += f" | {self.monitor.summary()}"
+        return report
+
+
+class Supervisor:
+    def __init__(self, bots):
+        self.bots = bots
+        self.running = True
+
+    def stop(self, *_) -> None:
+        self.running = False
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        for bot in self.bots:
+            bot.start()
+        last_report = time.monotonic()
+        try:
+            while self.running:
+                time.sleep(CHECK_INTERVAL_SECONDS)
+                for bot in self.bots:
+                    bot.check()
+                if time.monotonic() - last_report >= REPORT_INTERVAL_SECONDS:
+                    last_report = time.monotonic()
+                    for bot in self.bots:
+                        print(f"\U0001F4CA {bot.report()}")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for bot in self.bots:
+                bot.stop()
+
+
+def shard_bots(plan_path):
+    """One BotProcess per shard of a plan file (see common/sharding.py), the bar hub first."""
+    shards = sorted(plan_shards(load_plan(plan_path)), key=lambda shard: shard.bot != "barhub")
+    return [BotProcess(shard.name, SCRIPTS[shard.bot], env=shard.env, cwd=SHARD_DIR / shard.name,
+                       monitor=ShardMonitor(shard))
+            for shard in shards]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run and supervise the trading bots")
+    parser.add_argument("--plan", default=os.getenv("SHARD_PLAN"),
+                        help="JSON shard plan; runs one process per account shard instead of one per bot")
+    args = parser.parse_args()
+    if args.plan:
+        bots = shard_bots(args.plan)
+    else:
+        bots = [
+            BotProcess("robinhood", SCRIPTS["robinhood"]),
+            BotProcess("alpaca", SCRIPTS["alpaca"]),
+        ]
+    install_requirements(sorted({bot.path.parent for bot in bots}))
+    Supervisor(bots).run()
 
 if __name__ == "__main__":
     main()
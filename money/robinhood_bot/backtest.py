@@ -1,39 +1,217 @@
+import sys
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
 from indicators import add_indicators
 
-def backtest(csv_path):
-    df = pd.read_csv(csv_path)
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+
+@dataclass
+class BacktestResult:
+    """Outcome of a backtest run: per-bar equity, executed trades and summary stats."""
+    equity: np.ndarray
+    trades: list
+    stats: dict
+
+
+def run_backtest(close, rsi, timestamps=None, rsi_buy=30, rsi_sell=70,
+                 stop_loss=0.02, initial_balance=1000.0):
+    """Vectorized RSI backtest.
+
+    Buy when RSI < rsi_buy and flat, sell when RSI > rsi_sell and long, and
+    exit on a stop-loss when the close falls below entry * (1 - stop_loss).
+    """
+    rsi = np.asarray(rsi, dtype=float)
+    return run_signals(close, rsi < rsi_buy, rsi > rsi_sell, timestamps, stop_loss=stop_loss,
+                       initial_balance=initial_balance)
+
+
+def run_signals(close, buy, sell, timestamps=None, stop_loss=0.02, take_profit=None, initial_balance=1000.0):
+    """Vectorized long-only backtest of boolean buy/sell signal arrays: one BacktestEngine.feed() over all of them."""
+    close = np.asarray(close, dtype=float)
+    engine = BacktestEngine(np.empty(len(close)), stop_loss=stop_loss, take_profit=take_profit,
+                            initial_balance=initial_balance)
+    engine.feed(0, close, buy, sell, timestamps)
+    return engine.result()
+
+
+class BacktestEngine:
+    """Long-only backtest of buy/sell signals fed in consecutive chunks, with position state carried between them.
+
+    Buy on a buy signal when flat and exit on the next sell signal, or earlier
+    when the close falls below entry * (1 - stop_loss) or, with take_profit,
+    rises above entry * (1 + take_profit). Signals are turned into index arrays
+    and the loop only visits trades. Feeding the series in chunks gives the
+    same trades and stats as feeding it at once; the equity curve is written to
+    `equity`, which holds the whole series.
+    """
+
+    def __init__(self, equity, stop_loss=0.02, take_profit=None, initial_balance=1000.0):
+        self.equity = equity
+        self.stop_loss, self.take_profit = stop_loss, take_profit
+        self.initial_balance = float(initial_balance)
+        self.balance = float(initial_balance)
+        self.position = 0.0
+        self.entry_price = self.cost = 0.0
+        self.trades, self.pnl = [], []
+        self.last_close = None
+        self.peak, self.max_drawdown = -np.inf, 0.0
+
+    def feed(self, offset, close, buy, sell, timestamps=None):
+        """Process rows offset..offset+len(close) of the series."""
+        close = np.asarray(close, dtype=float)
+        n = len(close)
+        if not n:
+            return
+        if timestamps is None:
+            timestamps = np.arange(offset, offset + n)
+        buy_idx = np.flatnonzero(buy)
+        sell_idx = np.flatnonzero(sell)
+        equity = self.equity[offset:offset + n]
+        i = 0
+        while i < n:
+            if not self.position:
+                k = np.searchsorted(buy_idx, i)
+                if k == len(buy_idx):
+                    equity[i:] = self.balance
+                    break
+                entry = buy_idx[k]
+                equity[i:entry] = self.balance
+                self.entry_price = close[entry]
+                self.cost = self.balance
+                self.position = self.balance / self.entry_price
+                self.balance = 0
+                self.trades.append({"index": int(offset + entry), "timestamp": timestamps[entry],
+                                    "action": "BUY", "price": self.entry_price})
+                i = entry
+                search = entry + 1
+            else:
+                search = i  # the entry was in an earlier chunk
+
+            # The first exit is either the next sell signal or the first stop (or target) hit before it.
+            k = np.searchsorted(sell_idx, search)
+            exit_ = sell_idx[k] if k < len(sell_idx) else n
+            stops = np.flatnonzero(close[search:exit_] < self.entry_price * (1 - self.stop_loss))
+            action = "SELL"
+            if len(stops):
+                exit_ = search + stops[0]
+                action = "STOP LOSS SELL"
+            if self.take_profit is not None:
+                targets = np.flatnonzero(close[search:exit_] > self.entry_price * (1 + self.take_profit))
+                if len(targets):
+                    exit_ = search + targets[0]
+                    action = "TAKE PROFIT SELL"
+            if exit_ >= n:
+                equity[i:] = self.position * close[i:]
+                break
+
+            equity[i:exit_] = self.position * close[i:exit_]
+            self.balance = self.position * close[exit_]
+            self.position = 0
+            equity[exit_] = self.balance
+            self.pnl.append(self.balance - self.cost)
+            self.trades.append({"index": int(offset + exit_), "timestamp": timestamps[exit_],
+                                "action": action, "price": close[exit_]})
+            i = exit_ + 1
+
+        peak = np.maximum.accumulate(np.concatenate(([self.peak], equity)))[1:]
+        self.peak = peak[-1]
+        self.max_drawdown = max(self.max_drawdown, float(np.max((peak - equity) / peak)))
+        self.last_close = close[-1]
+
+    def result(self):
+        balance = self.position * self.last_close if self.position > 0 else self.balance
+        stats = summarize(self.equity, self.trades, self.pnl, balance, self.initial_balance,
+                          max_drawdown=self.max_drawdown * 100)
+        return BacktestResult(equity=self.equity, trades=self.trades, stats=stats)
+
+
+class ChunkedBacktest(BacktestEngine):
+    """run_backtest()'s RSI rules fed in chunks, with the equity curve in a disk-backed memmap.
+
+    Produces the same trades and stats as one run_backtest() call over the
+    concatenated arrays, while memory stays bounded by the chunk size.
+    """
+
+    def __init__(self, rows, rsi_buy=30, rsi_sell=70, stop_loss=0.02, initial_balance=1000.0):
+        equity = np.memmap(tempfile.TemporaryFile(), dtype=np.float64, mode="w+", shape=(max(rows, 1),))[:rows]
+        super().__init__(equity, stop_loss=stop_loss, initial_balance=initial_balance)
+        self.rsi_buy, self.rsi_sell = rsi_buy, rsi_sell
+
+    def feed(self, offset, close, rsi, timestamps=None):
+        """Process rows offset..offset+len(close) of the series."""
+        rsi = np.asarray(rsi)
+        super().feed(offset, close, rsi < self.rsi_buy, rsi > self.rsi_sell, timestamps)
+
+
+def summarize(equity, trades, pnl, final_balance, initial_balance, max_drawdown=None):
+    """Summary statistics for an equity curve and its closed trades."""
+    if max_drawdown is None and len(equity):
+        peak = np.maximum.accumulate(equity)
+        max_drawdown = float(np.max((peak - equity) / peak)) * 100
+    elif max_drawdown is None:
+        max_drawdown = 0.0
+    wins = sum(1 for p in pnl if p > 0)
+    return {
+        "final_balance": float(final_balance),
+        "return_pct": float((final_balance / initial_balance - 1) * 100),
+        "trades": len(trades),
+        "round_trips": len(pnl),
+        "win_rate": wins / len(pnl) * 100 if pnl else 0.0,
+        "max_drawdown_pct": max_drawdown,
+    }
+
+
+def journal_prices(journal_dir, symbol, start=None, end=None):
+    """Prices the live bot recorded for `symbol` in the trade journal, as a timestamp/close frame."""
+    from common.journal import TRADES_SCHEMA, Journal
+    table = Journal(journal_dir, "trades", TRADES_SCHEMA).query(
+        start, end, symbols=[symbol], columns=["ts", "price"])
+    return table.to_pandas().rename(columns={"ts": "timestamp", "price": "close"})
+
+
+def backtest(csv_path, verbose=True, stream=False, chunk_rows=1_000_000, dtype="float64", **params):
+    """Backtest a CSV in memory, or with `stream` from a memory-mapped copy in chunks of `chunk_rows`.
+
+    The streaming path converts the CSV once (see ingest.py) and keeps memory
+    bounded regardless of file size; with float64 storage it produces the same
+    trades and stats as the in-memory path.
+    """
+    if stream:
+        return backtest_stream(csv_path, verbose, chunk_rows, dtype, **params)
+    return backtest_frame(pd.read_csv(csv_path), verbose, **params)
+
+
+def backtest_stream(csv_path, verbose=True, chunk_rows=1_000_000, dtype="float64", **params):
+    from ingest import indicator_chunks, open_prices, warmup_rows
+    prices = open_prices(csv_path, dtype=dtype)
+    engine = ChunkedBacktest(max(0, len(prices) - warmup_rows()), **params)
+    for offset, timestamps, columns in indicator_chunks(prices, chunk_rows):
+        if timestamps is not None:
+            timestamps = pd.to_datetime(timestamps, utc=True)
+        engine.feed(offset, columns['close'], columns['rsi14'], timestamps)
+    return report(engine.result(), verbose)
+
+
+def backtest_frame(df, verbose=True, **params):
     df = add_indicators(df)
     df = df.dropna()
-    balance = 1000
-    position = 0
-    entry_price = 0
-    stop_loss = 0.02
-    trades = 0
-
-    for i, row in df.iterrows():
-        price = row['close']
-        # Simple rule: Buy when RSI < 30, Sell when RSI > 70
-        if row['rsi14'] < 30 and position == 0:
-            position = balance / price
-            entry_price = price
-            balance = 0
-            trades += 1
-            print(f"{row['timestamp']}: BUY at {price:.2f}")
-        elif row['rsi14'] > 70 and position > 0:
-            balance = position * price
-            position = 0
-            trades += 1
-            print(f"{row['timestamp']}: SELL at {price:.2f}")
-        elif position > 0 and price < entry_price * (1 - stop_loss):
-            balance = position * price
-            position = 0
-            trades += 1
-            print(f"{row['timestamp']}: STOP LOSS SELL at {price:.2f}")
-
-    if position > 0:
-        balance = position * df.iloc[-1]['close']
-    print(f"Final Balance: ${balance:.2f} | Trades: {trades}")
+    timestamps = df['timestamp'].to_numpy() if 'timestamp' in df else None
+    return report(run_backtest(df['close'].to_numpy(), df['rsi14'].to_numpy(), timestamps, **params), verbose)
+
+
+def report(result, verbose=True):
+    if verbose:
+        for trade in result.trades:
+            print(f"{trade['timestamp']}: {trade['action']} at {trade['price']:.2f}")
+    stats = result.stats
+    print(f"Final Balance: ${stats['final_balance']:.2f} | Trades: {stats['trades']}")
+    return result
+
 
 if __name__ == "__main__":
     backtest("historical_prices.csv")
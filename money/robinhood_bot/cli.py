@@ -1,24 +1,198 @@
+import os
+import sys
+from pathlib import Path
+from typing import List, Optional
+
 import typer
-from bot import run_bot
-from backtest import backtest
-from plot import plot_chart
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 app = typer.Typer()
 
 @app.command()
 def live():
     """Run live/paper trading bot."""
-    run_bot()
+    from main import run
+    run()
+
+@app.command()
+def test(
+    csv_path: str = "historical_prices.csv",
+    quiet: bool = False,
+    journal: Optional[str] = None,
+    symbol: str = "BTC",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    stream: bool = False,
+    chunk_rows: int = 1_000_000,
+    float32: bool = False,
+):
+    """Run backtest on CSV, or on prices recorded in the trade journal with --journal DIR.
+
+    --stream backtests a memory-mapped copy of the CSV in chunks, for files too
+    large to load; --float32 halves its size at the cost of exact results.
+    """
+    from backtest import backtest, backtest_frame, journal_prices
+    if journal:
+        result = backtest_frame(journal_prices(journal, symbol, start, end), verbose=not quiet)
+    else:
+        result = backtest(csv_path, verbose=not quiet, stream=stream, chunk_rows=chunk_rows,
+                          dtype="float32" if float32 else "float64")
+    stats = result.stats
+    print(f"Return: {stats['return_pct']:.2f}% | Win rate: {stats['win_rate']:.1f}% | "
+          f"Max drawdown: {stats['max_drawdown_pct']:.2f}%")
+
+@app.command()
+def sweep(
+    csv_paths: List[str],
+    rsi_period: str = "14",
+    rsi_buy: str = "20:35:5",
+    rsi_sell: str = "65:80:5",
+    stop_loss: str = "0.01,0.02,0.03",
+    workers: int = 0,
+    output: str = "sweep_results.csv",
+    top: int = 10,
+):
+    """Grid-search backtest parameters across CSVs. Ranges are "a,b,c" or "start:stop:step"."""
+    from sweep import parse_range, run_sweep
+    grid = {
+        "rsi_period": parse_range(rsi_period, int),
+        "rsi_buy": parse_range(rsi_buy),
+        "rsi_sell": parse_range(rsi_sell),
+        "stop_loss": parse_range(stop_loss),
+    }
+    table = run_sweep(csv_paths, grid, workers=workers or None, output=output)
+    if table.empty:
+        print("No results.")
+        return
+    print(table.head(top).to_string(index=False))
+    print(f"Wrote {len(table)} runs to {output}")
 
 @app.command()
-def test(csv_path: str = "historical_prices.csv"):
-    """Run backtest on CSV."""
-    backtest(csv_path)
+def walkforward(
+    csv_path: str = "historical_prices.csv",
+    train_bars: int = 20_000,
+    test_bars: int = 5_000,
+    rsi_period: int = 14,
+    rsi_buy: str = "20:35:5",
+    rsi_sell: str = "65:80:5",
+    ema_fast: str = "8,12",
+    ema_slow: str = "21,26",
+    stop_loss: str = "0.02,0.03",
+    take_profit: str = "0.03,0.05",
+    workers: int = 0,
+    checkpoint: str = "walkforward.jsonl",
+    fresh: bool = False,
+    sims: int = 10_000,
+    seed: int = 0,
+):
+    """Walk-forward optimization with Monte Carlo confidence intervals on the out-of-sample trades.
+
+    Each window's result is appended to --checkpoint as it finishes; rerunning
+    with the same settings resumes from it, --fresh starts over.
+    """
+    from ingest import open_prices
+    from sweep import parse_range
+    from walkforward import (CheckpointMismatch, EmptyGrid, monte_carlo, out_of_sample_return, summarize_windows,
+                             walk_forward)
+    grid = {
+        "rsi_buy": parse_range(rsi_buy),
+        "rsi_sell": parse_range(rsi_sell),
+        "ema_fast": parse_range(ema_fast, int),
+        "ema_slow": parse_range(ema_slow, int),
+        "stop_loss": parse_range(stop_loss),
+        "take_profit": parse_range(take_profit),
+    }
+    try:
+        rows = walk_forward(csv_path, grid, train_bars, test_bars, rsi_period, workers=workers or None,
+                            checkpoint=checkpoint, fresh=fresh)
+    except CheckpointMismatch as e:
+        print(f"{e} (--fresh)")
+        return
+    except EmptyGrid as e:
+        raise typer.BadParameter(str(e)) from None
+    if not rows:
+        print("Not enough bars for one train/test window.")
+        return
+    print(summarize_windows(rows, open_prices(csv_path).timestamps).to_string(index=False))
+    print(f"Out-of-sample return: {out_of_sample_return(rows):.2f}% over {len(rows)} windows")
+    mc = monte_carlo([r for row in rows for r in row["returns"]], sims, seed)
+    if mc:
+        print(f"Monte Carlo ({mc['sims']} runs, {mc['trades']} trades): "
+              f"return 5/50/95% {mc['return_p5']:.2f} / {mc['return_p50']:.2f} / {mc['return_p95']:.2f}% | "
+              f"max drawdown {mc['max_drawdown_p5']:.2f} / {mc['max_drawdown_p50']:.2f} / "
+              f"{mc['max_drawdown_p95']:.2f}% | P(loss) {mc['loss_probability'] * 100:.1f}%")
+
+@app.command()
+def simulate(
+    csv_paths: List[str],
+    bot: str = "robinhood",
+    strategy: int = 1,
+    trade_amount: float = 10.0,
+    use_rsi: bool = False,
+    use_stop_loss: bool = True,
+    stop_loss: float = 3.0,
+    take_profit: float = 5.0,
+    position_size: int = 1,
+    slippage_bps: float = 5.0,
+    fee_bps: float = 0.0,
+    latency_bars: int = 1,
+    workers: int = 0,
+    trades_output: Optional[str] = None,
+):
+    """Event-driven backtest of the live robinhood or alpaca rules, one CSV per symbol.
+
+    --strategy and --trade-amount apply to robinhood; --use-rsi, --stop-loss,
+    --take-profit (percent) and --position-size to alpaca.
+    """
+    import pandas as pd
+    from common.simulator import AlpacaRules, RobinhoodRules, simulate as run_simulation
+    if bot == "robinhood":
+        rules = RobinhoodRules(strategy, trade_amount)
+    elif bot == "alpaca":
+        rules = AlpacaRules(use_rsi, use_stop_loss, stop_loss, take_profit, position_size)
+    else:
+        raise typer.BadParameter("bot must be robinhood or alpaca", param_hint="--bot")
+    result = run_simulation(csv_paths, rules, workers=workers or None, slippage_bps=slippage_bps,
+                            fee_bps=fee_bps, latency_bars=latency_bars)
+    print(result.stats.to_string(index=False))
+    print(f"Net P&L: ${result.stats['net_pnl'].sum():.2f} | Trades: {len(result.trades)} | "
+          f"{result.bars} bars in {result.seconds:.1f}s ({result.bars / max(result.seconds, 1e-9):,.0f} bars/s)")
+    if trades_output:
+        pd.DataFrame(result.trades).to_csv(trades_output, index=False)
+        print(f"Wrote {len(result.trades)} fills to {trades_output}")
 
 @app.command()
-def visualize(csv_path: str = "historical_prices.csv"):
-    """Plot price and indicators from CSV."""
-    plot_chart(csv_path)
+def visualize(csv_path: str = "historical_prices.csv", stream: bool = False, max_points: int = 200_000):
+    """Plot price and indicators from CSV; --stream samples at most --max-points rows from a memory-mapped copy."""
+    from plot import plot_chart
+    plot_chart(csv_path, stream=stream, max_points=max_points)
+
+@app.command()
+def convert(csv_path: str, float32: bool = False, chunksize: int = 500_000):
+    """Convert a price CSV to the memory-mapped format used by --stream."""
+    from ingest import convert_csv, MappedPrices
+    out_dir = convert_csv(csv_path, dtype="float32" if float32 else "float64", chunksize=chunksize)
+    print(f"Wrote {len(MappedPrices(out_dir))} rows to {out_dir}")
+
+@app.command("migrate-journal")
+def migrate_journal(
+    trade_log: str = "trade_log.csv",
+    holdings_csv: str = "holdings_history.csv",
+    journal_dir: str = "journal",
+):
+    """Import the old CSV trade log and holdings history into the journal."""
+    from common.journal import HOLDINGS_SCHEMA, TRADES_SCHEMA, Journal, migrate_csv
+    for path, name, schema, fieldnames in ((trade_log, "trades", TRADES_SCHEMA, None),
+                                           (holdings_csv, "holdings", HOLDINGS_SCHEMA, ["ts", "value"])):
+        journal = Journal(journal_dir, name, schema)
+        if journal.segments():
+            print(f"{name}: journal already has data, skipping {path}")
+        elif not os.path.exists(path):
+            print(f"{name}: {path} not found")
+        else:
+            imported, skipped = migrate_csv(journal, path, fieldnames)
+            print(f"{name}: imported {imported} rows from {path} ({skipped} skipped)")
 
 if __name__ == "__main__":
     app()
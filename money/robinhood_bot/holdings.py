@@ -1,147 +1,323 @@
 import os
-import csv
+import sys
 import time
+from collections import deque
+from dataclasses import dataclass
 from datetime import datetime
-import matplotlib.pyplot as plt
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 import robin_stocks.robinhood as r
-from dotenv import load_dotenv
-from discord_webhook import DiscordWebhook
+from dotenv import find_dotenv, load_dotenv
+from pathlib import Path
 
-load_dotenv()
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.config import ConfigWatcher, csv_list, setting
+from common.journal import HOLDINGS_SCHEMA, TIMESTAMP, TRADES_SCHEMA, Journal, epoch_seconds, migrate_csv
+from common.notify import notifier
+from common.ratelimit import endpoint
+from snapshot import snapshot
+
+env_path = find_dotenv()
+load_dotenv(env_path)
 
 chart_file = "holdings_chart.png"
 gain_chart_file = "holdings_gain_chart.png"
-csv_file = "holdings_history.csv"
-log_file = "trade_log.csv"
-discord_url = os.getenv("DISCORD_WEBHOOK_URL")
-symbol_list = os.getenv("CRYPTO_SYMBOLS", "BTC").split(",")
+csv_file = "holdings_history.csv"  # older formats, imported once into the journal
+legacy_bin_file = "holdings_history.bin"
 
-# Authenticate with Robinhood using environment variables
-username = os.getenv("RH_USERNAME")
-password = os.getenv("RH_PASSWORD")
-if not username or not password:
-    raise RuntimeError("RH_USERNAME and RH_PASSWORD must be set")
-r.login(
-    username,
-    password,
-    mfa_code=os.getenv("RH_MFA_CODE", None)
-)
+@dataclass(frozen=True)
+class Settings:
+    """Holdings settings from the environment and .env; fields with reload=False need a restart."""
+    journal_dir: str = setting("journal", reload=False)
+    discord_webhook_url: str = setting()
+    crypto_symbols: tuple = setting(("BTC",), parse=csv_list)
+    robinhood_rate_per_second: float = setting(5.0)
+    holdings_history_points: int = setting(100_000, reload=False)
+    holdings_chart_points: int = setting(1000, reload=False)
+    snapshot_ttl_seconds: float = setting(30.0)
+    fetch_concurrency: int = setting(8)
+
+    def validate(self):
+        if not self.crypto_symbols:
+            raise ValueError("CRYPTO_SYMBOLS must list at least one symbol")
+        if min(self.robinhood_rate_per_second, self.holdings_history_points, self.holdings_chart_points,
+               self.fetch_concurrency) <= 0:
+            raise ValueError("ROBINHOOD_RATE_PER_SECOND, HOLDINGS_HISTORY_POINTS, HOLDINGS_CHART_POINTS "
+                             "and FETCH_CONCURRENCY must be positive")
+        if self.snapshot_ttl_seconds < 0:
+            raise ValueError("SNAPSHOT_TTL_SECONDS must not be negative")
 
-last_message_id = None
+settings_watcher = ConfigWatcher(Settings, env_path, interval=float(os.getenv("CONFIG_RELOAD_SECONDS", 5)))
+settings = settings_watcher.settings
+journal_dir = settings.journal_dir
+discord_url = settings.discord_webhook_url
+symbol_list = list(settings.crypto_symbols)
+history_points = settings.holdings_history_points
+chart_points = settings.holdings_chart_points
 
-initial_value = None
+endpoint("robinhood.positions", rate=settings.robinhood_rate_per_second)
+endpoint("robinhood.quotes", rate=settings.robinhood_rate_per_second, retry_empty=True)
+snapshot.configure(settings.snapshot_ttl_seconds, settings.fetch_concurrency)
+
+def apply_settings(old, new):
+    """Apply reloaded settings: the webhook, the symbol list, the request rate and the snapshot."""
+    global settings, discord_url
+    settings = new
+    discord_url = new.discord_webhook_url
+    symbol_list[:] = new.crypto_symbols
+    for name in ("robinhood.positions", "robinhood.quotes"):
+        endpoint(name).bucket.set_rate(new.robinhood_rate_per_second)
+    snapshot.configure(new.snapshot_ttl_seconds, new.fetch_concurrency)
+
+# Authenticate with Robinhood using environment variables
+def login():
+    username = os.getenv("RH_USERNAME")
+    password = os.getenv("RH_PASSWORD")
+    if not username or not password:
+        raise RuntimeError("RH_USERNAME and RH_PASSWORD must be set")
+    r.login(
+        username,
+        password,
+        mfa_code=os.getenv("RH_MFA_CODE", None)
+    )
 
 def get_total_value():
-    total = 0.0
-    for symbol in symbol_list:
-        try:
-            balance = r.crypto.get_crypto_positions()
-            for b in balance:
-                if b['currency']['code'] == symbol.upper():
-                    qty = float(b['quantity'])
-                    price = float(r.crypto.get_crypto_quote(symbol)['mark_price'])
-                    total += qty * price
-        except:
-            continue
-    return total
-
-def append_to_csv(value):
-    with open(csv_file, mode="a", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow([datetime.now().isoformat(), value])
-
-def load_history():
-    times, values = [], []
-    if not os.path.exists(csv_file):
-        return times, values
-    with open(csv_file, mode="r") as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if len(row) != 2:
-                continue
-            try:
-                times.append(datetime.fromisoformat(row[0]))
-                values.append(float(row[1]))
-            except:
-                continue
-    return times, values
+    """USD value of the held symbols, or None if positions could not be fetched."""
+    try:
+        positions = snapshot.crypto_positions()
+    except Exception as e:
+        print(f"Failed to fetch crypto positions: {e}")
+        return None
+    held = [symbol for symbol in symbol_list if positions.get(symbol.upper())]
+    prices = snapshot.quotes(held)
+    return sum(positions[symbol.upper()] * prices[symbol] for symbol in held if symbol in prices)
+
+class HoldingsHistory:
+    """The most recent holdings values in a fixed-size ring buffer.
+
+    Samples are persisted to the holdings journal; on start the buffer is
+    filled from the journal's tail. The first sample ever recorded is kept as
+    the baseline for the gain chart.
+    """
+
+    def __init__(self, journal, capacity):
+        self.journal = journal
+        self.capacity = capacity
+        self.times = np.empty(capacity)
+        self.values = np.empty(capacity)
+        self.start = 0
+        self.count = 0
+        self.base = None  # first ever sample as (t, value)
+
+    def load(self):
+        first = self.journal.first()
+        if first is not None:
+            self.base = (first["ts"].timestamp(), first["value"])
+        table = self.journal.tail(self.capacity)
+        for t, value in zip(epoch_seconds(table["ts"]), table["value"].to_numpy(zero_copy_only=False)):
+            self._push(float(t), float(value))
+
+    def _push(self, t, value):
+        end = (self.start + self.count) % self.capacity
+        self.times[end] = t
+        self.values[end] = value
+        if self.count < self.capacity:
+            self.count += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+
+    def append(self, t, value):
+        self._push(t, value)
+        if self.base is None:
+            self.base = (t, value)
+        self.journal.append(ts=t, value=value)
+
+    def oldest(self):
+        return self.times[self.start] if self.count else None
+
+    def arrays(self):
+        """Samples in time order (copies)."""
+        idx = (self.start + np.arange(self.count)) % self.capacity
+        return self.times[idx], self.values[idx]
+
+
+def migrate_history(journal):
+    """Import the older holdings_history.bin or holdings_history.csv into an empty journal."""
+    if journal.segments():
+        return
+    if os.path.exists(legacy_bin_file):
+        data = np.fromfile(legacy_bin_file, dtype=[("t", "<f8"), ("value", "<f8")])
+        journal.extend({"ts": float(t), "value": float(value)} for t, value in data)
+        journal.close()
+        print(f"📒 Imported {len(data)} samples from {legacy_bin_file}")
+    elif os.path.exists(csv_file):
+        imported, skipped = migrate_csv(journal, csv_file, fieldnames=["ts", "value"])
+        print(f"📒 Imported {imported} samples from {csv_file} ({skipped} skipped)")
+
+
+class Downsampler:
+    """Incrementally reduces a growing series to at most `max_points` for display.
 
-def load_trade_annotations():
-    annotations = []
-    if not os.path.exists(log_file):
+    Samples are grouped into buckets of `bucket_size` consecutive points, each
+    shown as its last sample. When there are too many buckets, neighbours are
+    merged and the bucket size doubles, so adding a point is amortised O(1).
+    """
+
+    def __init__(self, max_points):
+        self.max_points = max_points
+        self.bucket_size = 1
+        self.buckets = deque()
+        self.pending = None
+        self.pending_count = 0
+
+    def add(self, t, value):
+        self.pending = (t, value)
+        self.pending_count += 1
+        if self.pending_count >= self.bucket_size:
+            self.buckets.append(self.pending)
+            self.pending = None
+            self.pending_count = 0
+            if len(self.buckets) > self.max_points:
+                self.buckets = deque(list(self.buckets)[1::2])
+                self.bucket_size *= 2
+
+    def trim(self, oldest):
+        """Drop buckets older than the oldest sample still in the history."""
+        while self.buckets and oldest is not None and self.buckets[0][0] < oldest:
+            self.buckets.popleft()
+
+    def points(self):
+        points = list(self.buckets)
+        if self.pending is not None:
+            points.append(self.pending)
+        if not points:
+            return np.empty(0), np.empty(0)
+        times, values = zip(*points)
+        return np.asarray(times), np.asarray(values)
+
+
+class TradeFeed:
+    """Follows the trade journal, returning only trades recorded since the last poll.
+
+    Hold decisions are journaled every cycle but are not worth annotating.
+    """
+
+    def __init__(self, journal):
+        self.journal = journal
+        self.last = None
+
+    def poll(self):
+        """New (epoch seconds, label) annotations."""
+        table = self.journal.query(start=self.last)
+        if self.last is not None:
+            table = table.filter(pc.greater(table["ts"], pa.scalar(self.last, TIMESTAMP)))
+        if not table.num_rows:
+            return []
+        self.last = table["ts"][-1].as_py()
+        annotations = []
+        for row in table.filter(pc.not_equal(table["action"], "hold")).to_pylist():
+            label = f"{row['action'].upper()} {row['symbol']}\n${row['price']:.2f}"
+            annotations.append((row["ts"].timestamp(), label))
         return annotations
-    with open(log_file, mode="r") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                ts = datetime.fromisoformat(row['timestamp'])
-                label = f"{row['action'].upper()} {row['symbol']}\n${float(row['price']):.2f}"
-                annotations.append((ts, label))
-            except:
+
+
+class HoldingsCharts:
+    """The holdings and gain charts, built once and updated in place each tick."""
+
+    def __init__(self):
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.dates as mdates
+        from matplotlib.figure import Figure
+
+        self.tz = datetime.now().astimezone().tzinfo
+        self.value_fig, self.value_ax, self.value_line = self._figure(
+            Figure, mdates, "Total Crypto Holdings Over Time", "USD Value", 'green')
+        self.gain_fig, self.gain_ax, self.gain_line = self._figure(
+            Figure, mdates, "Net Gain/Loss from Start", "Net USD Gain", 'blue')
+        self.annotations = deque()  # (epoch seconds, artist), oldest first
+
+    def _figure(self, Figure, mdates, title, ylabel, color):
+        fig = Figure(figsize=(12, 5))
+        ax = fig.add_subplot()
+        line, = ax.plot([], [], marker='o', markersize=3, linestyle='-', color=color)
+        ax.set_title(title)
+        ax.set_xlabel("Time")
+        ax.set_ylabel(ylabel)
+        ax.grid(True)
+        locator = mdates.AutoDateLocator(tz=self.tz)
+        ax.xaxis.set_major_locator(locator)
+        ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator, tz=self.tz))
+        return fig, ax, line
+
+    def add_annotations(self, trades, times, values):
+        """Mark new trades at the displayed point nearest before each one."""
+        for ts, label in trades:
+            i = np.searchsorted(times, ts, side="right") - 1
+            if i < 0:
                 continue
-    return annotations
-
-def plot_chart(times, values):
-    plt.figure(figsize=(12, 5))
-    plt.plot(times, values, marker='o', linestyle='-', color='green')
-    plt.title("Total Crypto Holdings Over Time")
-    plt.xlabel("Time")
-    plt.ylabel("USD Value")
-    plt.xticks(rotation=45)
-    plt.grid(True)
-    annotations = load_trade_annotations()
-    for ts, label in annotations:
-        if ts in times:
-            idx = times.index(ts)
-            plt.annotate(label, (times[idx], values[idx]), textcoords="offset points", xytext=(0,10), ha='center', fontsize=8, color='blue', arrowprops=dict(arrowstyle='->', color='blue'))
-    plt.tight_layout()
-    plt.savefig(chart_file)
-    plt.close()
-
-def plot_gain_chart(times, values):
-    if not values:
-        return
-    base = values[0]
-    gains = [v - base for v in values]
-    plt.figure(figsize=(12, 5))
-    plt.plot(times, gains, marker='o', linestyle='-', color='blue')
-    plt.title("Net Gain/Loss from Start")
-    plt.xlabel("Time")
-    plt.ylabel("Net USD Gain")
-    plt.xticks(rotation=45)
-    plt.grid(True)
-    plt.tight_layout()
-    plt.savefig(gain_chart_file)
-    plt.close()
+            artist = self.value_ax.annotate(
+                label, (ts / 86400.0, values[i]), textcoords="offset points", xytext=(0, 10),
+                ha='center', fontsize=8, color='blue', arrowprops=dict(arrowstyle='->', color='blue'))
+            self.annotations.append((ts, artist))
+
+    def update(self, times, values, base, oldest):
+        while self.annotations and self.annotations[0][0] < oldest:
+            self.annotations.popleft()[1].remove()
+        x = times / 86400.0  # matplotlib date numbers
+        self.value_line.set_data(x, values)
+        self.gain_line.set_data(x, values - base)
+        for fig, ax in ((self.value_fig, self.value_ax), (self.gain_fig, self.gain_ax)):
+            ax.relim()
+            ax.autoscale_view()
+            fig.autofmt_xdate(rotation=45)
+            fig.tight_layout()
+
+    def save(self):
+        self.value_fig.savefig(chart_file)
+        self.gain_fig.savefig(gain_chart_file)
 
 def send_chart_to_discord():
-    global last_message_id
+    """Queue both charts as one message; the notifier edits it in place and skips unchanged images."""
     if not discord_url:
         return
-    try:
-        webhook = DiscordWebhook(url=discord_url)
-        if last_message_id:
-            webhook.set_content("[updating chart...]")
-            webhook.id = last_message_id
-            webhook.edit()
-        with open(chart_file, "rb") as f:
-            webhook.add_file(file=f.read(), filename=chart_file)
-        with open(gain_chart_file, "rb") as f:
-            webhook.add_file(file=f.read(), filename=gain_chart_file)
-        response = webhook.execute()
-        if response.ok:
-            last_message_id = webhook.id
-    except Exception as e:
-        print(f"Failed to send chart to Discord: {e}")
+    files = {}
+    for path in (chart_file, gain_chart_file):
+        with open(path, "rb") as f:
+            files[path] = f.read()
+    notifier(discord_url).publish("holdings_charts", files=files)
 
-if __name__ == "__main__":
-    holdings  # ensure side effects (e.g. boot logic) run if applicable
+def run():
+    """Record total holdings every minute and post updated charts."""
+    settings_watcher.subscribe(apply_settings)
+    settings_watcher.start()
+    holdings_journal = Journal(journal_dir, "holdings", HOLDINGS_SCHEMA, flush_rows=1)
+    migrate_history(holdings_journal)
+    history = HoldingsHistory(holdings_journal, history_points)
+    history.load()
+    downsampler = Downsampler(chart_points)
+    for t, value in zip(*history.arrays()):
+        downsampler.add(t, value)
+    trades = TradeFeed(Journal(journal_dir, "trades", TRADES_SCHEMA))
+    charts = None
     while True:
-        total = get_total_value()
-        append_to_csv(total)
-        times, values = load_history()
-        if times and values:
-            plot_chart(times, values)
-            plot_gain_chart(times, values)
-            send_chart_to_discord()
-        time.sleep(60)
+        t, value = time.time(), get_total_value()
+        if value is None:
+            time.sleep(60)
+            continue
+        history.append(t, value)
+        downsampler.add(t, value)
+        downsampler.trim(history.oldest())
+        times, values = downsampler.points()
+        if charts is None:
+            charts = HoldingsCharts()
+        charts.add_annotations(trades.poll(), times, values)
+        charts.update(times, values, history.base[1], history.oldest())
+        charts.save()
+        send_chart_to_discord()
+        time.sleep(60)
+
+if __name__ == "__main__":
+    login()
+    run()
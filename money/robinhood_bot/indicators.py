@@ -1,15 +1,17 @@
 import pandas as pd
 import talib
 
-def add_indicators(df):
+def add_indicators(df, sma_period=5, rsi_period=14, ema_fast=12, ema_slow=26, signal_period=9,
+                   volatility_window=10):
     close = df['close'].values
-    df['sma5'] = talib.SMA(close, timeperiod=5)
-    df['rsi14'] = talib.RSI(close, timeperiod=14)
-    df['ema12'] = talib.EMA(close, timeperiod=12)
-    df['ema26'] = talib.EMA(close, timeperiod=26)
-    macd, macdsignal, macdhist = talib.MACD(close, fastperiod=12, slowperiod=26, signalperiod=9)
+    df[f'sma{sma_period}'] = talib.SMA(close, timeperiod=sma_period)
+    df[f'rsi{rsi_period}'] = talib.RSI(close, timeperiod=rsi_period)
+    df[f'ema{ema_fast}'] = talib.EMA(close, timeperiod=ema_fast)
+    df[f'ema{ema_slow}'] = talib.EMA(close, timeperiod=ema_slow)
+    macd, macdsignal, macdhist = talib.MACD(close, fastperiod=ema_fast, slowperiod=ema_slow,
+                                            signalperiod=signal_period)
     df['macd'] = macd
     df['macdsignal'] = macdsignal
     df['macdhist'] = macdhist
-    df['volatility'] = pd.Series(close).rolling(window=10).std()
+    df['volatility'] = pd.Series(close).rolling(window=volatility_window).std()
     return df
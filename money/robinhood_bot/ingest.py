@@ -0,0 +1,215 @@
+"""Streaming ingestion for backtests on price files too large to load at once.
+
+convert_csv() reads a CSV in chunks, once, into raw column files (close as
+float64 or float32, timestamps as int64 nanoseconds) that are memory-mapped
+afterwards. StreamingIndicators computes the indicators the backtest and chart
+use chunk by chunk, carrying their state across chunk boundaries so the values
+equal TA-Lib's over the whole file.
+"""
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+META = "meta.json"
+
+
+def mapped_path(csv_path):
+    return Path(str(csv_path) + ".mmap")
+
+
+def _source_info(csv_path):
+    st = os.stat(csv_path)
+    return {"source": str(Path(csv_path).resolve()), "size": st.st_size, "mtime": st.st_mtime}
+
+
+def convert_csv(csv_path, out_dir=None, dtype="float64", chunksize=500_000):
+    """Write the close (and timestamp, if present) columns of a CSV as raw binary files.
+
+    Rows without a close are dropped. Returns the output directory.
+    """
+    out_dir = Path(out_dir) if out_dir else mapped_path(csv_path)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rows, has_timestamp = 0, None
+    close_file = out_dir / "close.bin"
+    ts_file = out_dir / "timestamp.bin"
+    (out_dir / META).unlink(missing_ok=True)  # mark incomplete until the end
+    with open(close_file, "wb") as closes, open(ts_file, "wb") as timestamps:
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            if has_timestamp is None:
+                has_timestamp = "timestamp" in chunk
+            chunk = chunk[chunk["close"].notna()]
+            chunk["close"].to_numpy(dtype=dtype).tofile(closes)
+            if has_timestamp:
+                ts = pd.to_datetime(chunk["timestamp"], utc=True).dt.tz_localize(None)
+                ts.to_numpy().astype("datetime64[ns]").view("int64").tofile(timestamps)
+            rows += len(chunk)
+    if not has_timestamp:
+        ts_file.unlink()
+    meta = dict(_source_info(csv_path), rows=rows, dtype=np.dtype(dtype).name, timestamps=bool(has_timestamp))
+    (out_dir / META).write_text(json.dumps(meta, indent=2))
+    return out_dir
+
+
+class MappedPrices:
+    """Memory-mapped close prices and optional timestamps written by convert_csv()."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.meta = json.loads((self.path / META).read_text())
+        rows = self.meta["rows"]
+        self.close = self._map("close.bin", self.meta["dtype"], rows)
+        self.timestamps = self._map("timestamp.bin", "int64", rows) if self.meta["timestamps"] else None
+
+    def _map(self, name, dtype, rows):
+        if rows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self.path / name, dtype=dtype, mode="r", shape=(rows,))
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    def chunks(self, rows):
+        """(start, stop) bounds of consecutive chunks of at most `rows` rows."""
+        for start in range(0, len(self), rows):
+            yield start, min(start + rows, len(self))
+
+
+def open_prices(csv_path, dtype="float64", chunksize=500_000):
+    """Memory-mapped prices for a CSV, converting it first if it is new, changed or stored as another dtype."""
+    out_dir = mapped_path(csv_path)
+    try:
+        meta = json.loads((out_dir / META).read_text())
+        current = all(meta.get(k) == v for k, v in _source_info(csv_path).items()) and meta["dtype"] == np.dtype(dtype).name
+    except (OSError, ValueError, KeyError):
+        current = False
+    if not current:
+        convert_csv(csv_path, out_dir, dtype=dtype, chunksize=chunksize)
+    return MappedPrices(out_dir)
+
+
+def _recursive_mean(values, alpha, start):
+    """y[i] = (1 - alpha) * y[i-1] + alpha * values[i], seeded with y[-1] = start."""
+    series = pd.Series(np.concatenate(([start], values)))
+    return series.ewm(alpha=alpha, adjust=False).mean().to_numpy()[1:]
+
+
+class StreamingEMA:
+    """TA-Lib EMA fed in chunks: seeded with the SMA of the first `period` closes."""
+
+    def __init__(self, period):
+        self.period = period
+        self.alpha = 2.0 / (period + 1)
+        self.seed = []
+        self.value = None
+
+    def update(self, close):
+        out = np.full(len(close), np.nan)
+        start = 0
+        if self.value is None:
+            start = min(len(close), self.period - len(self.seed))
+            self.seed.extend(close[:start].tolist())
+            if len(self.seed) < self.period:
+                return out
+            self.value = float(np.mean(self.seed))
+            out[start - 1] = self.value
+        if start < len(close):
+            out[start:] = _recursive_mean(close[start:], self.alpha, self.value)
+            self.value = out[-1]
+        return out
+
+
+class StreamingRSI:
+    """TA-Lib (Wilder) RSI fed in chunks: average gain and loss seeded with the mean of the first `period` changes."""
+
+    def __init__(self, period):
+        self.period = period
+        self.alpha = 1.0 / period
+        self.previous = None
+        self.seed = []
+        self.gain = self.loss = None
+
+    def update(self, close):
+        out = np.full(len(close), np.nan)
+        if not len(close):
+            return out
+        first = 1 if self.previous is None else 0
+        delta = np.diff(np.concatenate(([self.previous if self.previous is not None else close[0]], close)))
+        delta[:first] = np.nan
+        self.previous = float(close[-1])
+        start = first
+        if self.gain is None:
+            start = min(len(close), first + self.period - len(self.seed))
+            self.seed.extend(delta[first:start].tolist())
+            if len(self.seed) < self.period:
+                return out
+            seed = np.asarray(self.seed)
+            self.gain, self.loss = float(np.maximum(seed, 0).mean()), float(np.maximum(-seed, 0).mean())
+            out[start - 1] = self._rsi(self.gain, self.loss)
+        if start < len(close):
+            gains = _recursive_mean(np.maximum(delta[start:], 0), self.alpha, self.gain)
+            losses = _recursive_mean(np.maximum(-delta[start:], 0), self.alpha, self.loss)
+            out[start:] = self._rsi(gains, losses)
+            self.gain, self.loss = float(gains[-1]), float(losses[-1])
+        return out
+
+    @staticmethod
+    def _rsi(gain, loss):
+        total = np.asarray(gain + loss, dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(total != 0, 100 * gain / total, 0.0)
+
+
+class StreamingSMA:
+    def __init__(self, period):
+        self.period = period
+        self.tail = np.empty(0)
+
+    def update(self, close):
+        values = np.concatenate((self.tail, close))
+        out = np.full(len(close), np.nan)
+        windows = len(values) - self.period + 1
+        if windows > 0:
+            n = min(windows, len(close))
+            out[len(close) - n:] = np.lib.stride_tricks.sliding_window_view(values, self.period)[-n:].mean(axis=1)
+        self.tail = values[max(0, len(values) - (self.period - 1)):]
+        return out
+
+
+def warmup_rows(**params):
+    """Leading rows add_indicators() leaves incomplete, which the in-memory path drops."""
+    from indicators import add_indicators
+    n = 4 * max(params.values(), default=26) + 100
+    df = add_indicators(pd.DataFrame({"close": np.linspace(1.0, 2.0, n)}), **params)
+    return int(df.dropna().index[0])
+
+
+class StreamingIndicators:
+    """Close, SMA, RSI and fast/slow EMA per chunk, matching add_indicators() column names."""
+
+    def __init__(self, sma_period=5, rsi_period=14, ema_fast=12, ema_slow=26):
+        self.columns = {f"sma{sma_period}": StreamingSMA(sma_period), f"rsi{rsi_period}": StreamingRSI(rsi_period),
+                        f"ema{ema_fast}": StreamingEMA(ema_fast), f"ema{ema_slow}": StreamingEMA(ema_slow)}
+
+    def update(self, close):
+        close = np.asarray(close, dtype=np.float64)
+        out = {"close": close}
+        for name, indicator in self.columns.items():
+            out[name] = indicator.update(close)
+        return out
+
+
+def indicator_chunks(prices, chunk_rows=1_000_000, **params):
+    """Yield (offset, timestamps, columns) per chunk, skipping the warm-up rows add_indicators() leaves NaN."""
+    skip = warmup_rows(**params)
+    indicators = StreamingIndicators(**{k: v for k, v in params.items()
+                                        if k in ("sma_period", "rsi_period", "ema_fast", "ema_slow")})
+    for start, stop in prices.chunks(chunk_rows):
+        columns = indicators.update(prices.close[start:stop])
+        first = max(0, skip - start)
+        if first >= stop - start:
+            continue
+        timestamps = prices.timestamps[start + first:stop] if prices.timestamps is not None else None
+        yield start + first - skip, timestamps, {k: v[first:] for k, v in columns.items()}
@@ -1,59 +1,161 @@
+import json
 import os
+import sys
 import time
 import logging
-import csv
-import requests
-from dotenv import load_dotenv
-import openai
-import pandas as pd
+from dataclasses import dataclass
+from dotenv import find_dotenv, load_dotenv
 from datetime import datetime, date, timedelta, timezone
-from discord_webhook import DiscordWebhook, DiscordEmbed
 import robin_stocks.robinhood as r
+from robin_stocks.robinhood.globals import SESSION as robinhood_session
+from requests.adapters import HTTPAdapter
 import threading
+import concurrent.futures
 from concurrent.futures import ThreadPoolExecutor
-import holdings  # <-- Launch holdings.py when this script is run
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.barstore import BarStore, to_iso
+from common.cache import TTLCache
+from common.execution import OrderManager, PaperBroker, RobinhoodBroker, client_order_id
+from common import metrics
+from common.config import ConfigWatcher, setting
+from common.notify import notifier
+from common.ratelimit import endpoint, guarded, stats as limiter_stats
+from common.signals import (UniverseIndicators, dollar_quantity, order_quantities, order_sides,
+                            strategy_actions)
+from snapshot import snapshot
 
 # Load environment variables
-load_dotenv()
-
-# Read trading strategy
-strategy = int(os.getenv("TRADING_STRATEGY", 1))
+env_path = find_dotenv()
+load_dotenv(env_path)
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
 
-# Set up OpenAI
-openai.api_key = os.getenv("OPENAI_API_KEY")
+CYCLE_SECONDS = 300
 
-# Settings
-symbol_entries = os.getenv("SYMBOLS", "BTC:crypto").split(",")
-symbol_list = []
-symbol_type_map = {}
-
-for entry in symbol_entries:
-    parts = entry.split(":")
-    if len(parts) == 2:
-        symbol, type_ = parts
-    else:
-        symbol, type_ = parts[0], "crypto"  # default to crypto
-    symbol_list.append(symbol)
-    symbol_type_map[symbol] = type_
+def parse_symbols(raw):
+    """SYMBOLS entries as (symbol, type) pairs; entries without a type are crypto."""
+    pairs = []
+    for entry in raw.split(","):
+        parts = entry.split(":")
+        if len(parts) == 2:
+            pairs.append((parts[0], parts[1]))
+        else:
+            pairs.append((parts[0], "crypto"))  # default to crypto
+    return tuple(pairs)
+
+@dataclass(frozen=True)
+class Settings:
+    """Bot settings from the environment and .env; fields with reload=False need a restart."""
+    trading_strategy: int = setting(1)
+    symbols: tuple = setting((("BTC", "crypto"),), parse=parse_symbols)
+    paper_trading: bool = setting(True, reload=False)
+    trade_amount_usd: float = setting(10.0)
+    stop_loss_percent: float = setting(0.03)
+    take_profit_percent: float = setting(0.05)
+    discord_webhook_url: str = setting()
+    alert_threshold_percent: float = setting(3.0)
+    fetch_concurrency: int = setting(8)
+    request_timeout_seconds: float = setting(15.0)
+    robinhood_rate_per_second: float = setting(5.0)
+    run_holdings: bool = setting(False, reload=False)
+    robinhood_metrics_port: int = setting(9101, reload=False)
+    order_poll_seconds: float = setting(2.0, reload=False)
+    price_prefetch_seconds: float = setting(20.0)
+    price_cache_ttl_crypto_seconds: float = setting(60.0)
+    price_cache_ttl_stock_seconds: float = setting(120.0)
+    price_cache_stale_seconds: float = setting(60.0)
+    price_cache_size: int = setting(256, reload=False)
+    snapshot_ttl_seconds: float = setting(30.0)
+
+    def validate(self):
+        if self.trading_strategy not in (1, 2):
+            raise ValueError(f"TRADING_STRATEGY must be 1 or 2, not {self.trading_strategy}")
+        if not self.symbols or any(type_ not in ("crypto", "stock") for _, type_ in self.symbols):
+            raise ValueError("SYMBOLS must list SYMBOL:crypto or SYMBOL:stock entries")
+        if not 0 <= self.price_prefetch_seconds < CYCLE_SECONDS:
+            raise ValueError(f"PRICE_PREFETCH_SECONDS must be between 0 and {CYCLE_SECONDS}")
+        if self.fetch_concurrency < 1 or self.robinhood_rate_per_second <= 0 or self.trade_amount_usd <= 0:
+            raise ValueError("FETCH_CONCURRENCY, ROBINHOOD_RATE_PER_SECOND and TRADE_AMOUNT_USD must be positive")
+        if self.price_cache_size < 1:
+            raise ValueError("PRICE_CACHE_SIZE must be positive")
+        if min(self.price_cache_ttl_crypto_seconds, self.price_cache_ttl_stock_seconds,
+               self.price_cache_stale_seconds, self.snapshot_ttl_seconds) < 0:
+            raise ValueError("PRICE_CACHE_*_SECONDS and SNAPSHOT_TTL_SECONDS must not be negative")
+
+# Parsed once; the watcher applies edits to .env through apply_settings()
+settings_watcher = ConfigWatcher(Settings, env_path, interval=float(os.getenv("CONFIG_RELOAD_SECONDS", 5)))
+settings = settings_watcher.settings
 
-paper_trading = os.getenv("PAPER_TRADING", "true").lower() == "true"
-trade_amount = float(os.getenv("TRADE_AMOUNT_USD", 10))
-stop_loss_pct = float(os.getenv("STOP_LOSS_PERCENT", 0.03))
-take_profit_pct = float(os.getenv("TAKE_PROFIT_PERCENT", 0.05))
-discord_url = os.getenv("DISCORD_WEBHOOK_URL")
-alert_threshold = float(os.getenv("ALERT_THRESHOLD_PERCENT", 3.0))
+# Settings
+strategy = settings.trading_strategy
+symbol_list = [symbol for symbol, _ in settings.symbols]
+symbol_type_map = dict(settings.symbols)
+paper_trading = settings.paper_trading
+trade_amount = settings.trade_amount_usd
+stop_loss_pct = settings.stop_loss_percent
+take_profit_pct = settings.take_profit_percent
+discord_url = settings.discord_webhook_url
+alert_threshold = settings.alert_threshold_percent
+fetch_concurrency = settings.fetch_concurrency
+request_timeout = settings.request_timeout_seconds
+rh_rate = settings.robinhood_rate_per_second
+run_holdings = settings.run_holdings
+metrics_port = settings.robinhood_metrics_port
+order_poll_seconds = settings.order_poll_seconds
+
+# Client-side limits; robin_stocks returns None/[] on HTTP errors, so empty
+# market data responses are retried too.
+ENDPOINTS = ["robinhood.historicals", "robinhood.quotes", "robinhood.orders", "robinhood.order_info"]
+endpoint("robinhood.historicals", rate=rh_rate, retry_empty=True)
+endpoint("robinhood.quotes", rate=rh_rate, retry_empty=True)
+# Orders are not retried: a retried submit could place a duplicate order.
+endpoint("robinhood.orders", rate=rh_rate, retries=0)
+endpoint("robinhood.order_info", rate=rh_rate)
+
+# Bounded pools for price fetching: one task per symbol, and the per-symbol
+# historicals and quote requests in a separate pool so they can overlap.
+fetch_executor = ThreadPoolExecutor(max_workers=fetch_concurrency, thread_name_prefix="fetch")
+request_executor = ThreadPoolExecutor(max_workers=fetch_concurrency * 2, thread_name_prefix="request")
+snapshot.configure(settings.snapshot_ttl_seconds, fetch_concurrency)
+
+class TimeoutAdapter(HTTPAdapter):
+    """Gives requests made without a timeout, as all of robin_stocks' are, a default one."""
+
+    def __init__(self, timeout, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        return super().send(request, timeout=self.timeout if timeout is None else timeout, **kwargs)
+
+# robin_stocks sends everything through one shared session, so a hung request
+# times out in the HTTP layer and frees its pool worker instead of holding it.
+http_adapter = TimeoutAdapter(request_timeout)
+robinhood_session.mount("https://", http_adapter)
 
 # Robinhood login
 robinhood_login = None
 login_lock = threading.Lock()
 
-# Price cache with expiration
-price_cache = {}
-CACHE_TTL = timedelta(hours=1)
-CACHE_MAX_AGE = timedelta(hours=2)
+# Price data cache: fresh for the symbol type's TTL, then served stale for up
+# to PRICE_CACHE_STALE_SECONDS while a background refresh runs. The TTLs are
+# shorter than a cycle, so the run loop refreshes every symbol in the background
+# PRICE_PREFETCH_SECONDS before each cycle, which then reads fresh entries.
+price_ttls = {
+    "crypto": settings.price_cache_ttl_crypto_seconds,
+    "stock": settings.price_cache_ttl_stock_seconds,
+}
+price_cache = TTLCache(maxsize=settings.price_cache_size, stale_ttl=settings.price_cache_stale_seconds,
+                       refresh_workers=fetch_concurrency, name="price_cache")
+
+# Local bar store; only bars newer than the last stored one are fetched
+bar_store = None
+bar_store_lock = threading.Lock()
+BAR_INTERVAL = '5minute'
+HISTORY_WINDOW = timedelta(weeks=1)
 
 # Authenticate before any threads start
 def robinhood_auth():
@@ -77,17 +179,34 @@ def robinhood_auth():
                 robinhood_login = None
         return robinhood_login
 
-# CSV log file
+# Trade journal (Arrow segments); trade_log.csv is the old format, imported once
 log_file = "trade_log.csv"
-if not os.path.exists(log_file):
-    with open(log_file, mode="w", newline="") as file:
-        writer = csv.writer(file)
-        writer.writerow(["timestamp", "symbol", "action", "price", "sma", "rsi", "macd"])
+journal_dir = os.getenv("JOURNAL_DIR", "journal")
+trade_journal = None
+trade_journal_lock = threading.Lock()
+
+def get_trade_journal():
+    """Open the trade journal on first use, importing an old trade_log.csv into it."""
+    global trade_journal
+    with trade_journal_lock:
+        if trade_journal is None:
+            from common.journal import TRADES_SCHEMA, Journal, migrate_csv
+            trade_journal = Journal(journal_dir, "trades", TRADES_SCHEMA)
+            if not trade_journal.segments() and os.path.exists(log_file):
+                imported, skipped = migrate_csv(trade_journal, log_file)
+                logging.info(f"📒 Imported {imported} rows from {log_file} into the trade journal ({skipped} skipped)")
+        return trade_journal
+
+def get_bar_store():
+    """Open the local bar store on first use."""
+    global bar_store
+    with bar_store_lock:
+        if bar_store is None:
+            bar_store = BarStore(os.getenv("BAR_STORE_PATH", "bars.sqlite"))
+        return bar_store
 
 # Shared state
-purchase_prices = {}
 high_prices = {}
-current_profit = 0.0
 last_profit_date = date.today()
 message_id = None
 lock = threading.Lock()
@@ -98,35 +217,90 @@ last_status_message = ""
 # Price SMA crossover state
 previous_price_vs_sma = {}
 
+# Indicator state for every symbol, updated in one vectorized pass per cycle
+universe = UniverseIndicators(symbol_list)
+
 bar_chars = ['▂','▃','▄','▅','▆','▇','█']
 
-def calculate_indicators(prices):
-    df = pd.DataFrame(prices, columns=["close"])
-    df["sma"] = df["close"].rolling(window=5).mean()
-    delta = df["close"].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-    loss = (-delta.where(delta > 0, 0)).rolling(window=14).mean()
-    rs = gain / loss
-    df["rsi"] = 100 - (100 / (1 + rs))
-    exp1 = df["close"].ewm(span=12, adjust=False).mean()
-    exp2 = df["close"].ewm(span=26, adjust=False).mean()
-    df["macd"] = exp1 - exp2
-    df["macd_signal"] = df["macd"].ewm(span=9, adjust=False).mean()
-    macd_value = df.iloc[-1]["macd"] - df.iloc[-1]["macd_signal"]
-    crossover_icon = "📈" if macd_value > 0 else "📉"
-    return df.iloc[-1]["sma"], df.iloc[-1]["rsi"], macd_value, crossover_icon
+@metrics.timed("indicator_seconds", "Indicator update and strategy signals for all symbols")
+def evaluate_signals(price_data):
+    """Apply new bars of every fetched symbol and run the strategy over all of them at once.
+
+    Returns one (sma, rsi, macd histogram, action) tuple per price_data entry.
+    """
+    universe.update_many({symbol: prices for symbol, _, prices, _ in price_data},
+                         {symbol: times for symbol, _, _, times in price_data})
+    rows = universe.rows([symbol for symbol, _, _, _ in price_data])
+    sma, rsi, macd = universe.sma[rows], universe.rsi[rows], universe.macd_hist[rows]
+    actions = strategy_actions(strategy, [p[1] for p in price_data], sma, rsi, macd)
+    return list(zip(sma.tolist(), rsi.tolist(), macd.tolist(), actions.tolist()))
+
+order_manager = None
+
+# Live positions the bot opened itself, kept across restarts. Account holdings
+# are never loaded, so a sell only ever closes what the bot bought.
+positions_file = os.getenv("ROBINHOOD_POSITIONS_FILE", "robinhood_positions.json")
+positions_lock = threading.Lock()
+
+def load_positions(book):
+    try:
+        with open(positions_file) as f:
+            book.restore(json.load(f))
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        logging.error(f"Could not read {positions_file}, starting with no bot positions: {e}")
+
+def save_positions(book):
+    tmp = f"{positions_file}.tmp"
+    with positions_lock:
+        with open(tmp, "w") as f:
+            json.dump(book.state(), f)
+        os.replace(tmp, positions_file)
+
+def log_fill(order, qty, price):
+    logging.info(f"💸 Filled {order.side} {qty:g} {order.symbol} at ${price:.2f} ({order.status})")
+    if not paper_trading:
+        save_positions(order_manager.book)
+
+def get_order_manager():
+    """Start order submission and fill tracking on first use.
+
+    Paper trading fills every order at the current quote. Live trading places
+    Robinhood market orders; its book holds only the bot's own fills, restored
+    from positions_file, so holdings bought outside the bot are never sold.
+    """
+    global order_manager
+    if order_manager is None:
+        if paper_trading:
+            broker = PaperBroker(lambda symbol: snapshot.quote(symbol, symbol_type_map.get(symbol, "crypto")))
+        else:
+            broker = RobinhoodBroker(symbol_type_map, call=guarded)
+        order_manager = OrderManager(broker, poll_interval=order_poll_seconds, on_fill=log_fill, name="robinhood")
+        if not paper_trading:
+            load_positions(order_manager.book)
+        metrics.register_stats("orders", order_manager.stats)
+    return order_manager
+
+def execute_trade(symbol, action, price, bar_ts):
+    """Queue a market order for a buy/sell decision the position allows; returns the order or None.
+
+    Buys spend TRADE_AMOUNT_USD when flat and sells close the whole position.
+    The client order ID is derived from the bar, so a decision is placed once.
+    """
+    manager = get_order_manager()
+    held = manager.book.qty(symbol)
+    side = order_sides(action, held)
+    if not side or manager.has_open(symbol):
+        return None
+    qty = order_quantities(side, held, dollar_quantity(trade_amount, price)).item()
+    metrics.counter("orders_total", "Orders queued by side").inc(side=action)
+    return manager.submit(symbol, action, qty, client_order_id("robinhood", symbol, action, bar_ts))
 
 def log_trade(symbol, action, price, sma, rsi, macd):
-    global current_profit
-    with lock:
-        if action == "buy":
-            purchase_prices[symbol] = price
-        elif action == "sell" and symbol in purchase_prices:
-            current_profit += price - purchase_prices[symbol]
-            del purchase_prices[symbol]
-    with open(log_file, mode="a", newline="") as file:
-        writer = csv.writer(file)
-        writer.writerow([datetime.now(), symbol, action, price, sma, rsi, macd])
+    metrics.counter("decisions_total", "Strategy decisions by action").inc(action=action)
+    get_trade_journal().append(ts=datetime.now(timezone.utc), symbol=symbol, action=action,
+                               price=price, sma=sma, rsi=rsi, macd=macd)
 
 def generate_price_bar(prices):
     if not prices:
@@ -139,17 +313,20 @@ def generate_price_bar(prices):
     return bar
 
 def create_status_summary(statuses):
-    message = ""
-    with lock:
-        for status in statuses:
-            message += f"{status['symbol']} — {status['action']} @ ${status['price']:.2f} | Δ ${status['change']:.2f} ({status['change_pct']:.2f}%)\n"
-            message += f"SMA: ${status['sma']:.2f} | RSI: {status['rsi']:.2f} | MACD: {status['macd']:.2f} {status['macd_icon']}\n"
-            message += f"{status['price_bar']}\n"
-            message += f"Chart: https://www.tradingview.com/symbols/{status['symbol']}USD/\n\n"
-        message += f"**Current Profit:** ${current_profit:.2f}\n"
-    return f"**Crypto Bot Update**\n\n{message}"
+    lines = ["**Crypto Bot Update**", ""]
+    for status in statuses:
+        lines += [
+            f"{status['symbol']} — {status['action']} @ ${status['price']:.2f} | Δ ${status['change']:.2f} ({status['change_pct']:.2f}%)",
+            f"SMA: ${status['sma']:.2f} | RSI: {status['rsi']:.2f} | MACD: {status['macd']:.2f} {status['macd_icon']}",
+            status['price_bar'],
+            f"Chart: https://www.tradingview.com/symbols/{status['symbol']}USD/",
+            "",
+        ]
+    lines.append(f"**Current Profit:** ${get_order_manager().book.realized_pnl():.2f}")
+    return "\n".join(lines) + "\n"
 
 def create_or_update_discord_message(statuses):
+    """Queue the status summary; the notifier edits one persistent message in place."""
     global last_status_message
     if not discord_url:
         return
@@ -157,86 +334,114 @@ def create_or_update_discord_message(statuses):
     if status_summary == last_status_message:
         return
     last_status_message = status_summary
-    try:
-        webhook = DiscordWebhook(url=discord_url, content=status_summary)
-        webhook.execute()
-    except Exception as e:
-        logging.error(f"Failed to send/update Discord message: {e}")
+    notifier(discord_url).publish("status", status_summary)
 
 def send_discord_notification(message):
     if discord_url:
-        try:
-            webhook = DiscordWebhook(url=discord_url, content=message)
-            webhook.execute()
-        except Exception as e:
-            logging.error(f"Failed to send Discord notification: {e}")
+        notifier(discord_url).publish(None, message)
+
+def _float_or_none(value):
+    return float(value) if value not in (None, "") else None
+
+@metrics.timed("robinhood_request_seconds", "Robinhood API calls", request="historicals")
+def fetch_historicals(symbol, symbol_type, now):
+    """Extend the local bar store with new bars and return the last week of closes and times.
+
+    Robinhood historicals have no start parameter, so a warm store (newest bar
+    under a day old) fetches the one-day span instead of the full week.
+    """
+    store = get_bar_store()
+    last = store.last_timestamp(symbol, BAR_INTERVAL)
+    warm = last is not None and now - datetime.fromisoformat(last.replace("Z", "+00:00")) < timedelta(days=1)
+    if symbol_type == "crypto":
+        data = guarded("robinhood.historicals", r.crypto.get_crypto_historicals,
+                       symbol, interval=BAR_INTERVAL, span='day' if warm else 'week')
+        if not data:
+            raise ValueError("Empty response from Robinhood crypto historicals")
+    else:
+        data = guarded("robinhood.historicals", r.stocks.get_stock_historicals,
+                       symbol, interval=BAR_INTERVAL, span='day' if warm else 'week')
+        if not data:
+            raise ValueError("Empty response from Robinhood stock historicals")
+
+    rows = []
+    for p in data:
+        if p.get("close_price") in (None, "") or not p.get("begins_at"):
+            continue
+        ts = to_iso(p["begins_at"])
+        if last is None or ts >= last:
+            rows.append((ts, _float_or_none(p.get("open_price")), _float_or_none(p.get("high_price")),
+                         _float_or_none(p.get("low_price")), float(p["close_price"]),
+                         _float_or_none(p.get("volume"))))
+    store.append(symbol, BAR_INTERVAL, rows)
+
+    bars = store.load(symbol, BAR_INTERVAL, since=now - HISTORY_WINDOW)
+    return [b[4] for b in bars], [b[0] for b in bars]
+
+@metrics.timed("robinhood_request_seconds", "Robinhood API calls", request="quote")
+def fetch_quote(symbol, symbol_type):
+    return snapshot.quote(symbol, symbol_type)
+
+def load_price_data(symbol, symbol_type):
+    """Fetch historicals and the current quote concurrently, together bounded by the request timeout."""
+    now = datetime.now(timezone.utc)
+    deadline = time.monotonic() + request_timeout
+    historicals = request_executor.submit(fetch_historicals, symbol, symbol_type, now)
+    quote = request_executor.submit(fetch_quote, symbol, symbol_type)
+    prices, times = historicals.result(timeout=request_timeout)
+    current_price = float(quote.result(timeout=max(0.0, deadline - time.monotonic())))
+    return current_price, prices, times
+
+def price_loader(symbol):
+    """Loader and TTL of a symbol's price cache entry."""
+    symbol_type = symbol_type_map.get(symbol, "crypto")
+    return (lambda: load_price_data(symbol, symbol_type)), price_ttls.get(symbol_type, price_ttls["crypto"])
+
+def prefetch_prices(symbols):
+    """Refresh every symbol's price data in the background so the next cycle finds it fresh."""
+    for symbol in symbols:
+        loader, ttl = price_loader(symbol)
+        price_cache.refresh(symbol, loader, ttl)
 
+@metrics.timed("price_data_seconds", "get_price_data latency, cache hits included")
 def get_price_data(symbol):
-    symbol_type = symbol_type_map.get(symbol, "crypto")
+    loader, ttl = price_loader(symbol)
     try:
-        now = datetime.now(timezone.utc)
-        keys_to_delete = [k for k, v in price_cache.items() if now - v['timestamp'] > CACHE_MAX_AGE]
-        for k in keys_to_delete:
-            del price_cache[k]
-
-        if symbol in price_cache:
-            cached = price_cache[symbol]
-            if now - cached['timestamp'] < CACHE_TTL:
-                return cached['current_price'], cached['prices']
-
-        prices = []
-        if symbol_type == "crypto":
-            data = r.crypto.get_crypto_historicals(symbol, interval='5minute', span='week')
-            if not data:
-                raise ValueError("Empty response from Robinhood crypto historicals")
-            for p in data:
-                close_price = p.get("close_price")
-                if close_price not in (None, ""):
-                    prices.append(float(close_price))
-            quote = r.crypto.get_crypto_quote(symbol)
-            mark_price = quote.get('mark_price')
-        else:
-            data = r.stocks.get_stock_historicals(symbol, interval='5minute', span='day')
-            if not data:
-                raise ValueError("Empty response from Robinhood stock historicals")
-            for p in data:
-                close_price = p.get("close_price")
-                if close_price not in (None, ""):
-                    prices.append(float(close_price))
-            mark_price = r.stocks.get_latest_price(symbol)[0]
-
-        current_price = float(mark_price)
-        price_cache[symbol] = {'current_price': current_price, 'prices': prices, 'timestamp': now}
-        return current_price, prices
+        return price_cache.get(symbol, loader, ttl=ttl)
+    except concurrent.futures.TimeoutError:
+        logging.error(f"Timed out fetching price data for {symbol} from Robinhood after {request_timeout}s")
+        return None, [], []
     except Exception as e:
         logging.error(f"Error fetching price data for {symbol} from Robinhood: {e}")
-        return None, []
-
-def fetch_status_for_symbol(price_tuple):
-    if len(price_tuple) != 3:
-        return None
-    symbol, current_price, prices = price_tuple
-    if not prices:
-        return None
-
-    sma, rsi, macd, macd_icon = calculate_indicators(prices)
+        return None, [], []
+
+def fetch_symbol_price_data(symbol):
+    logging.info(f"📊 Fetching price data for {symbol}")
+    start = time.perf_counter()
+    current_price, prices, times = get_price_data(symbol)
+    elapsed = time.perf_counter() - start
+    if current_price is not None and prices:
+        logging.info(f"✅ {symbol}: Got {len(prices)} prices, Current Price: {current_price} ({elapsed:.2f}s)")
+        return symbol, current_price, prices, times
+    logging.warning(f"⚠️ {symbol}: Missing or invalid price data ({elapsed:.2f}s)")
+    return None
+
+def fetch_all_price_data(symbols):
+    """Fetch price data for all symbols concurrently, bounded by FETCH_CONCURRENCY."""
+    return [res for res in fetch_executor.map(fetch_symbol_price_data, symbols) if res is not None]
+
+def build_status(price_tuple, signal):
+    """Status entry for one symbol from its price data and evaluate_signals() result; logs the decision."""
+    symbol, current_price, prices, times = price_tuple
+    sma, rsi, macd, action = signal
+    macd_icon = "📈" if macd > 0 else "📉"
     price_bar = generate_price_bar(prices)
-    action = "hold"
-    change = current_price - prices[-2]
-    change_pct = (change / prices[-2]) * 100 if prices[-2] else 0
-
-    if strategy == 1:
-        if current_price > sma and rsi < 70 and macd > 0:
-            action = "buy"
-        elif current_price < sma and rsi > 30 and macd < 0:
-            action = "sell"
-    elif strategy == 2:
-        if current_price > sma:
-            action = "buy"
-        else:
-            action = "sell"
+    change = current_price - prices[-2] if len(prices) > 1 else 0.0
+    change_pct = (change / prices[-2]) * 100 if len(prices) > 1 and prices[-2] else 0
 
     log_trade(symbol, action, current_price, sma, rsi, macd)
+    if times:
+        execute_trade(symbol, action, current_price, times[-1])
 
     return {
         "symbol": symbol,
@@ -251,38 +456,89 @@ def fetch_status_for_symbol(price_tuple):
         "change_pct": change_pct,
     }
 
-if __name__ == "__main__":
+def run_cycle():
+    """Fetch prices for every symbol, evaluate them together and post the status message."""
+    with metrics.histogram("cycle_seconds", "Full trading cycle, excluding the sleep").time():
+        price_data = fetch_all_price_data(symbol_list)
+        signals = evaluate_signals(price_data) if price_data else []
+        statuses = [build_status(p, signal) for p, signal in zip(price_data, signals)]
+        create_or_update_discord_message(statuses)
+    metrics.gauge("last_cycle_timestamp_seconds", "Unix time the last cycle finished").set(time.time())
+    return statuses
+
+# Held by each cycle, so a settings change is applied between cycles, never during one
+cycle_lock = threading.Lock()
+
+def apply_settings(old, new):
+    """Apply reloaded settings: module globals, the symbol list, cache TTLs and the fetch pool sizes."""
+    global settings, strategy, trade_amount, stop_loss_pct, take_profit_pct, discord_url, alert_threshold
+    global fetch_concurrency, request_timeout, rh_rate, fetch_executor, request_executor
+    with cycle_lock:
+        settings = new
+        strategy = new.trading_strategy
+        trade_amount = new.trade_amount_usd
+        stop_loss_pct = new.stop_loss_percent
+        take_profit_pct = new.take_profit_percent
+        discord_url = new.discord_webhook_url
+        alert_threshold = new.alert_threshold_percent
+        request_timeout = new.request_timeout_seconds
+        http_adapter.timeout = request_timeout
+        price_ttls.update(crypto=new.price_cache_ttl_crypto_seconds, stock=new.price_cache_ttl_stock_seconds)
+        price_cache.stale_ttl = new.price_cache_stale_seconds
+        if new.symbols != old.symbols:
+            # Removed symbols keep their type so orders still open for them can be tracked
+            symbol_list[:] = [symbol for symbol, _ in new.symbols]
+            symbol_type_map.update(new.symbols)
+            universe.add(symbol_list)
+            logging.info(f"🔁 Trading {len(symbol_list)} symbols: {', '.join(symbol_list)}")
+        if new.fetch_concurrency != fetch_concurrency:
+            fetch_concurrency = new.fetch_concurrency
+            old_executors = (fetch_executor, request_executor)
+            fetch_executor = ThreadPoolExecutor(max_workers=fetch_concurrency, thread_name_prefix="fetch")
+            request_executor = ThreadPoolExecutor(max_workers=fetch_concurrency * 2, thread_name_prefix="request")
+            for executor in old_executors:
+                executor.shutdown(wait=False)
+        snapshot.configure(new.snapshot_ttl_seconds, fetch_concurrency)
+        if new.robinhood_rate_per_second != rh_rate:
+            rh_rate = new.robinhood_rate_per_second
+            for name in ENDPOINTS:
+                endpoint(name).bucket.set_rate(rh_rate)
+
+def run():
+    """Main trading loop."""
+    get_trade_journal()
+    metrics.register_stats("limiter", limiter_stats, label="endpoint")
+    metrics.register_stats("price_cache", price_cache.stats)
+    metrics.serve(metrics_port)
     robinhood_auth()
-    with ThreadPoolExecutor(max_workers=len(symbol_list)) as executor:
-        while True:
-            load_dotenv(override=True)
-            strategy = int(os.getenv("TRADING_STRATEGY", 1))
-
-            now = datetime.now(timezone.utc).astimezone()  # local time with tzinfo
-            
-            # Only sleep if there are stocks and market is closed; crypto runs 24/7
-            if any(symbol_type_map.get(sym, "crypto") == "stock" for sym in symbol_list):
-                if now.hour < 9 or now.hour > 16:
-                    logging.info("Stock market closed. Sleeping 5 minutes.")
-                    time.sleep(300)
-                    continue
-
-            price_data = []
-            for symbol in symbol_list:
-                logging.info(f"📊 Fetching price data for {symbol}")
-                current_price, prices = get_price_data(symbol)
-                if current_price is not None and prices:
-                    logging.info(f"✅ {symbol}: Got {len(prices)} prices, Current Price: {current_price}")
-                    price_data.append((symbol, current_price, prices))
-                else:
-                    logging.warning(f"⚠️ {symbol}: Missing or invalid price data")
-
-            results = list(executor.map(fetch_status_for_symbol, price_data))
-
-            statuses = [res for res in results if res is not None]
-            create_or_update_discord_message(statuses)
-            time.sleep(300)
-            if not statuses:
-                logging.info("No valid statuses to report.")
-                continue
+    get_order_manager()
+    if run_holdings:
+        # Same process, so holdings shares the positions/quotes snapshot with the bot
+        import holdings
+        threading.Thread(target=holdings.run, name="holdings", daemon=True).start()
+    settings_watcher.subscribe(apply_settings)
+    settings_watcher.start()
+    while True:
+        now = datetime.now(timezone.utc).astimezone()  # local time with tzinfo
+        
+        # Only sleep if there are stocks and market is closed; crypto runs 24/7
+        if any(symbol_type_map.get(sym, "crypto") == "stock" for sym in symbol_list):
+            if now.hour < 9 or now.hour > 16:
+                logging.info("Stock market closed. Sleeping 5 minutes.")
+                time.sleep(CYCLE_SECONDS)
+                continue
+
+        with cycle_lock:
+            statuses = run_cycle()
+        logging.info(f"API limiter state: {limiter_stats()}")
+        logging.info(f"Price cache: {price_cache.stats()}")
+        lead = settings.price_prefetch_seconds
+        time.sleep(CYCLE_SECONDS - lead)
+        prefetch_prices(symbol_list)
+        time.sleep(lead)
+        if not statuses:
+            logging.info("No valid statuses to report.")
+            continue
 
+if __name__ == "__main__":
+    run()
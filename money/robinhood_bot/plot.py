@@ -1,11 +1,15 @@
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 from indicators import add_indicators
 
-def plot_chart(csv_path):
-    df = pd.read_csv(csv_path)
-    df = add_indicators(df)
-    df = df.dropna()
+def plot_chart(csv_path, stream=False, max_points=200_000, chunk_rows=1_000_000):
+    if stream:
+        df = sampled_indicators(csv_path, max_points, chunk_rows)
+    else:
+        df = pd.read_csv(csv_path)
+        df = add_indicators(df)
+        df = df.dropna()
     plt.figure(figsize=(12,6))
     plt.plot(df['close'], label='Price')
     plt.plot(df['sma5'], label='SMA5')
@@ -17,5 +21,17 @@ def plot_chart(csv_path):
     plt.ylabel('Price')
     plt.show()
 
+def sampled_indicators(csv_path, max_points=200_000, chunk_rows=1_000_000):
+    """Every n-th row of price and indicators, computed in chunks from a memory-mapped copy of the CSV."""
+    from ingest import indicator_chunks, open_prices, warmup_rows
+    prices = open_prices(csv_path)
+    step = max(1, -(-(len(prices) - warmup_rows()) // max_points))
+    parts = []
+    for offset, _, columns in indicator_chunks(prices, chunk_rows):
+        first = -offset % step
+        parts.append(pd.DataFrame({k: v[first::step] for k, v in columns.items()},
+                                  index=np.arange(offset + first, offset + len(columns['close']), step)))
+    return pd.concat(parts) if parts else pd.DataFrame(columns=['close', 'sma5', 'ema12', 'ema26'])
+
 if __name__ == "__main__":
     plot_chart("historical_prices.csv")
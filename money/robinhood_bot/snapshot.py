@@ -0,0 +1,114 @@
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+import robin_stocks.robinhood as r
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.ratelimit import guarded
+
+
+class MarketSnapshot:
+    """Short-lived cache of Robinhood crypto positions and quotes shared by the bots.
+
+    The positions endpoint returns every holding, so one call serves all
+    symbols. Quotes missing from the cache are fetched concurrently (crypto)
+    or in one batched request (stocks). Concurrent requests for the same key
+    wait for the call already in flight instead of issuing their own.
+    """
+
+    def __init__(self, ttl=30.0, max_workers=8):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = {}   # key -> (value, fetched_at)
+        self.inflight = {}  # key -> Future
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="snapshot")
+
+    def configure(self, ttl, max_workers):
+        """Apply new settings; the quote pool is replaced when its size changes."""
+        with self.lock:
+            self.ttl = ttl
+            if max_workers == self.max_workers:
+                return
+            old, self.max_workers = self.executor, max_workers
+            self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="snapshot")
+        old.shutdown(wait=False)
+
+    def _get(self, key, fetch):
+        """Cached value for `key`, calling `fetch()` at most once across threads when stale."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and time.monotonic() - entry[1] < self.ttl:
+                return entry[0]
+            future = self.inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self.inflight[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            value = fetch()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            with self.lock:
+                self.entries[key] = (value, time.monotonic())
+            return value
+        finally:
+            with self.lock:
+                del self.inflight[key]
+
+    def crypto_positions(self):
+        """Held quantity per currency code, from a single positions request."""
+        def fetch():
+            positions = guarded("robinhood.positions", r.crypto.get_crypto_positions)
+            return {p['currency']['code']: float(p['quantity']) for p in positions}
+        return self._get(("positions", "crypto"), fetch)
+
+    def quote(self, symbol, symbol_type="crypto"):
+        """Current price of one symbol."""
+        if symbol_type == "crypto":
+            return self._get(("quote", symbol), lambda: float(
+                guarded("robinhood.quotes", r.crypto.get_crypto_quote, symbol)['mark_price']))
+        return self._get(("quote", symbol), lambda: float(
+            guarded("robinhood.quotes", r.stocks.get_latest_price, symbol)[0]))
+
+    def quotes(self, symbols, symbol_type="crypto"):
+        """Current prices for several symbols; symbols that fail are logged and left out."""
+        with self.lock:
+            executor = self.executor
+            now = time.monotonic()
+            prices = {s: self.entries[("quote", s)][0] for s in symbols
+                      if ("quote", s) in self.entries and now - self.entries[("quote", s)][1] < self.ttl}
+        missing = [s for s in symbols if s not in prices]
+        if not missing:
+            return prices
+        if symbol_type != "crypto":
+            try:
+                latest = guarded("robinhood.quotes", r.stocks.get_latest_price, missing)
+                fetched_at = time.monotonic()
+                with self.lock:
+                    for symbol, price in zip(missing, latest):
+                        if price is not None:
+                            prices[symbol] = float(price)
+                            self.entries[("quote", symbol)] = (prices[symbol], fetched_at)
+            except Exception as e:
+                logging.error(f"Error fetching quotes for {', '.join(missing)}: {e}")
+            return prices
+        futures = {s: executor.submit(self.quote, s) for s in missing}
+        for symbol, future in futures.items():
+            try:
+                prices[symbol] = future.result()
+            except Exception as e:
+                logging.error(f"Error fetching quote for {symbol}: {e}")
+        return prices
+
+
+# Shared by the bot and holdings; each applies SNAPSHOT_TTL_SECONDS and FETCH_CONCURRENCY from its settings
+snapshot = MarketSnapshot()
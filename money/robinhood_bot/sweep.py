@@ -0,0 +1,86 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import talib
+import typer
+from backtest import run_backtest
+from indicators import add_indicators
+
+PARAMS = ["rsi_period", "rsi_buy", "rsi_sell", "stop_loss"]
+
+
+def parse_range(spec, cast=float):
+    """Parse "25,30,35" or an inclusive "start:stop:step" range into a list of values."""
+    values = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if ":" in part:
+            try:
+                start, stop, step = (float(x) for x in part.split(":"))
+            except ValueError:
+                raise typer.BadParameter(f"{part!r} is not a start:stop:step range") from None
+            if step == 0 or (stop - start) / step < 0:
+                raise typer.BadParameter(f"the step of {part!r} must be nonzero and lead from start to stop")
+            count = int(round((stop - start) / step)) + 1
+            values.extend(cast(round(start + i * step, 10)) for i in range(count))
+        else:
+            values.append(cast(part))
+    return sorted(set(values))
+
+
+def sweep_symbol(csv_path, grid):
+    """Backtest every parameter combination for one CSV.
+
+    The base indicator columns are computed once and RSI once per period; every
+    threshold/stop-loss combination reuses those arrays.
+    """
+    df = add_indicators(pd.read_csv(csv_path))
+    close = df['close'].to_numpy(dtype=float)
+    timestamps = df['timestamp'].to_numpy() if 'timestamp' in df else None
+    base_valid = df.notna().all(axis=1).to_numpy()
+    symbol = Path(csv_path).stem
+
+    rows = []
+    for rsi_period in grid["rsi_period"]:
+        rsi = talib.RSI(close, timeperiod=rsi_period)
+        valid = base_valid & ~np.isnan(rsi)
+        c, r = close[valid], rsi[valid]
+        ts = timestamps[valid] if timestamps is not None else None
+        for rsi_buy, rsi_sell, stop_loss in itertools.product(
+                grid["rsi_buy"], grid["rsi_sell"], grid["stop_loss"]):
+            if rsi_buy >= rsi_sell:
+                continue
+            result = run_backtest(c, r, ts, rsi_buy=rsi_buy, rsi_sell=rsi_sell, stop_loss=stop_loss)
+            rows.append({"symbol": symbol, "rsi_period": rsi_period, "rsi_buy": rsi_buy,
+                         "rsi_sell": rsi_sell, "stop_loss": stop_loss, **result.stats})
+    return rows
+
+
+def run_sweep(csv_paths, grid, workers=None, output="sweep_results.csv"):
+    """Run the grid over all CSVs on a process pool and write a ranked results table.
+
+    Ranking is by return, with ties broken on symbol and parameters, so the table
+    does not depend on the number of workers.
+    """
+    csv_paths = sorted(csv_paths)
+    if workers == 1:
+        results = [sweep_symbol(path, grid) for path in csv_paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers or None) as executor:
+            results = list(executor.map(sweep_symbol, csv_paths, itertools.repeat(grid)))
+
+    table = pd.DataFrame([row for rows in results for row in rows])
+    if table.empty:
+        return table
+    table = table.sort_values(["return_pct", "symbol", *PARAMS],
+                              ascending=[False, True, True, True, True, True],
+                              kind="mergesort").reset_index(drop=True)
+    table.insert(0, "rank", table.index + 1)
+    if output:
+        table.to_csv(output, index=False)
+    return table
@@ -0,0 +1,258 @@
+"""Walk-forward optimization and Monte Carlo robustness checks.
+
+The price series is split into rolling windows of `train` bars followed by
+`test` bars. On each train window every combination of RSI thresholds, EMA
+spans, stop-loss and take-profit is backtested with the alpaca crossover rules
+(crossover_signals() seeded by RSI), and the best one by return is run on the
+test window that follows. Indicator columns are computed once over the whole
+series and shared with the worker processes through shared memory, so no
+window recomputes them.
+
+Window results are appended to a JSONL checkpoint as they finish; rerunning
+with the same settings skips the windows already in it. The out-of-sample
+trades are then resampled: shuffling their order gives a drawdown
+distribution and bootstrapping them gives confidence intervals on the return.
+"""
+import hashlib
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from backtest import run_signals
+from ingest import open_prices
+
+from common.signals import crossover_signals
+
+GRID_PARAMS = ["rsi_buy", "rsi_sell", "ema_fast", "ema_slow", "stop_loss", "take_profit"]
+
+# This process's views of the shared indicator columns, set by _use()
+_shm = None
+_columns = {}
+
+
+def ema_column(close, span):
+    """EMA seeded with the first close, like UniverseIndicators."""
+    return pd.Series(close).ewm(span=span, adjust=False).mean().to_numpy()
+
+
+def rsi_column(close, period):
+    """Rolling-mean RSI with the first bar counted as no change, like UniverseIndicators."""
+    delta = np.diff(close, prepend=close[:1])
+    gain = pd.Series(np.maximum(delta, 0)).rolling(period).mean().to_numpy()
+    loss = pd.Series(np.maximum(-delta, 0)).rolling(period).mean().to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(loss == 0, np.where(gain > 0, 100.0, np.nan), 100 - 100 / (1 + gain / loss))
+
+
+def combinations(grid):
+    """Parameter dicts of the grid in a fixed order, skipping inverted RSI thresholds and EMA spans."""
+    for values in itertools.product(*(grid[p] for p in GRID_PARAMS)):
+        params = dict(zip(GRID_PARAMS, values))
+        if params["rsi_buy"] < params["rsi_sell"] and params["ema_fast"] < params["ema_slow"]:
+            yield params
+
+
+def windows(rows, train, test):
+    """(train_start, test_start, test_end) of each rolling window, stepping by `test` bars."""
+    return [(start, start + train, min(start + train + test, rows))
+            for start in range(0, rows - train, test)]
+
+
+def _share(columns):
+    """Copy named float64 columns into one shared memory block; returns it and the column order."""
+    names = list(columns)
+    rows = len(columns[names[0]])
+    shm = SharedMemory(create=True, size=max(1, len(names) * rows * 8))
+    block = np.ndarray((len(names), rows), dtype=np.float64, buffer=shm.buf)
+    for i, name in enumerate(names):
+        block[i] = columns[name]
+    return shm, names
+
+
+def _use(shm, names, rows):
+    global _shm, _columns
+    _shm = shm
+    _columns = dict(zip(names, np.ndarray((len(names), rows), dtype=np.float64, buffer=shm.buf)))
+
+
+def _attach(shm_name, names, rows):
+    """Worker initializer: map the parent's shared indicator block."""
+    _use(SharedMemory(name=shm_name), names, rows)
+
+
+def _window(column, start, stop):
+    """A column's values over start..stop and the values one bar earlier."""
+    values = column[start:stop]
+    previous = column[start - 1:stop - 1] if start else np.concatenate(([np.nan], column[:stop - 1]))
+    return values, previous
+
+
+def _backtest(params, start, stop, signals=None):
+    close = _columns["close"][start:stop]
+    if signals is None:
+        fast, fast_prev = _window(_columns[f"ema{params['ema_fast']}"], start, stop)
+        slow, slow_prev = _window(_columns[f"ema{params['ema_slow']}"], start, stop)
+        signals = crossover_signals(fast, slow, fast_prev, slow_prev, _columns["rsi"][start:stop],
+                                    params["rsi_buy"], params["rsi_sell"])
+    return run_signals(close, signals == "BUY", signals == "SELL", stop_loss=params["stop_loss"],
+                       take_profit=params["take_profit"]), signals
+
+
+def trade_returns(trades):
+    """Return of each closed round trip, from entry and exit prices."""
+    return [exit_["price"] / entry["price"] - 1 for entry, exit_ in zip(trades[::2], trades[1::2])]
+
+
+def evaluate_window(index, train_start, test_start, test_end, grid):
+    """Fit the grid on one train window and run the best parameters on the test window after it.
+
+    Signals only depend on the RSI and EMA parameters, so each signal array is
+    reused for every stop-loss/take-profit pair.
+    """
+    best, best_stats, signal_cache = None, None, {}
+    for params in combinations(grid):
+        key = tuple(params[p] for p in ("rsi_buy", "rsi_sell", "ema_fast", "ema_slow"))
+        result, signal_cache[key] = _backtest(params, train_start, test_start, signal_cache.get(key))
+        if best is None or result.stats["return_pct"] > best_stats["return_pct"]:
+            best, best_stats = params, result.stats
+    test, _ = _backtest(best, test_start, test_end)
+    return {"window": index, "train_start": train_start, "test_start": test_start, "test_end": test_end,
+            "params": best, "train": best_stats, "test": test.stats, "returns": trade_returns(test.trades)}
+
+
+def monte_carlo(returns, sims=10_000, seed=0):
+    """Trade-order shuffles and bootstrap resamples of per-trade returns.
+
+    Shuffling keeps the total return but changes the path, which gives a
+    distribution of max drawdown; resampling with replacement gives one of the
+    total return. Simulations run in chunks to bound memory.
+    """
+    returns = np.asarray(returns, dtype=float)
+    if not len(returns) or not sims:
+        return {}
+    rng = np.random.default_rng(seed)
+    chunk = max(1, 2_000_000 // len(returns))
+    drawdowns, totals = [], []
+    for done in range(0, sims, chunk):
+        n = min(chunk, sims - done)
+        equity = np.cumprod(1 + rng.permuted(np.tile(returns, (n, 1)), axis=1), axis=1)
+        peak = np.maximum.accumulate(np.maximum(equity, 1.0), axis=1)
+        drawdowns.append(np.max((peak - equity) / peak, axis=1))
+        totals.append(np.prod(1 + rng.choice(returns, size=(n, len(returns))), axis=1) - 1)
+    drawdowns, totals = np.concatenate(drawdowns) * 100, np.concatenate(totals) * 100
+    stats = {"trades": len(returns), "sims": sims, "loss_probability": float(np.mean(totals < 0))}
+    for q in (5, 50, 95):
+        stats[f"return_p{q}"] = float(np.percentile(totals, q))
+        stats[f"max_drawdown_p{q}"] = float(np.percentile(drawdowns, q))
+    return stats
+
+
+def _config_hash(csv_path, train, test, rsi_period, grid):
+    st = os.stat(csv_path)
+    config = {"source": str(Path(csv_path).resolve()), "size": st.st_size, "mtime": st.st_mtime,
+              "train": train, "test": test, "rsi_period": rsi_period, "grid": grid}
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class CheckpointMismatch(ValueError):
+    """The checkpoint was written by a run with different settings."""
+
+
+class EmptyGrid(ValueError):
+    """No grid combination has rsi_buy < rsi_sell and ema_fast < ema_slow."""
+
+
+def load_checkpoint(path, config_hash):
+    """Window results already in a checkpoint written with the same settings, by window index.
+
+    A last line cut short by a crash is dropped from the file, so its window
+    runs again and later results append cleanly.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, "rb") as f:
+        raw = f.read().splitlines(keepends=True)
+    rows, good_bytes = [], 0
+    for i, line in enumerate(raw):
+        try:
+            row = json.loads(line) if line.strip() else None
+        except ValueError:
+            if i < len(raw) - 1:
+                raise
+            with open(path, "r+b") as f:
+                f.truncate(good_bytes)
+            break
+        if row is not None:
+            rows.append(row)
+        good_bytes += len(line)
+    if not rows or rows[0].get("config") != config_hash:
+        raise CheckpointMismatch(f"{path} was written with different settings; use another checkpoint or start fresh")
+    return {row["window"]: row for row in rows[1:]}
+
+
+def walk_forward(csv_path, grid, train=20_000, test=5_000, rsi_period=14, workers=None,
+                 checkpoint="walkforward.jsonl", fresh=False):
+    """Run (or resume) a walk-forward optimization; returns the window results in order."""
+    if next(combinations(grid), None) is None:
+        raise EmptyGrid("no parameter combination has rsi_buy < rsi_sell and ema_fast < ema_slow")
+    config_hash = _config_hash(csv_path, train, test, rsi_period, grid)
+    if fresh and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    done = load_checkpoint(checkpoint, config_hash)
+    if not done:
+        with open(checkpoint, "w") as f:
+            f.write(json.dumps({"config": config_hash}) + "\n")
+
+    prices = open_prices(csv_path)
+    close = np.asarray(prices.close, dtype=np.float64)
+    todo = [(i, *w) for i, w in enumerate(windows(len(close), train, test)) if i not in done]
+    if not todo:
+        return [done[i] for i in sorted(done)]
+
+    columns = {"close": close, "rsi": rsi_column(close, rsi_period)}
+    for span in sorted(set(grid["ema_fast"]) | set(grid["ema_slow"])):
+        columns[f"ema{span}"] = ema_column(close, span)
+    shm, names = _share(columns)
+    del columns
+    try:
+        with open(checkpoint, "a") as out:
+            def record(row):
+                done[row["window"]] = row
+                out.write(json.dumps(row) + "\n")
+                out.flush()
+
+            if workers == 1:
+                _use(shm, names, len(close))
+                for task in todo:
+                    record(evaluate_window(*task, grid))
+            else:
+                with ProcessPoolExecutor(max_workers=workers or None, initializer=_attach,
+                                         initargs=(shm.name, names, len(close))) as executor:
+                    futures = [executor.submit(evaluate_window, *task, grid) for task in todo]
+                    for future in as_completed(futures):
+                        record(future.result())
+    finally:
+        _columns.clear()
+        shm.close()
+        shm.unlink()
+    return [done[i] for i in sorted(done)]
+
+
+def summarize_windows(rows, timestamps=None):
+    """One table row per window: chosen parameters and train/test return, with window dates when known."""
+    table = pd.DataFrame([{"window": r["window"], **r["params"],
+                           "train_return_pct": r["train"]["return_pct"], "test_return_pct": r["test"]["return_pct"],
+                           "test_trades": r["test"]["trades"]} for r in rows])
+    if timestamps is not None and len(table):
+        table.insert(1, "test_start", pd.to_datetime(timestamps[[r["test_start"] for r in rows]], utc=True))
+    return table
+
+
+def out_of_sample_return(rows):
+    """Compounded return of the test windows, each starting flat, in percent."""
+    return float((np.prod([1 + r["test"]["return_pct"] / 100 for r in rows]) - 1) * 100) if rows else 0.0
@@ -1,9 +1,20 @@
 import os
+import sys
 import requests
 import time
 import json
+from pathlib import Path
 from web3 import Web3
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common import metrics
+from common.ratelimit import check_response, endpoint, guarded, stats as limiter_stats
+
+# CoinGecko's free tier allows roughly 30 calls per minute
+endpoint("coingecko", rate=0.5, capacity=5)
+COINGECKO_TIMEOUT_SECONDS = 10
+METRICS_PORT = int(os.getenv("STAKING_METRICS_PORT", 9103))
+
 # Lido contract address and ABI for stETH
 LIDO_CONTRACT_ADDRESS = "0xae7ab96520DE3A18E5e111B5EaAb095312D7fE84"
 LIDO_ABI = [
@@ -45,11 +56,13 @@ else:
 lido_contract = web3.eth.contract(address=Web3.to_checksum_address(LIDO_CONTRACT_ADDRESS), abi=LIDO_ABI)
 
 # Fetch ETH price using CoinGecko
+@metrics.timed("coingecko_request_seconds", "CoinGecko price requests")
 def get_eth_price():
     try:
         url = "https://api.coingecko.com/api/v3/simple/price"
         params = {"ids": "ethereum", "vs_currencies": "usd"}
-        response = requests.get(url, params=params)
+        response = guarded("coingecko", lambda: check_response(
+            requests.get(url, params=params, timeout=COINGECKO_TIMEOUT_SECONDS)))
         response.raise_for_status()
         data = response.json()
         return data["ethereum"]["usd"]
@@ -76,6 +89,7 @@ def get_total_pooled_eth():
         return None
 
 # Automatically stake available ETH
+@metrics.timed("stake_seconds", "Balance check and staking transaction")
 def auto_stake_eth():
     try:
         balance = web3.eth.get_balance(YOUR_ETH_ADDRESS)
@@ -96,6 +110,7 @@ def auto_stake_eth():
         signed_txn = web3.eth.account.sign_transaction(txn, private_key=PRIVATE_KEY)
         tx_hash = web3.eth.send_raw_transaction(signed_txn.rawTransaction)
         print(f"🚀 Staking transaction sent! TX Hash: {web3.to_hex(tx_hash)}")
+        metrics.counter("stake_transactions_total", "Staking transactions sent").inc()
 
     except Exception as e:
         print(f"❌ Error staking ETH: {e}")
@@ -104,23 +119,27 @@ def auto_stake_eth():
 def staking_bot_loop():
     print("🔄 Entered staking bot loop...")
     while True:
-        eth_price = get_eth_price()
-        steth_balance = get_steth_balance()
-        pooled_eth = get_total_pooled_eth()
-
-        if eth_price and steth_balance is not None and pooled_eth is not None:
-            value_usd = steth_balance * eth_price
-            print(f"✅ ETH Price: ${eth_price}")
-            print(f"🔐 Your stETH Balance: {steth_balance:.4f} stETH (~${value_usd:.2f})")
-            print(f"🌊 Total ETH staked via Lido: {pooled_eth:.2f} ETH")
-            auto_stake_eth()
-        else:
-            print("❌ Failed to fetch one or more staking metrics.")
+        with metrics.histogram("cycle_seconds", "Full staking round").time():
+            eth_price = get_eth_price()
+            steth_balance = get_steth_balance()
+            pooled_eth = get_total_pooled_eth()
+
+            if eth_price and steth_balance is not None and pooled_eth is not None:
+                value_usd = steth_balance * eth_price
+                print(f"✅ ETH Price: ${eth_price}")
+                print(f"🔐 Your stETH Balance: {steth_balance:.4f} stETH (~${value_usd:.2f})")
+                print(f"🌊 Total ETH staked via Lido: {pooled_eth:.2f} ETH")
+                metrics.gauge("steth_balance", "stETH held").set(steth_balance)
+                auto_stake_eth()
+            else:
+                print("❌ Failed to fetch one or more staking metrics.")
 
         time.sleep(300)  # wait 5 minutes
 
 if __name__ == "__main__":
     print("🔄 Starting staking bot loop...")
+    metrics.register_stats("limiter", limiter_stats, label="endpoint")
+    metrics.serve(METRICS_PORT)
     try:
         staking_bot_loop()
     except Exception as e:
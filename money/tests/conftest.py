@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# Tests import like the bots do: `common` from money/, bot modules from their own directory.
+MONEY = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(MONEY))
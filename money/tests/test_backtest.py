@@ -0,0 +1,102 @@
+"""The backtest engine: against the original row-by-row loop, and chunked and streamed runs against one in-memory run."""
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import MONEY
+
+sys.path.insert(0, str(MONEY / "robinhood_bot"))
+from backtest import ChunkedBacktest, backtest, backtest_frame, run_backtest, run_signals
+from indicators import add_indicators
+
+
+def random_walk(seed, n):
+    rng = np.random.default_rng(seed)
+    return 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+
+
+def iterrows_backtest(df, rsi_buy=30, rsi_sell=70, stop_loss=0.02, balance=1000.0):
+    """The RSI backtest as it was before vectorizing: (trades, final balance)."""
+    df = add_indicators(df).dropna()
+    position, entry_price, trades = 0, 0, []
+    for _, row in df.iterrows():
+        price = row["close"]
+        if row["rsi14"] < rsi_buy and position == 0:
+            position, entry_price, balance = balance / price, price, 0
+            trades.append((row["timestamp"], "BUY", price))
+        elif row["rsi14"] > rsi_sell and position > 0:
+            balance, position = position * price, 0
+            trades.append((row["timestamp"], "SELL", price))
+        elif position > 0 and price < entry_price * (1 - stop_loss):
+            balance, position = position * price, 0
+            trades.append((row["timestamp"], "STOP LOSS SELL", price))
+    if position > 0:
+        balance = position * df.iloc[-1]["close"]
+    return trades, balance
+
+
+def price_frame(seed, n, volatility=0.01):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"timestamp": pd.date_range("2026-01-01", periods=n, freq="min", tz="UTC").astype(str),
+                         "close": 100 * np.exp(np.cumsum(rng.normal(0, volatility, n)))})
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("params", [{}, {"rsi_buy": 40, "rsi_sell": 60, "stop_loss": 0.005}])
+def test_vectorized_matches_the_iterrows_loop(seed, params):
+    df = price_frame(seed, 5_000)
+    expected_trades, expected_balance = iterrows_backtest(df.copy(), **params)
+    result = backtest_frame(df.copy(), verbose=False, **params)
+    assert len(expected_trades) > 5
+    assert [(t["timestamp"], t["action"], t["price"]) for t in result.trades] == expected_trades
+    assert result.stats["final_balance"] == pytest.approx(expected_balance, rel=1e-12)
+    assert result.stats["trades"] == len(expected_trades)
+
+
+def assert_same_result(actual, expected):
+    assert [(t["index"], t["action"]) for t in actual.trades] == [(t["index"], t["action"]) for t in expected.trades]
+    assert [t["price"] for t in actual.trades] == pytest.approx([t["price"] for t in expected.trades])
+    assert actual.stats == pytest.approx(expected.stats)
+    np.testing.assert_allclose(np.asarray(actual.equity), np.asarray(expected.equity))
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("chunk", [1, 97, 1000])
+def test_chunks_match_one_run(seed, chunk):
+    n = 3000
+    close = random_walk(seed, n)
+    rsi = np.random.default_rng(seed + 100).uniform(0, 100, n)
+    expected = run_backtest(close, rsi, rsi_buy=25, rsi_sell=75, stop_loss=0.02)
+    engine = ChunkedBacktest(n, rsi_buy=25, rsi_sell=75, stop_loss=0.02)
+    for offset in range(0, n, chunk):
+        engine.feed(offset, close[offset:offset + chunk], rsi[offset:offset + chunk])
+    assert_same_result(engine.result(), expected)
+
+
+@pytest.mark.parametrize("take_profit", [None, 0.03])
+def test_signal_run_exits(take_profit):
+    close = np.array([10, 10, 11, 9.7, 10, 10.4, 10.2, 10.5, 10.5])
+    buy = np.array([1, 0, 0, 0, 1, 0, 0, 0, 0], dtype=bool)
+    sell = np.array([0, 0, 0, 0, 0, 0, 0, 1, 0], dtype=bool)
+    result = run_signals(close, buy, sell, stop_loss=0.02, take_profit=take_profit)
+    actions = [(t["index"], t["action"]) for t in result.trades]
+    if take_profit is None:
+        assert actions == [(0, "BUY"), (3, "STOP LOSS SELL"), (4, "BUY"), (7, "SELL")]
+    else:
+        assert actions == [(0, "BUY"), (2, "TAKE PROFIT SELL"), (4, "BUY"), (5, "TAKE PROFIT SELL")]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_stream_matches_in_memory(seed, tmp_path):
+    n = 20_000
+    csv_path = tmp_path / "prices.csv"
+    pd.DataFrame({"timestamp": pd.date_range("2026-01-01", periods=n, freq="min", tz="UTC"),
+                  "close": random_walk(seed, n)}).to_csv(csv_path, index=False)
+    in_memory = backtest(csv_path, verbose=False)
+    streamed = backtest(csv_path, verbose=False, stream=True, chunk_rows=3_333)
+    assert len(in_memory.trades) > 10
+    assert [pd.Timestamp(t["timestamp"]) for t in streamed.trades] == \
+        [pd.Timestamp(t["timestamp"]) for t in in_memory.trades]
+    assert_same_result(streamed, in_memory)
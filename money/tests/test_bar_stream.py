@@ -0,0 +1,120 @@
+"""BarStreamRunner against the local fake market data stream (alpaca_bot/fake_stream.py)."""
+import asyncio
+import dataclasses
+import importlib.util
+import sys
+
+import pytest
+
+pytest.importorskip("alpaca_trade_api.stream")
+websockets = pytest.importorskip("websockets")
+
+from conftest import MONEY
+
+sys.path.insert(0, str(MONEY / "alpaca_bot"))
+from fake_stream import FakeBarServer
+
+
+@pytest.fixture
+def bot(monkeypatch, tmp_path):
+    """alpaca_bot/main.py imported under its own name, so it cannot clash with robinhood_bot/main.py."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("ALPACA_API_KEY", "key")
+    monkeypatch.setenv("ALPACA_SECRET_KEY", "secret")
+    spec = importlib.util.spec_from_file_location("alpaca_main", MONEY / "alpaca_bot" / "main.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_runner(bot, url, symbols, max_reconnects):
+    bot.config = dataclasses.replace(bot.config, alpaca_data_stream_url=url)
+    bot.BASE_URL = url  # trade updates fail against the fake server without reaching Alpaca
+    runner = bot.BarStreamRunner(symbols, max_reconnects)
+    bars = []
+
+    async def warm_up():
+        pass
+
+    async def handle_bar(bar):
+        bars.append((bar.symbol, bar.close))
+
+    runner.warm_up, runner.handle_bar = warm_up, handle_bar
+    return runner, bars
+
+
+async def serve(server):
+    ws = await websockets.serve(server.handler, "127.0.0.1", 0)
+    return ws, f"http://127.0.0.1:{ws.sockets[0].getsockname()[1]}"
+
+
+def test_streams_bars_until_stopped(bot):
+    async def scenario():
+        ws, url = await serve(FakeBarServer(interval=0.01, seed=1))
+        runner, bars = make_runner(bot, url, ["AAPL", "MSFT"], max_reconnects=2)
+        task = asyncio.create_task(runner.run())
+        for _ in range(500):
+            if len(bars) >= 10:
+                break
+            await asyncio.sleep(0.01)
+        await runner.stream.stop_ws()
+        await asyncio.wait_for(task, 15)
+        ws.close()
+        await ws.wait_closed()
+        return runner, bars
+
+    runner, bars = asyncio.run(scenario())
+    assert len(bars) >= 10
+    assert {symbol for symbol, _ in bars} == {"AAPL", "MSFT"}
+    assert runner.stream is None
+
+
+def test_reconnects_after_a_dropped_connection(bot):
+    """A server that closes after each batch of bars is reconnected to without counting as failing."""
+    async def scenario():
+        ws, url = await serve(FakeBarServer(interval=0.01, bars=2))
+        runner, bars = make_runner(bot, url, ["AAPL"], max_reconnects=1)
+        task = asyncio.create_task(runner.run())
+        for _ in range(500):
+            if len(bars) >= 6 or task.done():
+                break
+            await asyncio.sleep(0.01)
+        assert not task.done()
+        await runner.stream.stop_ws()
+        await asyncio.wait_for(task, 15)
+        ws.close()
+        await ws.wait_closed()
+        return bars
+
+    assert len(asyncio.run(scenario())) >= 6
+
+
+def test_gives_up_when_no_bars_arrive(bot):
+    """Connections that close before any bar exhaust the reconnect limit and raise for the fallback."""
+    async def scenario():
+        ws, url = await serve(FakeBarServer(interval=0.01, bars=0))
+        runner, bars = make_runner(bot, url, ["AAPL"], max_reconnects=3)
+        try:
+            with pytest.raises(RuntimeError, match="3 stream reconnects"):
+                await asyncio.wait_for(runner.run(), 15)
+        finally:
+            ws.close()
+            await ws.wait_closed()
+        return runner, bars
+
+    runner, bars = asyncio.run(scenario())
+    assert bars == []
+    assert runner.failures.attempts >= 4
+    assert runner.stream is None
+
+
+def test_gives_up_when_the_server_is_down(bot):
+    async def scenario():
+        ws, url = await serve(FakeBarServer())
+        ws.close()
+        await ws.wait_closed()
+        runner, _ = make_runner(bot, url, ["AAPL"], max_reconnects=2)
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(runner.run(), 15)
+
+    asyncio.run(scenario())
@@ -0,0 +1,217 @@
+"""PositionBook, OrderManager and AlpacaBroker against stub brokers."""
+import threading
+import time
+import types
+
+import pytest
+
+from common.execution import AlpacaBroker, OrderManager, PositionBook
+
+
+class StubBroker:
+    """Answers submit() and status() from per-order scripts of result dicts; records the calls."""
+
+    def __init__(self, results=None, positions=None):
+        self.results = results or {}  # client order ID -> list of results, the last one repeated
+        self.held = positions
+        self.submitted = []
+        self.positions_calls = 0
+        self.lock = threading.Lock()
+
+    def _next(self, order):
+        with self.lock:
+            script = self.results.get(order.client_order_id) or [
+                {"status": "filled", "broker_id": order.client_order_id, "filled_qty": order.qty,
+                 "filled_avg_price": 10.0}]
+            return script.pop(0) if len(script) > 1 else script[0]
+
+    def submit(self, order):
+        self.submitted.append(order.client_order_id)
+        return self._next(order)
+
+    def status(self, order):
+        return self._next(order)
+
+    def positions(self):
+        self.positions_calls += 1
+        return self.held
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def manager_for():
+    managers = []
+
+    def make(broker, **kwargs):
+        kwargs.setdefault("poll_interval", 3600)  # tests drive polling themselves
+        manager = OrderManager(broker, reconcile_interval=0, **kwargs)
+        managers.append(manager)
+        return manager
+
+    yield make
+    for manager in managers:
+        manager.close()
+
+
+def test_apply_fill_averages_buys_and_realizes_sells():
+    book = PositionBook()
+    book.apply_fill("A", "buy", 2.0, 10.0)
+    book.apply_fill("A", "buy", 2.0, 20.0)
+    assert book.get("A").avg_entry_price == pytest.approx(15.0)
+    book.apply_fill("A", "sell", 1.0, 21.0)
+    position = book.get("A")
+    assert (position.qty, position.avg_entry_price) == (3.0, 15.0)
+    assert book.realized_pnl() == pytest.approx(6.0)
+    book.apply_fill("A", "sell", 3.0, 14.0)
+    assert book.get("A") is None
+    assert book.qty("A") == 0.0
+    assert book.realized_pnl() == pytest.approx(3.0)
+
+
+def test_apply_fill_books_no_profit_without_an_entry_price():
+    book = PositionBook()
+    book.load({"A": (1.0, 0.0)})
+    book.apply_fill("A", "sell", 1.0, 50.0)
+    assert book.realized_pnl() == 0.0
+    assert book.get("A") is None
+
+
+def test_book_state_round_trip():
+    book = PositionBook()
+    book.apply_fill("A", "buy", 1.5, 4.0)
+    book.apply_fill("B", "buy", 1.0, 2.0)
+    book.apply_fill("B", "sell", 1.0, 3.0)
+    restored = PositionBook()
+    restored.restore(book.state())
+    assert restored.state() == book.state()
+
+
+def test_resubmitted_client_order_id_is_not_placed_again(manager_for):
+    broker = StubBroker()
+    manager = manager_for(broker)
+    first = manager.submit("A", "buy", 1.0, "id-1")
+    again = manager.submit("A", "buy", 1.0, "id-1")
+    assert manager.wait(timeout=5)
+    assert again is first
+    assert broker.submitted == ["id-1"]
+    assert manager.book.qty("A") == 1.0
+    assert manager.stats()["duplicates"] == 1
+    assert manager.submit("A", "buy", 1.0, "id-1") is first  # still known after it filled
+    assert broker.submitted == ["id-1"]
+
+
+def test_partial_fills_apply_each_increment_once(manager_for):
+    broker = StubBroker({"id-1": [
+        {"status": "partially_filled", "broker_id": "b1", "filled_qty": "0.4", "filled_avg_price": "10"},
+        {"status": "partially_filled", "broker_id": "b1", "filled_qty": "0.4", "filled_avg_price": "10"},
+        {"status": "filled", "broker_id": "b1", "filled_qty": "1.0", "filled_avg_price": "11"},
+    ]})
+    fills = []
+    manager = manager_for(broker, on_fill=lambda order, qty, price: fills.append((qty, price)))
+    order = manager.submit("A", "buy", 1.0, "id-1")
+    wait_until(lambda: order.status != "new")
+    assert order.status == "partially_filled" and manager.has_open("A")
+    assert manager.book.qty("A") == pytest.approx(0.4)
+
+    manager._apply(order, broker.status(order))  # same cumulative quantity: nothing new
+    manager._apply(order, broker.status(order))
+    assert order.status == "filled" and not manager.has_open("A")
+    assert [q for q, _ in fills] == pytest.approx([0.4, 0.6])
+    assert fills[1][1] == pytest.approx((1.0 * 11 - 0.4 * 10) / 0.6)
+    assert manager.book.get("A").avg_entry_price == pytest.approx(11.0)
+    assert manager.stats()["partial_fills"] == 1
+
+    manager.update("id-1", "filled", "1.0", "11")  # a late stream update for a closed order
+    assert manager.book.qty("A") == pytest.approx(1.0)
+    assert len(fills) == 2
+
+
+def test_update_ignores_unknown_orders(manager_for):
+    manager = manager_for(StubBroker())
+    manager.update("nope", "filled", "1", "1")
+    assert manager.book.snapshot() == {}
+
+
+def test_reconcile_waits_until_no_orders_are_open(manager_for):
+    broker = StubBroker({"id-1": [
+        {"status": "submitted", "broker_id": "b1", "filled_qty": 0, "filled_avg_price": None},
+        {"status": "filled", "broker_id": "b1", "filled_qty": 2.0, "filled_avg_price": 5.0},
+    ]}, positions={"A": (2.0, 5.5)})
+    manager = manager_for(broker)
+    order = manager.submit("A", "buy", 2.0, "id-1")
+    wait_until(lambda: order.status != "new")
+    assert manager.reconcile() is False
+    assert broker.positions_calls == 0
+
+    manager._apply(order, broker.status(order))
+    assert manager.reconcile() is True
+    assert manager.book.get("A").avg_entry_price == 5.5
+
+
+def test_failed_submission_closes_the_order(manager_for):
+    class Failing(StubBroker):
+        def submit(self, order):
+            raise RuntimeError("down")
+
+    manager = manager_for(Failing())
+    order = manager.submit("A", "buy", 1.0, "id-1")
+    assert manager.wait(timeout=5)
+    assert order.status == "failed" and order.error == "down"
+    assert manager.stats()["failed"] == 1
+
+
+class APIError(Exception):
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.code = code
+
+
+def alpaca_order(client_order_id):
+    return types.SimpleNamespace(id="b1", client_order_id=client_order_id, status="filled", filled_qty="1",
+                                 filled_avg_price="10")
+
+
+class StubAlpaca:
+    def __init__(self, error=None, existing=()):
+        self.error = error
+        self.existing = set(existing)
+        self.lookups = 0
+
+    def submit_order(self, **kwargs):
+        if self.error:
+            raise self.error
+        return alpaca_order(kwargs["client_order_id"])
+
+    def get_order_by_client_order_id(self, client_order_id):
+        self.lookups += 1
+        if client_order_id not in self.existing:
+            raise APIError("order not found", 40410000)
+        return alpaca_order(client_order_id)
+
+
+def test_alpaca_reused_client_order_id_tracks_the_existing_order():
+    api = StubAlpaca(APIError("client_order_id must be unique", 40010001), existing={"id-1"})
+    result = AlpacaBroker(api).submit(types.SimpleNamespace(symbol="A", qty=1, side="buy", client_order_id="id-1"))
+    assert result["status"] == "filled" and result["broker_id"] == "b1"
+
+
+def test_alpaca_unprocessable_order_that_was_never_placed_raises():
+    error = APIError("qty must be > 0", 40010001)
+    api = StubAlpaca(error)
+    with pytest.raises(APIError) as raised:
+        AlpacaBroker(api).submit(types.SimpleNamespace(symbol="A", qty=0, side="buy", client_order_id="id-1"))
+    assert raised.value is error
+    assert api.lookups == 1
+
+
+def test_alpaca_other_errors_are_not_looked_up():
+    api = StubAlpaca(APIError("insufficient buying power; client_order_id id-1", 40310000), existing={"id-1"})
+    with pytest.raises(APIError):
+        AlpacaBroker(api).submit(types.SimpleNamespace(symbol="A", qty=1, side="buy", client_order_id="id-1"))
+    assert api.lookups == 0
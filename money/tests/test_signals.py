@@ -0,0 +1,58 @@
+"""UniverseIndicators against the per-symbol reference, streaming.IncrementalIndicators."""
+import numpy as np
+import pytest
+
+from common.signals import UniverseIndicators
+from common.streaming import IncrementalIndicators
+
+SYMBOLS = 30
+FIELDS = ["sma", "rsi", "ema_fast", "ema_slow", "macd", "macd_signal", "macd_hist"]
+
+
+def reference_row(ind):
+    return {"sma": ind.sma, "rsi": ind.rsi, "ema_fast": ind.ema_fast.value, "ema_slow": ind.ema_slow.value,
+            "macd": ind.macd, "macd_signal": ind.macd_signal, "macd_hist": ind.macd_hist}
+
+
+def assert_same(universe, references):
+    for symbol, ind in references.items():
+        row = universe.row(symbol)
+        assert row["count"] == ind.count
+        expected = reference_row(ind)
+        for field in FIELDS:
+            assert row[field] == pytest.approx(expected[field], rel=1e-9, abs=1e-12, nan_ok=True), (symbol, field)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_update_many_matches_reference(seed):
+    """Ragged per-symbol batches with overlapping timestamps, applied in several rounds."""
+    rng = np.random.default_rng(seed)
+    symbols = [f"S{i}" for i in range(SYMBOLS)]
+    lengths = rng.integers(1, 400, SYMBOLS)
+    closes = {s: 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n))) for s, n in zip(symbols, lengths)}
+    universe = UniverseIndicators()
+    references = {s: IncrementalIndicators() for s in symbols}
+    for end in (0.3, 0.6, 1.0):
+        batch, times = {}, {}
+        for s in symbols:
+            stop = max(1, int(len(closes[s]) * end))
+            start = max(0, stop - 60)  # overlaps bars already applied, which must be skipped
+            batch[s], times[s] = closes[s][start:stop], list(range(start, stop))
+            references[s].update_many(batch[s], times[s])
+        universe.update_many(batch, times)
+    assert_same(universe, references)
+
+
+def test_update_matrix_matches_reference():
+    """A symbol x time matrix with gaps, like the simulator's shared clock."""
+    rng = np.random.default_rng(7)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (SYMBOLS, 500)), axis=1))
+    closes[rng.random(closes.shape) < 0.2] = np.nan
+    symbols = [f"S{i}" for i in range(SYMBOLS)]
+    universe = UniverseIndicators(symbols)
+    universe.update_matrix(closes)
+    references = {}
+    for s, row in zip(symbols, closes):
+        references[s] = IncrementalIndicators()
+        references[s].update_many(row[~np.isnan(row)])
+    assert_same(universe, references)
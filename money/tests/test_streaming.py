@@ -0,0 +1,75 @@
+"""IncrementalIndicators against the pandas formulas the bots used and TA-Lib's add_indicators()."""
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from common.streaming import IncrementalIndicators
+from conftest import MONEY
+
+talib = pytest.importorskip("talib")
+sys.path.insert(0, str(MONEY / "robinhood_bot"))
+from indicators import add_indicators  # noqa: E402
+
+BARS = 1000
+# TA-Lib seeds its EMAs with an SMA instead of the first close; by this bar the
+# difference has decayed below the tolerance.
+CONVERGED = 300
+
+
+def random_closes(seed, n=BARS):
+    rng = np.random.default_rng(seed)
+    return 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+
+
+def streamed(closes):
+    ind = IncrementalIndicators()
+    rows = []
+    for close in closes:
+        ind.update(close)
+        rows.append((ind.sma, ind.rsi, ind.ema_fast.value, ind.ema_slow.value, ind.macd, ind.macd_signal,
+                     ind.macd_hist))
+    return pd.DataFrame(rows, columns=["sma", "rsi", "ema_fast", "ema_slow", "macd", "macd_signal", "macd_hist"])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_pandas_formulas(seed):
+    closes = pd.Series(random_closes(seed))
+    got = streamed(closes)
+    delta = closes.diff().fillna(0.0)
+    gain = delta.clip(lower=0).rolling(14).mean()
+    loss = (-delta.clip(upper=0)).rolling(14).mean()
+    fast = closes.ewm(span=12, adjust=False).mean()
+    slow = closes.ewm(span=26, adjust=False).mean()
+    macd = fast - slow
+    signal = macd.ewm(span=9, adjust=False).mean()
+    np.testing.assert_allclose(got["sma"], closes.rolling(5).mean(), rtol=1e-9)
+    np.testing.assert_allclose(got["rsi"], 100 - 100 / (1 + gain / loss), rtol=1e-9)
+    np.testing.assert_allclose(got["ema_fast"], fast, rtol=1e-12)
+    np.testing.assert_allclose(got["ema_slow"], slow, rtol=1e-12)
+    np.testing.assert_allclose(got["macd"], macd, rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(got["macd_signal"], signal, rtol=1e-9, atol=1e-12)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_talib_add_indicators(seed):
+    closes = random_closes(seed)
+    got = streamed(closes)
+    expected = add_indicators(pd.DataFrame({"close": closes}))
+    np.testing.assert_allclose(got["sma"], expected["sma5"], rtol=1e-9)
+    tail = slice(CONVERGED, None)
+    for ours, theirs in [("ema_fast", "ema12"), ("ema_slow", "ema26"), ("macd", "macd"),
+                         ("macd_signal", "macdsignal"), ("macd_hist", "macdhist")]:
+        np.testing.assert_allclose(got[ours][tail], expected[theirs][tail], atol=1e-6, err_msg=ours)
+
+
+def test_timestamps_skip_seen_bars():
+    closes = random_closes(0, 50)
+    ind = IncrementalIndicators()
+    assert ind.update_many(closes[:30], range(30)) == 30
+    assert ind.update_many(closes, range(50)) == 20
+    whole = IncrementalIndicators()
+    whole.update_many(closes)
+    assert ind.count == whole.count == 50
+    assert ind.macd_hist == pytest.approx(whole.macd_hist)
@@ -0,0 +1,101 @@
+"""run_stream()'s reconnect limit, driven by a stand-in for alpaca_trade_api's Stream.
+
+These run without alpaca_trade_api; tests/test_bar_stream.py runs the real
+Stream against the local fake market data server when it is installed.
+"""
+import asyncio
+import logging
+import re
+import sys
+
+import pytest
+
+from conftest import MONEY
+
+sys.path.insert(0, str(MONEY / "alpaca_bot"))
+from streamwatch import STREAM_LOGGER, TESTED_VERSION, StreamFailures, is_connection_attempt, run_stream
+
+log = logging.getLogger(STREAM_LOGGER)
+
+
+class ScriptedStream:
+    """Logs like Stream._run_forever(): one record per connection attempt, `bars_per_connection` bars each."""
+
+    def __init__(self, failures, connections, message="starting stock data websocket connection",
+                 bars_per_connection=0):
+        self.failures = failures
+        self.connections = connections  # None for forever
+        self.message = message
+        self.bars_per_connection = bars_per_connection
+        self.stopped = asyncio.Event()
+
+    async def _run_forever(self):
+        made = 0
+        while not self.stopped.is_set():
+            if self.connections is None or made < self.connections:
+                made += 1
+                log.info(self.message)
+                for _ in range(self.bars_per_connection):
+                    self.failures.reset()
+            await asyncio.sleep(0.001)
+
+    async def stop_ws(self):
+        self.stopped.set()
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, 10))
+
+
+def test_connection_attempt_messages():
+    assert is_connection_attempt("starting stock data websocket connection")  # 3.x
+    assert is_connection_attempt("starting data websocket connection")  # 1.x and 2.x
+    assert not is_connection_attempt("starting trading websocket connection")
+    assert not is_connection_attempt("data websocket error, restarting connection: closed")
+
+
+def test_gives_up_after_the_reconnect_limit():
+    failures = StreamFailures(3)
+    stream = ScriptedStream(failures, connections=None)
+    with pytest.raises(RuntimeError, match="no bars after 3 stream reconnects"):
+        run(run_stream(stream, failures))
+    assert failures.attempts >= 5
+    assert stream.stopped.is_set()
+    assert failures not in log.handlers
+
+
+def test_bars_keep_the_stream_running():
+    async def scenario():
+        failures = StreamFailures(1)
+        stream = ScriptedStream(failures, connections=20, bars_per_connection=1)
+        task = asyncio.ensure_future(run_stream(stream, failures))
+        await asyncio.sleep(0.2)
+        assert not task.done()
+        await stream.stop_ws()
+        await task
+
+    run(scenario())
+
+
+def test_fails_loudly_when_the_library_logs_something_else():
+    failures = StreamFailures(3)
+    stream = ScriptedStream(failures, connections=None, message="opening market data connection")
+    with pytest.raises(RuntimeError, match=re.escape(f"alpaca-trade-api=={TESTED_VERSION}")):
+        run(run_stream(stream, failures, first_attempt_timeout=0.2))
+    assert stream.stopped.is_set()
+
+
+def test_restores_the_library_log_level():
+    log.setLevel(logging.WARNING)
+    try:
+        failures = StreamFailures(0)
+        with pytest.raises(RuntimeError):
+            run(run_stream(ScriptedStream(failures, connections=None), failures))
+        assert log.level == logging.WARNING
+    finally:
+        log.setLevel(logging.NOTSET)
+
+
+def test_requirements_pin_the_tested_version():
+    requirements = (MONEY / "alpaca_bot" / "requirements.txt").read_text().split()
+    assert f"alpaca-trade-api=={TESTED_VERSION}" in requirements